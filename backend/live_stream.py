@@ -0,0 +1,319 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import deque
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Pre-encoded events kept for clients that fall behind; a client further back than this
+# gets one coalesced snapshot instead of the events it missed
+EVENT_BACKLOG = 64
+
+# Seconds between keep-alive comments to every connected client
+HEARTBEAT_INTERVAL = 15
+
+# Bytes buffered per client before writes wait for the client to read, and how long a
+# client may stay over that limit before it is disconnected
+WRITE_BUFFER_HIGH = 64 * 1024
+SLOW_CLIENT_TIMEOUT = 30
+
+# Largest request head and /publish body accepted
+MAX_HEADER_BYTES = 8 * 1024
+MAX_PUBLISH_BYTES = 8 * 1024 * 1024
+
+# Shared secret the publisher sends as a Bearer token on /publish. Unset accepts any
+# publisher, so the server then only listens on loopback.
+PUBLISH_TOKEN = os.getenv('STREAM_PUBLISH_TOKEN')
+
+# Hosts that only accept local connections
+LOOPBACK_HOSTS = {"127.0.0.1", "::1", "localhost"}
+
+
+def sse_event(event, version, payload):
+    """One encoded Server-Sent Event"""
+    data = json.dumps(payload, separators=(',', ':'))
+    return f"id: {version}\nevent: {event}\ndata: {data}\n\n".encode('utf-8')
+
+
+class StreamHub:
+    def __init__(self, backlog=EVENT_BACKLOG):
+        """
+        Initialize the StreamHub class
+
+        Holds the current leaderboard (rows keyed by driver_id) and race metadata,
+        and a bounded log of encoded events. Each event is encoded once and shared by
+        every client; clients keep only a cursor into the log, so memory does not grow
+        with the number of clients or with how far behind they are.
+        """
+        self.version = None
+        self.rows = {}
+        self.metadata = {}
+        self.events = deque(maxlen=backlog)
+        self.seq = 0
+        self.heartbeats = 0
+        self._snapshot = None
+        self.wakeup = asyncio.Event()
+        self.stats = {"publishes": 0, "rejected": 0, "snapshots_sent": 0, "resyncs": 0, "slow_disconnects": 0}
+
+    def _notify(self):
+        # Waiters hold the old event; swapping first means one set() wakes each exactly once
+        wakeup, self.wakeup = self.wakeup, asyncio.Event()
+        wakeup.set()
+
+    def publish(self, message):
+        """
+        Apply a publisher message and queue its event for every client
+
+        A message with from_version null replaces the whole leaderboard; otherwise its
+        from_version must match the current version.
+
+        Returns:
+            bool: False if the message does not follow on from the current version
+        """
+        full = message.get("from_version") is None
+        if not full and message["from_version"] != self.version:
+            self.stats["rejected"] += 1
+            return False
+
+        if full:
+            self.rows = dict(message.get("changed", {}))
+        else:
+            for driver_id, fields in message.get("changed", {}).items():
+                self.rows.setdefault(driver_id, {}).update(fields)
+            for driver_id in message.get("removed", []):
+                self.rows.pop(driver_id, None)
+        if message.get("race_metadata") is not None:
+            self.metadata = message["race_metadata"]
+        self.version = message["to_version"]
+        self._snapshot = None
+
+        payload = dict(message, relayed_at=time.time())
+        self.seq += 1
+        self.events.append((self.seq, sse_event("snapshot" if full else "patch", self.version, payload)))
+        self.stats["publishes"] += 1
+        self._notify()
+        return True
+
+    def heartbeat(self):
+        self.heartbeats += 1
+        self._notify()
+
+    def snapshot_event(self):
+        """The current state as one event, encoded at most once per version"""
+        if self._snapshot is None:
+            self._snapshot = sse_event("snapshot", self.version, {
+                "from_version": None,
+                "to_version": self.version,
+                "race_metadata": self.metadata,
+                "changed": self.rows,
+                "removed": []
+            })
+        return self._snapshot
+
+    def events_since(self, seq):
+        """Encoded events after seq, or None if some of them have already left the backlog"""
+        if seq == self.seq:
+            return []
+        if not self.events or self.events[0][0] > seq + 1:
+            return None
+        return [event for event_seq, event in self.events if event_seq > seq]
+
+
+class StreamServer:
+    def __init__(self, hub, heartbeat_interval=HEARTBEAT_INTERVAL):
+        """
+        Initialize the StreamServer class
+
+        A minimal asyncio HTTP server: GET /stream serves Server-Sent Events, POST
+        /publish takes leaderboard patches from the publisher, GET /stats and GET
+        /health report state. Each client costs one coroutine and no timers while idle.
+        """
+        self.hub = hub
+        self.heartbeat_interval = heartbeat_interval
+        self.clients = 0
+
+    async def handle(self, reader, writer):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+
+        # Every path below, errors included, ends by closing the connection
+        try:
+            lines = head.decode('latin-1').split("\r\n")
+            try:
+                method, target, _ = lines[0].split(" ", 2)
+            except ValueError:
+                return await self.respond(writer, 400, {"error": "bad request line"})
+            headers = {}
+            for line in lines[1:]:
+                if ":" in line:
+                    name, value = line.split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+            path = target.split("?", 1)[0]
+
+            if method == "GET" and path == "/stream":
+                await self.stream(writer, headers.get("last-event-id"))
+            elif method == "POST" and path == "/publish":
+                await self.receive_publish(reader, writer, headers)
+            elif method == "GET" and path == "/stats":
+                await self.respond(writer, 200, dict(self.hub.stats, clients=self.clients, version=self.hub.version))
+            elif method == "GET" and path == "/health":
+                await self.respond(writer, 200, {"status": "healthy", "clients": self.clients})
+            else:
+                await self.respond(writer, 404, {"error": "not found"})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        reason = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+                  409: "Conflict", 413: "Payload Too Large"}.get(status, "")
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode('latin-1') + body
+        )
+        await writer.drain()
+
+    async def receive_publish(self, reader, writer, headers):
+        if PUBLISH_TOKEN and headers.get("authorization") != f"Bearer {PUBLISH_TOKEN}":
+            return await self.respond(writer, 401, {"error": "unauthorized"})
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            return await self.respond(writer, 400, {"error": "bad Content-Length"})
+        if length > MAX_PUBLISH_BYTES:
+            return await self.respond(writer, 413, {"error": "too large"})
+        try:
+            message = json.loads(await reader.readexactly(length))
+            message["to_version"]
+        except (ValueError, KeyError, TypeError):
+            return await self.respond(writer, 400, {"error": "expected a JSON patch with to_version"})
+
+        if not self.hub.publish(message):
+            # Out of step (e.g. this server restarted); the publisher resends the full leaderboard
+            return await self.respond(writer, 409, {"error": "version mismatch", "version": self.hub.version})
+        await self.respond(writer, 200, {"version": self.hub.version, "clients": self.clients})
+
+    async def send(self, writer, chunk):
+        """Write and wait while the client's buffer is over the limit, dropping clients that stay there"""
+        writer.write(chunk)
+        try:
+            await asyncio.wait_for(writer.drain(), SLOW_CLIENT_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.hub.stats["slow_disconnects"] += 1
+            raise ConnectionError("client too slow")
+
+    async def stream(self, writer, last_event_id):
+        hub = self.hub
+        writer.transport.set_write_buffer_limits(high=WRITE_BUFFER_HIGH)
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+            b"Access-Control-Allow-Origin: *\r\nConnection: keep-alive\r\n\r\n"
+        )
+
+        # A reconnecting client that already holds the current version skips the snapshot
+        if hub.version is None or (last_event_id is not None and last_event_id == str(hub.version)):
+            seq = hub.seq
+        else:
+            seq = None
+        heartbeats = hub.heartbeats
+
+        self.clients += 1
+        try:
+            while True:
+                wakeup = hub.wakeup
+                chunks = hub.events_since(seq) if seq is not None else None
+                if chunks is None:
+                    # New client, or one that fell behind the backlog: coalesce into one snapshot
+                    if seq is not None:
+                        hub.stats["resyncs"] += 1
+                    hub.stats["snapshots_sent"] += 1
+                    chunks = [hub.snapshot_event()]
+                seq = hub.seq
+                if chunks:
+                    await self.send(writer, b"".join(chunks))
+                elif heartbeats != hub.heartbeats:
+                    await self.send(writer, b": ping\n\n")
+                heartbeats = hub.heartbeats
+
+                if wakeup is hub.wakeup:
+                    await wakeup.wait()
+        finally:
+            self.clients -= 1
+
+    async def heartbeats(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            self.hub.heartbeat()
+
+
+def raise_file_limit():
+    """Allow as many open connections as the hard limit permits"""
+    if resource is None:
+        return None
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or hard > soft:
+        target = hard if hard != resource.RLIM_INFINITY else 1 << 20
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+            soft = target
+        except (ValueError, OSError):
+            pass
+    return soft
+
+
+async def serve(host, port, backlog=EVENT_BACKLOG, heartbeat_interval=HEARTBEAT_INTERVAL, ready=None):
+    """
+    Run the stream server until cancelled
+
+    Args:
+        ready (asyncio.Future): Optional future resolved with the bound port once listening
+    """
+    server = StreamServer(StreamHub(backlog), heartbeat_interval)
+    listener = await asyncio.start_server(server.handle, host, port, limit=MAX_HEADER_BYTES, backlog=4096)
+    heartbeat_task = asyncio.create_task(server.heartbeats())
+    if ready is not None:
+        ready.set_result(listener.sockets[0].getsockname()[1])
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        heartbeat_task.cancel()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Live leaderboard stream (Server-Sent Events)")
+    parser.add_argument('--host', help='default 0.0.0.0 with STREAM_PUBLISH_TOKEN set, otherwise 127.0.0.1')
+    parser.add_argument('--port', type=int, default=5002)
+    parser.add_argument('--backlog', type=int, default=EVENT_BACKLOG, help='events kept for lagging clients')
+    args = parser.parse_args()
+
+    if args.host is None:
+        args.host = '0.0.0.0' if PUBLISH_TOKEN else '127.0.0.1'
+    if not PUBLISH_TOKEN and args.host not in LOOPBACK_HOSTS:
+        # Anyone who could reach /publish could push a fake leaderboard to every viewer
+        sys.exit(f"Refusing to listen on {args.host} without STREAM_PUBLISH_TOKEN; set it or use --host 127.0.0.1")
+
+    limit = raise_file_limit()
+    print("Starting live leaderboard stream...")
+    print("  GET /stream - Server-Sent Events: a snapshot, then a patch per published version")
+    print("  POST /publish - Leaderboard patches from the publisher (STREAM_PUBLISH_URL)")
+    print("  GET /stats - Clients and event counters")
+    print("  GET /health - Health check")
+    print(f"\nOpen file limit {limit}, running on http://{args.host}:{args.port}")
+    try:
+        asyncio.run(serve(args.host, args.port, args.backlog))
+    except KeyboardInterrupt:
+        pass
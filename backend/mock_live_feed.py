@@ -1,9 +1,22 @@
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
-import random
+import argparse
+import gzip
+import json
+import math
+import os
+import sys
+import threading
 import time
 from datetime import datetime
 
+from race_simulator import RaceSimulator, TICK_SECONDS
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:
+    BaseApplication = None
+
 app = Flask(__name__)
 CORS(app)
 
@@ -62,193 +75,238 @@ TRACKS = [
     {"id": 6, "name": "Phoenix Raceway", "length": 1.0, "type": "Short Track"}
 ]
 
-# Global race state
-race_state = {
-    "lap_number": 1,
-    "elapsed_time": 0,
-    "flag_state": 1,  # 1 = green, 2 = caution, 3 = red
-    "race_id": random.randint(5000, 6000),
-    "laps_in_race": 75,
-    "current_track": random.choice(TRACKS),
-    "stage_num": 1,
-    "positions": list(range(40)),  # Track positions (0-based for indexing)
-    "leaders": [],
-    "caution_segments": 0,
-    "caution_laps": 0,
-    "lead_changes": 0
-}
-
-def generate_lap_time(track_type):
-    """Generate realistic lap time based on track type"""
-    base_times = {
-        "Street": 90.0,
-        "Superspeedway": 45.0,
-        "Intermediate": 28.0,
-        "Short Track": 20.0
-    }
-    base_time = base_times.get(track_type, 30.0)
-    return base_time + random.uniform(-2.0, 3.0)
-
-def generate_speed(track_type):
-    """Generate realistic speed based on track type"""
-    base_speeds = {
-        "Street": 85.0,
-        "Superspeedway": 200.0,
-        "Intermediate": 180.0,
-        "Short Track": 90.0
-    }
-    base_speed = base_speeds.get(track_type, 100.0)
-    return base_speed + random.uniform(-5.0, 5.0)
-
-def generate_pit_stops():
-    """Generate realistic pit stop data"""
-    num_stops = random.randint(0, 3)
-    pit_stops = []
-    
-    for i in range(num_stops):
-        pit_stops.append({
-            "positions_gained_lossed": random.randint(-5, 5),
-            "pit_in_elapsed_time": random.uniform(100, race_state["elapsed_time"]),
-            "pit_in_lap_count": random.randint(1, race_state["lap_number"]),
-            "pit_in_leader_lap": random.randint(1, race_state["lap_number"]),
-            "pit_out_elapsed_time": random.uniform(100, race_state["elapsed_time"]),
-            "pit_in_rank": random.randint(1, 40),
-            "pit_out_rank": random.randint(1, 40)
-        })
-    
-    return pit_stops
-
-def generate_laps_led():
-    """Generate laps led data"""
-    if random.random() < 0.3:  # 30% chance of leading laps
-        return [{
-            "start_lap": random.randint(1, max(1, race_state["lap_number"] - 5)),
-            "end_lap": random.randint(1, race_state["lap_number"])
-        }]
-    return []
-
-def randomize_race_state():
-    """Completely randomize race state on each request"""
-    # Randomize basic race info
-    race_state["lap_number"] = random.randint(1, 75)
-    race_state["elapsed_time"] = random.randint(300, 7200)  # 5 minutes to 2 hours
-    race_state["flag_state"] = random.choice([1, 1, 1, 2])  # Mostly green, sometimes caution
-    race_state["race_id"] = random.randint(5000, 6000)
-    race_state["current_track"] = random.choice(TRACKS)
-    race_state["caution_segments"] = random.randint(0, 8)
-    race_state["caution_laps"] = random.randint(0, 25)
-    race_state["lead_changes"] = random.randint(0, 35)
-    
-    # Completely shuffle positions
-    race_state["positions"] = list(range(40))
-    random.shuffle(race_state["positions"])
-    
-    # Update stage based on lap
-    if race_state["lap_number"] <= 25:
-        race_state["stage_num"] = 1
-    elif race_state["lap_number"] <= 45:
-        race_state["stage_num"] = 2
+# Simulated races: every response is a race at the current clock, reproducible from
+# (MOCK_SEED, MOCK_CLOCK_OFFSET). MOCK_SPEED runs the races faster than real time ("max"
+# advances one step per request), and ?t=<seconds> asks for a race at an exact elapsed time.
+SEED = int(os.getenv('MOCK_SEED', '2025'))
+CLOCK_OFFSET = float(os.getenv('MOCK_CLOCK_OFFSET', '0'))
+MAX_SPEED = os.getenv('MOCK_SPEED', '1') == 'max'
+SPEED = 1.0 if MAX_SPEED else float(os.getenv('MOCK_SPEED', '1'))
+
+# Capture written by jobs/feed_recorder.py to serve on /live-feed instead of a simulated race,
+# with its original timing scaled by MOCK_SPEED, starting at MOCK_REPLAY_FROM_LAP.
+# ?lap=<n> returns the first recorded snapshot of lap n.
+REPLAY = os.getenv('MOCK_REPLAY')
+REPLAY_FROM_LAP = int(os.getenv('MOCK_REPLAY_FROM_LAP', '0')) or None
+
+# Independent races served under /live-feed/<series_id> or /live-feed/<race_id>. Race i uses
+# seed MOCK_SEED + i and reports series_id i + 1 and race_id FIRST_RACE_ID + i; /live-feed is race 0.
+# Fields larger than DRIVERS are padded with synthetic drivers.
+RACES = int(os.getenv('MOCK_RACES', '1'))
+FIELD_SIZE = int(os.getenv('MOCK_FIELD_SIZE', str(len(DRIVERS))))
+FIRST_RACE_ID = 5000
+
+# gzip level for cached responses; each tick is compressed once however many clients poll
+GZIP_LEVEL = 6
+
+# Seconds between requests-per-second log lines in load-test mode
+STATS_INTERVAL = 5
+
+started = time.monotonic()
+
+stats = {"requests": 0, "not_modified": 0, "gzip": 0, "ticks_serialized": 0}
+stats_lock = threading.Lock()
+
+class SimulatedFeed:
+    """One simulated race and its last serialized tick"""
+
+    def __init__(self, index):
+        self.simulator = RaceSimulator(DRIVERS, TRACKS, seed=SEED + index, field_size=FIELD_SIZE,
+                                       series_id=index + 1, race_id=FIRST_RACE_ID + index)
+        self.lock = threading.Lock()
+        # (tick, etag, body, gzipped body) for the last serialized tick
+        self.cached = None
+
+    def tick_response(self, elapsed):
+        """The serialized race at elapsed seconds, built once per simulator tick and shared by every request"""
+        tick = math.floor(elapsed / TICK_SECONDS) * TICK_SECONDS
+        cached = self.cached
+        if cached is not None and cached[0] == tick:
+            return cached
+
+        with self.lock:
+            cached = self.cached
+            if cached is not None and cached[0] == tick:
+                return cached
+            self.simulator.advance_to(elapsed)
+            body = self.simulator.snapshot_json()
+            etag = f'"{self.simulator.seed}-{FIELD_SIZE}-{int(tick)}"'
+            self.cached = (tick, etag, body, gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0))
+        count("ticks_serialized")
+        return self.cached
+
+    def next_response(self):
+        """The tick after the last one served, for MOCK_SPEED=max"""
+        cached = self.cached
+        return self.tick_response(cached[0] + TICK_SECONDS if cached is not None else 0.0)
+
+class ReplayFeed:
+    """A recorded capture, read one block at a time and served with its original timing"""
+
+    def __init__(self, path, from_lap=None):
+        sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'jobs'))
+        from feed_recorder import CaptureReader
+
+        self.reader = CaptureReader(path)
+        self.lock = threading.Lock()
+        # (fetched_at, etag, body, gzipped body) for the frame being served
+        self.cached = None
+        self.seek(start_lap=from_lap)
+        if self.upcoming is None:
+            raise ValueError(f"No frames to replay in {path}" + (f" from lap {from_lap}" if from_lap else ""))
+        self.origin = self.upcoming[0]
+
+    def seek(self, start_lap=None, start_time=None):
+        """Restart the frame stream at a lap or capture time; only the blocks from there on are read"""
+        self.frames = self.reader.frames(start_lap=start_lap, start_time=start_time)
+        self.current = None
+        self.upcoming = next(self.frames, None)
+
+    def _next(self):
+        self.current = self.upcoming
+        self.upcoming = next(self.frames, None)
+
+    def _response(self):
+        fetched_at, _, body = self.current
+        if self.cached is None or self.cached[0] != fetched_at:
+            self.cached = (fetched_at, f'"replay-{fetched_at!r}"', body, gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0))
+            count("ticks_serialized")
+        return self.cached
+
+    def tick_response(self, elapsed):
+        """The last frame recorded at or before elapsed seconds into the replay"""
+        with self.lock:
+            target = self.origin + elapsed
+            if self.current is not None and self.current[0] > target:
+                self.seek(start_time=target)
+            while self.upcoming is not None and (self.current is None or self.upcoming[0] <= target):
+                self._next()
+            return self._response()
+
+    def next_response(self):
+        """The frame after the last one served, for MOCK_SPEED=max; the last frame repeats at the end"""
+        with self.lock:
+            if self.upcoming is not None:
+                self._next()
+            return self._response()
+
+    def lap_response(self, lap):
+        """The first frame recorded on lap, without moving the replay"""
+        frame = next(self.reader.frames(start_lap=lap), None)
+        if frame is None:
+            return None
+        fetched_at, _, body = frame
+        return (fetched_at, f'"replay-{fetched_at!r}"', body, gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0))
+
+# Races are built on first request
+feeds = {}
+feeds_lock = threading.Lock()
+
+def get_feed(index):
+    feed = feeds.get(index)
+    if feed is None:
+        with feeds_lock:
+            feed = feeds.get(index)
+            if feed is None:
+                feed = ReplayFeed(REPLAY, REPLAY_FROM_LAP) if REPLAY and index == 0 else SimulatedFeed(index)
+                feeds[index] = feed
+    return feed
+
+# Open the capture at startup so a bad path fails fast
+if REPLAY:
+    get_feed(0)
+
+def race_clock():
+    """Elapsed race seconds for the current request"""
+    requested = request.args.get('t', type=float)
+    if requested is not None:
+        return max(0.0, requested)
+    return CLOCK_OFFSET + (time.monotonic() - started) * SPEED
+
+def count(name):
+    with stats_lock:
+        stats[name] += 1
+
+def stats_snapshot():
+    with stats_lock:
+        snapshot = dict(stats)
+    snapshot["uptime"] = round(time.monotonic() - started, 3)
+    snapshot["pid"] = os.getpid()
+    return snapshot
+
+def serve_feed(index):
+    """Cached bytes for race index at the request's clock, honouring If-None-Match and Accept-Encoding"""
+    count("requests")
+    feed = get_feed(index)
+    lap = request.args.get('lap', type=int)
+    if lap is not None and isinstance(feed, ReplayFeed):
+        response = feed.lap_response(lap)
+        if response is None:
+            return jsonify({"error": f"Lap {lap} is not in the capture"}), 404
+    elif MAX_SPEED:
+        response = feed.next_response()
     else:
-        race_state["stage_num"] = 3
+        response = feed.tick_response(race_clock())
+    _, etag, body, gzipped = response
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+
+    if etag in request.headers.get('If-None-Match', ''):
+        count("not_modified")
+        return Response(status=304, headers=headers)
+
+    if 'gzip' in request.headers.get('Accept-Encoding', ''):
+        count("gzip")
+        headers["Content-Encoding"] = "gzip"
+        body = gzipped
+    return Response(body, mimetype='application/json', headers=headers)
 
 @app.route('/live-feed')
 def live_feed():
     """Main endpoint that mirrors NASCAR live feed structure exactly"""
-    # Randomize everything on each request
-    randomize_race_state()
-    
-    # Generate vehicle data
-    vehicles = []
-    track_type = race_state["current_track"]["type"]
-    
-    for i in range(40):
-        driver = DRIVERS[i]
-        position = race_state["positions"][i] + 1  # Convert to 1-based position
-        
-        # Generate lap times and speeds
-        last_lap_time = generate_lap_time(track_type)
-        best_lap_time = last_lap_time - random.uniform(1, 5)
-        last_lap_speed = generate_speed(track_type)
-        best_lap_speed = last_lap_speed + random.uniform(2, 8)
-        
-        vehicle = {
-            "average_restart_speed": best_lap_speed - random.uniform(0, 3),
-            "average_running_position": position + random.uniform(-2, 2),
-            "average_speed": last_lap_speed - random.uniform(5, 15),
-            "best_lap": random.randint(1, race_state["lap_number"]),
-            "best_lap_speed": round(best_lap_speed, 3),
-            "best_lap_time": round(best_lap_time, 3),
-            "vehicle_manufacturer": driver["manufacturer"],
-            "vehicle_number": driver["number"],
-            "driver": {
-                "driver_id": driver["id"],
-                "full_name": f"{driver['first_name']} {driver['last_name']}",
-                "first_name": driver["first_name"],
-                "last_name": driver["last_name"],
-                "is_in_chase": random.choice([True, False])
-            },
-            "vehicle_elapsed_time": race_state["elapsed_time"] - random.uniform(0, 60),
-            "fastest_laps_run": random.randint(0, 10),
-            "laps_position_improved": random.randint(0, 5),
-            "laps_completed": race_state["lap_number"] - random.randint(0, 2),
-            "laps_led": generate_laps_led(),
-            "last_lap_speed": round(last_lap_speed, 3),
-            "last_lap_time": round(last_lap_time, 3),
-            "passes_made": random.randint(0, 15),
-            "passing_differential": random.randint(-5, 10),
-            "position_differential_last_10_percent": random.randint(-10, 10),
-            "pit_stops": generate_pit_stops(),
-            "qualifying_status": random.randint(0, 2),
-            "running_position": position,
-            "status": random.choice([1, 1, 1, 1, 2, 3]),  # 1=running, 2=pit, 3=out
-            "delta": round(random.uniform(-5.0, 5.0), 1) if position > 1 else 0.0,
-            "sponsor_name": driver["sponsor"],
-            "starting_position": random.randint(1, 40),
-            "times_passed": random.randint(0, 8),
-            "quality_passes": random.randint(0, 5),
-            "is_on_track": random.choice([True, True, True, False]),
-            "is_on_dvp": random.choice([True, False])
-        }
-        vehicles.append(vehicle)
-    
-    # Sort vehicles by running position
-    vehicles.sort(key=lambda x: x["running_position"])
-    
-    # Calculate stage finish lap
-    stage_finish_lap = 25 if race_state["stage_num"] == 1 else (45 if race_state["stage_num"] == 2 else race_state["laps_in_race"])
-    stage_laps = 25 if race_state["stage_num"] <= 2 else (race_state["laps_in_race"] - 45)
-    
-    # Generate the complete response matching the original structure
-    response = {
-        "lap_number": race_state["lap_number"],
-        "elapsed_time": int(race_state["elapsed_time"]),
-        "flag_state": race_state["flag_state"],
-        "race_id": race_state["race_id"],
-        "laps_in_race": race_state["laps_in_race"],
-        "laps_to_go": max(0, race_state["laps_in_race"] - race_state["lap_number"]),
-        "vehicles": vehicles,
-        "run_id": random.randint(1, 20),
-        "run_name": f"Mock Race at {race_state['current_track']['name']}",
-        "series_id": 1,
-        "time_of_day": int(time.time() % 86400),  # Seconds since midnight
-        "time_of_day_os": datetime.now().strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "-05:00",
-        "track_id": race_state["current_track"]["id"],
-        "track_length": race_state["current_track"]["length"],
-        "track_name": race_state["current_track"]["name"],
-        "run_type": 3,
-        "number_of_caution_segments": race_state["caution_segments"],
-        "number_of_caution_laps": race_state["caution_laps"],
-        "number_of_lead_changes": race_state["lead_changes"],
-        "number_of_leaders": len(set(v["running_position"] for v in vehicles if v["laps_led"])),
-        "avg_diff_1to3": random.randint(1000, 5000),
-        "stage": {
-            "stage_num": race_state["stage_num"],
-            "finish_at_lap": stage_finish_lap,
-            "laps_in_stage": stage_laps
-        }
-    }
-    
-    return jsonify(response)
+    return serve_feed(0)
+
+@app.route('/live-feed/<int:feed_id>')
+def live_feed_by_id(feed_id):
+    """One of the MOCK_RACES races, by series_id or race_id"""
+    if 1 <= feed_id <= RACES:
+        return serve_feed(feed_id - 1)
+    if FIRST_RACE_ID <= feed_id < FIRST_RACE_ID + RACES:
+        return serve_feed(feed_id - FIRST_RACE_ID)
+    return jsonify({"error": f"No race with series_id or race_id {feed_id}"}), 404
+
+@app.route('/races')
+def races():
+    """Every simulated race, e.g. for building LIVE_FEEDS"""
+    return jsonify([
+        {"series_id": index + 1, "race_id": FIRST_RACE_ID + index, "url": f"/live-feed/{FIRST_RACE_ID + index}"}
+        for index in range(RACES)
+    ])
+
+@app.route('/stats')
+def stats_endpoint():
+    """Request counters for the worker that answers"""
+    snapshot = stats_snapshot()
+    snapshot["average_rps"] = round(snapshot["requests"] / snapshot["uptime"], 1) if snapshot["uptime"] else 0.0
+    return jsonify(snapshot)
+
+def report_stats(interval=STATS_INTERVAL):
+    """Log this worker's achieved requests per second every interval seconds"""
+    def run():
+        previous = stats_snapshot()
+        while True:
+            time.sleep(interval)
+            current = stats_snapshot()
+            elapsed = current["uptime"] - previous["uptime"]
+            print(json.dumps({
+                "metric": "mock_feed_rps",
+                "pid": current["pid"],
+                "rps": round((current["requests"] - previous["requests"]) / elapsed, 1),
+                "not_modified": current["not_modified"] - previous["not_modified"],
+                "gzip": current["gzip"] - previous["gzip"],
+                "ticks_serialized": current["ticks_serialized"] - previous["ticks_serialized"]
+            }), flush=True)
+            previous = current
+    threading.Thread(target=run, daemon=True).start()
 
 @app.route('/health')
 def health_check():
@@ -259,10 +317,54 @@ def health_check():
         "message": "NASCAR Mock API is running. Use /live-feed for race data."
     })
 
+def serve_load_test(host, port, workers, threads):
+    """
+    Serve under gunicorn with several pre-forked workers, each logging its requests per second
+
+    The app is loaded before forking so every worker shares the same race clock.
+    Falls back to a single threaded werkzeug process when gunicorn is not installed.
+    """
+    if BaseApplication is None:
+        print("gunicorn is not installed - serving from one threaded process instead")
+        report_stats()
+        app.run(host=host, port=port, threaded=True, debug=False)
+        return
+
+    class LoadTestServer(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{host}:{port}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("threads", threads)
+            self.cfg.set("worker_class", "gthread")
+            self.cfg.set("preload_app", True)
+            self.cfg.set("post_fork", lambda server, worker: report_stats())
+
+        def load(self):
+            return app
+
+    LoadTestServer().run()
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="NASCAR Live Feed Mock API")
+    parser.add_argument('--load-test', action='store_true', help='serve with multiple workers and log requests per second')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--port', type=int, default=5000)
+    args = parser.parse_args()
+
     print("Starting NASCAR Live Feed Mock API...")
     print("Endpoint:")
-    print("  GET /live-feed - Live feed data (completely randomized on each request)")
+    print("  GET /live-feed - Live feed data from the simulated race (?t=<seconds> for a fixed race time)")
+    print("  GET /live-feed/<series_id> or /live-feed/<race_id> - One of MOCK_RACES simulated races")
+    print("  GET /races - Simulated races")
+    print("  GET /stats - Request counters for the answering worker")
     print("  GET /health - Health check")
-    print("\nRunning on http://localhost:5000")
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    speed = "max" if MAX_SPEED else f"{SPEED}x"
+    if REPLAY:
+        print(f"\nReplaying {REPLAY} from lap {REPLAY_FROM_LAP or 1}, speed {speed}")
+    print(f"\nSeed {SEED}, clock offset {CLOCK_OFFSET}s, speed {speed}, {RACES} race(s) of {FIELD_SIZE} cars")
+    print(f"\nRunning on http://localhost:{args.port}")
+    if args.load_test:
+        serve_load_test('0.0.0.0', args.port, args.workers, args.threads)
+    else:
+        app.run(debug=True, host='0.0.0.0', port=args.port)
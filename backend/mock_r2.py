@@ -0,0 +1,182 @@
+import argparse
+import hashlib
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Same paths as the Cloudflare R2 objects API, relative to the API root (e.g. /client/v4)
+OBJECT_PATH = re.compile(r"^/client/v4/accounts/(?P<account>[^/]+)/r2/buckets/(?P<bucket>[^/]+)/objects/(?P<key>.+)$")
+BUCKETS_PATH = re.compile(r"^/client/v4/accounts/(?P<account>[^/]+)/r2/buckets/?$")
+
+
+class FaultInjector:
+    """Latency, error and dropped-connection faults applied to PUTs, drawn from a seeded RNG"""
+
+    def __init__(self, latency=0.0, latency_rate=0.0, error_rate=0.0, drop_rate=0.0, seed=0):
+        """
+        Args:
+            latency (float): Seconds added to a delayed request
+            latency_rate (float): Fraction of requests delayed
+            error_rate (float): Fraction of requests answered with 503
+            drop_rate (float): Fraction of requests whose connection is closed without a response
+            seed (int): RNG seed so a run's faults are reproducible
+        """
+        self.latency = latency
+        self.latency_rate = latency_rate
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.injected = {"latency": 0, "error": 0, "drop": 0}
+
+    def draw(self):
+        """Faults for the next request: (delay seconds, None, "error" or "drop")"""
+        with self.lock:
+            delay = self.latency if self.random.random() < self.latency_rate else 0.0
+            roll = self.random.random()
+            fault = "drop" if roll < self.drop_rate else "error" if roll < self.drop_rate + self.error_rate else None
+            if delay:
+                self.injected["latency"] += 1
+            if fault:
+                self.injected[fault] += 1
+        return delay, fault
+
+
+class MockR2Store:
+    """In-memory object store shared by every request to the stand-in"""
+
+    def __init__(self, faults=None):
+        self.objects = {}
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.bytes_received = 0
+        self.faults = faults
+
+    def put(self, bucket, key, body, headers, if_match=None, if_none_match=None):
+        """Store an object, honouring If-Match / If-None-Match: *; returns its ETag, or None on 412"""
+        with self.lock:
+            self.requests += 1
+            current = self.objects.get((bucket, key))
+            if if_none_match == "*" and current is not None:
+                return None
+            if if_match is not None and (current is None or current[1]["ETag"] != if_match):
+                return None
+            headers["ETag"] = f'"{hashlib.md5(body).hexdigest()}"'
+            self.objects[(bucket, key)] = (body, headers)
+            self.bytes_received += len(body)
+            return headers["ETag"]
+
+    def get(self, bucket, key):
+        with self.lock:
+            self.requests += 1
+            return self.objects.get((bucket, key))
+
+    def delete(self, bucket, key):
+        with self.lock:
+            self.requests += 1
+            return self.objects.pop((bucket, key), None) is not None
+
+
+class MockR2Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; don't let Nagle hold the body back
+    disable_nagle_algorithm = True
+    store = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_PUT(self):
+        match = OBJECT_PATH.match(self.path)
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        if not match:
+            return self._send(404, b'{"success": false}')
+        if self.store.faults is not None:
+            delay, fault = self.store.faults.draw()
+            if delay:
+                time.sleep(delay)
+            if fault == "drop":
+                self.close_connection = True
+                return
+            if fault == "error":
+                return self._send(503, b'{"success": false, "errors": [{"message": "injected fault"}]}')
+        etag = self.store.put(match["bucket"], match["key"], body, {
+            name: self.headers[name]
+            for name in ("Content-Type", "Content-Encoding", "Cache-Control")
+            if self.headers.get(name)
+        }, self.headers.get("If-Match"), self.headers.get("If-None-Match"))
+        if etag is None:
+            return self._send(412, b'{"success": false}')
+        self._send(200, b'{"success": true}', {"Content-Type": "application/json", "ETag": etag})
+
+    def do_GET(self):
+        if BUCKETS_PATH.match(self.path):
+            return self._send(200, b'{"success": true, "result": {"buckets": []}}', {"Content-Type": "application/json"})
+        match = OBJECT_PATH.match(self.path)
+        stored = self.store.get(match["bucket"], match["key"]) if match else None
+        if stored is None:
+            return self._send(404, b'{"success": false}')
+        body, headers = stored
+        self._send(200, body, headers)
+
+    do_HEAD = do_GET
+
+    def do_DELETE(self):
+        match = OBJECT_PATH.match(self.path)
+        if not match or not self.store.delete(match["bucket"], match["key"]):
+            return self._send(404, b'{"success": false}')
+        self._send(200, b'{"success": true}', {"Content-Type": "application/json"})
+
+
+def start_mock_r2(host="127.0.0.1", port=0, faults=None):
+    """
+    Start the R2 stand-in on a background thread
+
+    Args:
+        faults (FaultInjector): Optional faults applied to every PUT
+
+    Returns:
+        tuple: (server, store, api_base) - pass api_base as r2_config['api_base']
+    """
+    store = MockR2Store(faults)
+    handler = type("BoundMockR2Handler", (MockR2Handler,), {"store": store})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    api_base = f"http://{host}:{server.server_address[1]}/client/v4"
+    return server, store, api_base
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local stand-in for the R2 objects API')
+    parser.add_argument('port', type=int, nargs='?', default=5001)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to delayed PUTs')
+    parser.add_argument('--latency-rate', type=float, default=0.0, help='Fraction of PUTs delayed')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of PUTs answered with 503')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='Fraction of PUTs dropped without a response')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    faults = None
+    if args.latency_rate or args.error_rate or args.drop_rate:
+        faults = FaultInjector(args.latency, args.latency_rate, args.error_rate, args.drop_rate, args.seed)
+    port = args.port
+    server, store, api_base = start_mock_r2("0.0.0.0", port, faults)
+    print("Starting mock R2 objects API...")
+    print(f"Set CLOUDFLARE_API_BASE=http://localhost:{port}/client/v4")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
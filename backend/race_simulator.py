@@ -0,0 +1,590 @@
+import json
+import random
+from datetime import datetime, timedelta, timezone
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Feed flag_state values
+FLAG_GREEN = 1
+FLAG_CAUTION = 2
+FLAG_RED = 3
+FLAG_CHECKERED = 4
+
+# Car status values
+STATUS_RUNNING = 1
+STATUS_PIT = 2
+STATUS_OUT = 3
+
+# Simulated seconds per step; state at any elapsed time is the result of whole steps from 0
+TICK_SECONDS = 1.0
+
+# Average green flag lap speed (mph) by track type; lap time follows from track length
+TYPE_SPEEDS = {
+    "Street": 85.0,
+    "Superspeedway": 190.0,
+    "Intermediate": 175.0,
+    "Short Track": 100.0
+}
+
+# Lap time multiplier behind the pace car, and while on pit road
+CAUTION_PACE = 1.6
+PIT_LANE_PACE = 3.0
+
+LAPS_IN_RACE = 75
+STAGE_ENDS = (25, 45)
+
+# Chance per green leader lap of a caution, its length in laps, and the laps of a stage break
+CAUTION_CHANCE = 0.03
+CAUTION_LAPS = (3, 6)
+STAGE_CAUTION_LAPS = 3
+
+# Share of cautions that become a red flag, and how long the red lasts
+RED_FLAG_CHANCE = 0.08
+RED_FLAG_SECONDS = (300, 900)
+
+# Laps a car can run on a tank, and the laps since its last stop before it pits under caution
+FUEL_WINDOW_LAPS = (28, 36)
+CAUTION_PIT_MIN_LAPS = 10
+CAUTION_PIT_CHANCE = 0.85
+
+# Seconds on pit road for a stop
+PIT_ROAD_SECONDS = (28.0, 38.0)
+
+# Gap between cars (in laps) when the field is packed up for a restart
+RESTART_SPACING = 0.004
+
+# Fixed start time so time_of_day fields are reproducible too
+SIM_EPOCH = datetime(2025, 2, 16, 14, 30, tzinfo=timezone(timedelta(hours=-5)))
+
+# Synthetic drivers past the real list, for large fields
+SYNTHETIC_DRIVER_ID = 100000
+SYNTHETIC_MANUFACTURERS = ("Chv", "Frd", "Toy")
+
+
+def field_drivers(drivers, field_size):
+    """The first field_size drivers, padded with synthetic drivers when the field is larger than the list"""
+    field = list(drivers[:field_size])
+    for i in range(len(field), field_size):
+        field.append({
+            "id": SYNTHETIC_DRIVER_ID + i,
+            "first_name": "Driver",
+            "last_name": str(i + 1),
+            "number": str(100 + i),
+            "manufacturer": SYNTHETIC_MANUFACTURERS[i % len(SYNTHETIC_MANUFACTURERS)],
+            "sponsor": f"Sponsor {i + 1}"
+        })
+    return field
+
+
+class RaceSimulator:
+    def __init__(self, drivers, tracks, seed=0, field_size=None, laps_in_race=LAPS_IN_RACE, series_id=1, race_id=None):
+        """
+        Initialize the RaceSimulator class
+
+        A seeded, time-stepped race. The state at elapsed time t depends only on the
+        seed and t, so any response can be reproduced from (seed, clock offset).
+
+        Per-car state that changes every tick (progress, pace, pit time, rank and
+        pass counts) lives in columns indexed like self.cars, updated for the whole
+        field at once with numpy when it is installed. Everything else is per car and
+        only touched when a car completes a lap, pits or crashes.
+
+        Args:
+            drivers (list): Driver dicts with id, first_name, last_name, number, manufacturer, sponsor
+            tracks (list): Track dicts with id, name, length, type
+            seed (int): Seed for every random choice in the race
+            field_size (int): Cars in the race, defaults to every driver; larger fields add synthetic drivers
+            laps_in_race (int): Scheduled race length
+            series_id (int): series_id reported in the feed
+            race_id (int): race_id reported in the feed, drawn from the seed by default
+        """
+        self.tracks = tracks
+        self.seed = seed
+        self.field_size = field_size or len(drivers)
+        self.drivers = field_drivers(drivers, self.field_size)
+        self.laps_in_race = laps_in_race
+        self.series_id = series_id
+        self.fixed_race_id = race_id
+        self.reset()
+
+    def reset(self):
+        """Rebuild the race from its seed at elapsed time 0"""
+        self.rng = random.Random(self.seed)
+        rng = self.rng
+
+        self.track = rng.choice(self.tracks)
+        self.race_id = rng.randint(5000, 6000)
+        if self.fixed_race_id is not None:
+            self.race_id = self.fixed_race_id
+        self.base_lap_time = self.track["length"] / TYPE_SPEEDS.get(self.track["type"], 120.0) * 3600
+
+        self.elapsed = 0.0
+        self.flag_state = FLAG_GREEN
+        self.stage_num = 1
+        self.caution_end_lap = None
+        self.caution_pits_open = False
+        self.red_remaining = 0.0
+        self.caution_segments = 0
+        self.caution_laps = 0
+        self.lead_changes = 0
+        self.leader_ids = set()
+        self.leader_laps_completed = 0
+        self.leader_id = None
+
+        size = self.field_size
+        self.progress = self._column(size, 0.0, float)
+        self.lap_time = self._column(size, self.base_lap_time, float)
+        self.pit_remaining = self._column(size, 0.0, float)
+        self.laps = self._column(size, 0, int)
+        self.active = self._column(size, True, bool)
+        self.rank = self._column(size, 0, int)
+        self.passes_made = self._column(size, 0, int)
+        self.times_passed = self._column(size, 0, int)
+        self.quality_passes = self._column(size, 0, int)
+
+        order = list(range(size))
+        rng.shuffle(order)
+        self.cars = []
+        for start_position, driver_index in enumerate(order, start=1):
+            index = start_position - 1
+            # Staggered grid, a few hundredths of a lap apart
+            self.progress[index] = -start_position * RESTART_SPACING
+            self.rank[index] = start_position
+            car = {
+                "index": index,
+                "driver": self.drivers[driver_index],
+                "skill": rng.gauss(0.0, 0.004) * self.base_lap_time,
+                "starting_position": start_position,
+                "lap_started": 0.0,
+                "laps_completed": 0,
+                "last_lap_time": 0.0,
+                "best_lap_time": 0.0,
+                "best_lap": 0,
+                "last_lap_speed": 0.0,
+                "best_lap_speed": 0.0,
+                "speed_sum": 0.0,
+                "status": STATUS_RUNNING,
+                "is_on_track": True,
+                "is_on_dvp": False,
+                "pit_stops": [],
+                "last_pit_lap": 0,
+                "next_pit_lap": rng.randint(*FUEL_WINDOW_LAPS),
+                "fastest_laps_run": 0,
+                "laps_position_improved": 0,
+                "laps_led": [],
+                "position_sum": 0,
+                "position_samples": 0,
+                "lap_start_rank": start_position,
+                # Serialized per-lap fields, rebuilt after anything in them changes
+                "lap_json": None
+            }
+            self._new_lap_time(car)
+            self.cars.append(car)
+        self._rank()
+
+    def _column(self, size, value, kind):
+        """Per-car column: a numpy array when available, else a list"""
+        if np is not None:
+            return np.full(size, value, dtype=kind)
+        return [value] * size
+
+    def _new_lap_time(self, car):
+        """Draw a car's pace for the lap it is starting"""
+        tire_wear = 0.0015 * (car["laps_completed"] - car["last_pit_lap"])
+        noise = self.rng.gauss(0.0, 0.003)
+        self.lap_time[car["index"]] = self.base_lap_time * (1.0 + noise + tire_wear) + car["skill"]
+
+    def running(self):
+        return [car for car in self.cars if car["status"] != STATUS_OUT]
+
+    def advance_to(self, elapsed):
+        """Step the race to the given elapsed time, rebuilding from the seed to go backwards"""
+        if elapsed < self.elapsed:
+            self.reset()
+        while self.elapsed + TICK_SECONDS <= elapsed:
+            self.step(TICK_SECONDS)
+
+    def step(self, dt):
+        """Advance the race by dt seconds"""
+        self.elapsed += dt
+        if self.flag_state == FLAG_CHECKERED:
+            return
+
+        if self.flag_state == FLAG_RED:
+            self.red_remaining -= dt
+            if self.red_remaining <= 0:
+                self.flag_state = FLAG_CAUTION
+            return
+
+        pitted_out, completed = self._advance(dt)
+        self._rank()
+        for index in pitted_out:
+            self._pit_out(self.cars[index])
+        for index in completed:
+            car = self.cars[index]
+            while int(self.progress[index]) > car["laps_completed"]:
+                self._complete_lap(car)
+
+        leader = self.cars[self.order[0]]
+        if leader["laps_completed"] > self.leader_laps_completed:
+            self.leader_laps_completed = leader["laps_completed"]
+            self._leader_lap_completed(leader)
+
+    def _advance(self, dt):
+        """
+        Move every running car dt seconds along the track
+
+        Returns:
+            tuple: (indexes of cars that left pit road, indexes of cars that started a new lap)
+        """
+        pit_pace = self.base_lap_time * PIT_LANE_PACE
+        caution_pace = self.base_lap_time * CAUTION_PACE
+
+        if np is not None:
+            pitting = self.active & (self.pit_remaining > 0)
+            self.pit_remaining[pitting] -= dt
+            if self.flag_state == FLAG_CAUTION:
+                pace = np.full(len(self.cars), caution_pace)
+            else:
+                pace = self.lap_time.copy()
+            pace[pitting] = pit_pace
+            self.progress[self.active] += dt / pace[self.active]
+            pitted_out = np.flatnonzero(pitting & (self.pit_remaining <= 0)).tolist()
+            completed = np.flatnonzero(self.active & (np.floor(self.progress) > self.laps)).tolist()
+            return pitted_out, completed
+
+        pitted_out = []
+        completed = []
+        for index in range(len(self.cars)):
+            if not self.active[index]:
+                continue
+            if self.pit_remaining[index] > 0:
+                self.pit_remaining[index] -= dt
+                self.progress[index] += dt / pit_pace
+                if self.pit_remaining[index] <= 0:
+                    pitted_out.append(index)
+            elif self.flag_state == FLAG_CAUTION:
+                self.progress[index] += dt / caution_pace
+            else:
+                self.progress[index] += dt / self.lap_time[index]
+            if int(self.progress[index]) > self.laps[index]:
+                completed.append(index)
+        return pitted_out, completed
+
+    def _rank(self):
+        """Order the field and count passes made under green"""
+        green = self.flag_state == FLAG_GREEN
+        if np is not None:
+            running = np.flatnonzero(self.active)
+            running = running[np.argsort(-self.progress[running], kind='stable')]
+            out = np.flatnonzero(~self.active)
+            out = out[np.argsort(-self.laps[out], kind='stable')]
+            order = np.concatenate([running, out])
+            rank = np.empty(len(order), dtype=int)
+            rank[order] = np.arange(1, len(order) + 1)
+            if green:
+                change = self.rank - rank
+                eligible = self.active & (self.pit_remaining <= 0)
+                gained = eligible & (change > 0)
+                self.passes_made[gained] += change[gained]
+                quality = gained & (rank <= 15)
+                self.quality_passes[quality] += change[quality]
+                lost = eligible & (change < 0)
+                self.times_passed[lost] -= change[lost]
+            self.rank = rank
+            self.order = order.tolist()
+        else:
+            indexes = range(len(self.cars))
+            running = sorted((i for i in indexes if self.active[i]), key=lambda i: self.progress[i], reverse=True)
+            out = sorted((i for i in indexes if not self.active[i]), key=lambda i: self.laps[i], reverse=True)
+            self.order = running + out
+            for rank, index in enumerate(self.order, start=1):
+                change = self.rank[index] - rank
+                if green and self.active[index] and self.pit_remaining[index] <= 0:
+                    if change > 0:
+                        self.passes_made[index] += change
+                        if rank <= 15:
+                            self.quality_passes[index] += change
+                    elif change < 0:
+                        self.times_passed[index] -= change
+                self.rank[index] = rank
+
+        leader = self.cars[self.order[0]]
+        if leader["driver"]["id"] != self.leader_id:
+            if self.leader_id is not None and green:
+                self.lead_changes += 1
+            self.leader_id = leader["driver"]["id"]
+            self.leader_ids.add(self.leader_id)
+
+    def car_rank(self, car):
+        return int(self.rank[car["index"]])
+
+    def _complete_lap(self, car):
+        index = car["index"]
+        car["lap_json"] = None
+        car["laps_completed"] += 1
+        self.laps[index] = car["laps_completed"]
+        lap_time = self.elapsed - car["lap_started"]
+        car["lap_started"] = self.elapsed
+        car["last_lap_time"] = round(lap_time, 3)
+        car["last_lap_speed"] = round(self.track["length"] / lap_time * 3600, 3) if lap_time > 0 else 0.0
+        car["speed_sum"] += car["last_lap_speed"]
+        if self.flag_state == FLAG_GREEN and self.pit_remaining[index] <= 0 and car["laps_completed"] > 1:
+            if car["best_lap_time"] == 0.0 or lap_time < car["best_lap_time"]:
+                car["best_lap_time"] = round(lap_time, 3)
+                car["best_lap"] = car["laps_completed"]
+                car["best_lap_speed"] = car["last_lap_speed"]
+        rank = self.car_rank(car)
+        if rank < car["lap_start_rank"]:
+            car["laps_position_improved"] += 1
+        car["lap_start_rank"] = rank
+        self._new_lap_time(car)
+
+        # Scheduled green flag stop when the tank runs low
+        if self.flag_state == FLAG_GREEN and self.pit_remaining[index] <= 0 and car["laps_completed"] >= car["next_pit_lap"]:
+            self._pit_in(car)
+
+    def _leader_lap_completed(self, leader):
+        lap = self.leader_laps_completed
+
+        # Laps led, merged into spans
+        spans = leader["laps_led"]
+        if spans and spans[-1]["end_lap"] == lap - 1:
+            spans[-1]["end_lap"] = lap
+        else:
+            spans.append({"start_lap": lap, "end_lap": lap})
+
+        for car in self.running():
+            car["lap_json"] = None
+            car["position_sum"] += self.car_rank(car)
+            car["position_samples"] += 1
+
+        fastest = min((car for car in self.running() if car["last_lap_time"] > 0),
+                      key=lambda car: car["last_lap_time"], default=None)
+        if fastest is not None and self.flag_state == FLAG_GREEN:
+            fastest["fastest_laps_run"] += 1
+
+        if lap >= self.laps_in_race:
+            self.flag_state = FLAG_CHECKERED
+            return
+
+        if self.flag_state == FLAG_CAUTION:
+            self.caution_laps += 1
+            if self.caution_pits_open:
+                # Pit road opens on the first lap behind the pace car
+                self.caution_pits_open = False
+                for car in self.running():
+                    if (self.pit_remaining[car["index"]] <= 0 and car["laps_completed"] - car["last_pit_lap"] >= CAUTION_PIT_MIN_LAPS
+                            and self.rng.random() < CAUTION_PIT_CHANCE):
+                        self._pit_in(car)
+            if lap >= self.caution_end_lap:
+                self._restart()
+            return
+
+        if self.stage_num <= len(STAGE_ENDS) and lap >= STAGE_ENDS[self.stage_num - 1]:
+            self.stage_num += 1
+            self._caution(STAGE_CAUTION_LAPS)
+        elif self.rng.random() < CAUTION_CHANCE:
+            self._incident()
+            if self.rng.random() < RED_FLAG_CHANCE:
+                self.flag_state = FLAG_RED
+                self.red_remaining = self.rng.uniform(*RED_FLAG_SECONDS)
+                self.caution_end_lap = lap + self.rng.randint(*CAUTION_LAPS)
+                self.caution_segments += 1
+                self.caution_pits_open = True
+            else:
+                self._caution(self.rng.randint(*CAUTION_LAPS))
+
+    def _caution(self, laps):
+        self.flag_state = FLAG_CAUTION
+        self.caution_end_lap = self.leader_laps_completed + laps
+        self.caution_segments += 1
+        self.caution_pits_open = True
+
+    def _incident(self):
+        """One to three cars crash; some are out, the rest continue under damaged vehicle policy"""
+        running = self.running()
+        for car in self.rng.sample(running, min(len(running), self.rng.randint(1, 3))):
+            car["lap_json"] = None
+            if self.rng.random() < 0.3:
+                car["status"] = STATUS_OUT
+                car["is_on_track"] = False
+                self.active[car["index"]] = False
+                self.pit_remaining[car["index"]] = 0.0
+            else:
+                car["is_on_dvp"] = True
+
+    def _restart(self):
+        """Pack the field up behind the leader and go green"""
+        leader_progress = float(self.progress[self.order[0]])
+        for car in self.running():
+            index = car["index"]
+            laps_down = int(leader_progress - self.progress[index])
+            self.progress[index] = leader_progress - laps_down - self.car_rank(car) * RESTART_SPACING
+        self.flag_state = FLAG_GREEN
+        self.caution_end_lap = None
+
+    def _pit_in(self, car):
+        car["lap_json"] = None
+        self.pit_remaining[car["index"]] = self.rng.uniform(*PIT_ROAD_SECONDS)
+        car["status"] = STATUS_PIT
+        car["pit_stops"].append({
+            "positions_gained_lossed": 0,
+            "pit_in_elapsed_time": round(self.elapsed, 3),
+            "pit_in_lap_count": car["laps_completed"],
+            "pit_in_leader_lap": self.leader_laps_completed,
+            "pit_out_elapsed_time": 0,
+            "pit_in_rank": self.car_rank(car),
+            "pit_out_rank": 0
+        })
+
+    def _pit_out(self, car):
+        car["lap_json"] = None
+        self.pit_remaining[car["index"]] = 0.0
+        car["status"] = STATUS_RUNNING
+        car["last_pit_lap"] = car["laps_completed"]
+        car["next_pit_lap"] = car["laps_completed"] + self.rng.randint(*FUEL_WINDOW_LAPS)
+        car["is_on_dvp"] = False
+        rank = self.car_rank(car)
+        stop = car["pit_stops"][-1]
+        stop["pit_out_elapsed_time"] = round(self.elapsed, 3)
+        stop["pit_out_rank"] = rank
+        stop["positions_gained_lossed"] = stop["pit_in_rank"] - rank
+
+    def _tick_fields(self, car):
+        """Vehicle fields that can change on any tick"""
+        index = car["index"]
+        leader = self.order[0]
+        gap = float(self.progress[leader] - self.progress[index])
+        if index == leader:
+            delta = 0.0
+        elif gap >= 1.0:
+            delta = -float(int(gap))
+        else:
+            delta = round(gap * self.base_lap_time, 1)
+
+        passes_made = int(self.passes_made[index])
+        times_passed = int(self.times_passed[index])
+        return {
+            "running_position": int(self.rank[index]),
+            "delta": delta,
+            "passes_made": passes_made,
+            "times_passed": times_passed,
+            "quality_passes": int(self.quality_passes[index]),
+            "passing_differential": passes_made - times_passed
+        }
+
+    def _lap_fields(self, car):
+        """Vehicle fields that only change when a lap completes, a car pits or crashes"""
+        driver = car["driver"]
+        laps = max(1, car["laps_completed"])
+        return {
+            "average_restart_speed": round(car["best_lap_speed"] * 0.97, 3),
+            "average_running_position": round(car["position_sum"] / car["position_samples"], 2) if car["position_samples"] else car["starting_position"],
+            "average_speed": round(car["speed_sum"] / laps, 3),
+            "best_lap": car["best_lap"],
+            "best_lap_speed": car["best_lap_speed"],
+            "best_lap_time": car["best_lap_time"],
+            "vehicle_manufacturer": driver["manufacturer"],
+            "vehicle_number": driver["number"],
+            "driver": {
+                "driver_id": driver["id"],
+                "full_name": f"{driver['first_name']} {driver['last_name']}",
+                "first_name": driver["first_name"],
+                "last_name": driver["last_name"],
+                "is_in_chase": False
+            },
+            "vehicle_elapsed_time": round(car["lap_started"], 3),
+            "fastest_laps_run": car["fastest_laps_run"],
+            "laps_position_improved": car["laps_position_improved"],
+            "laps_completed": car["laps_completed"],
+            "laps_led": [dict(span) for span in car["laps_led"]],
+            "last_lap_speed": car["last_lap_speed"],
+            "last_lap_time": car["last_lap_time"],
+            "position_differential_last_10_percent": 0,
+            "pit_stops": [dict(stop) for stop in car["pit_stops"]],
+            "qualifying_status": 0,
+            "status": car["status"],
+            "sponsor_name": driver["sponsor"],
+            "starting_position": car["starting_position"],
+            "is_on_track": car["is_on_track"],
+            "is_on_dvp": car["is_on_dvp"]
+        }
+
+    def vehicle(self, car):
+        """Live feed vehicle dict for a car"""
+        vehicle = self._tick_fields(car)
+        vehicle.update(self._lap_fields(car))
+        return vehicle
+
+    def vehicle_json(self, car):
+        """
+        Live feed vehicle for a car, serialized
+
+        The per-lap fields are serialized once per lap and reused, so a tick
+        only formats the handful of fields that move every second.
+        """
+        if car["lap_json"] is None:
+            car["lap_json"] = json.dumps(self._lap_fields(car), separators=(',', ':'))[1:-1]
+        tick = self._tick_fields(car)
+        return (f'{{"running_position":{tick["running_position"]},"delta":{tick["delta"]!r},'
+                f'"passes_made":{tick["passes_made"]},"times_passed":{tick["times_passed"]},'
+                f'"quality_passes":{tick["quality_passes"]},"passing_differential":{tick["passing_differential"]},'
+                f'{car["lap_json"]}}}')
+
+    def snapshot(self):
+        """The complete live feed payload for the current state"""
+        payload = self._race_fields()
+        payload["vehicles"] = [self.vehicle(self.cars[index]) for index in self.order]
+        return payload
+
+    def snapshot_json(self):
+        """The complete live feed payload for the current state as UTF-8 JSON, built from cached vehicle fragments"""
+        race = json.dumps(self._race_fields(), separators=(',', ':'))
+        vehicles = ','.join([self.vehicle_json(self.cars[index]) for index in self.order])
+        return (race[:-1] + ',"vehicles":[' + vehicles + ']}').encode('utf-8')
+
+    def _race_fields(self):
+        """Everything in the payload except vehicles"""
+        lap_number = min(self.laps_in_race, self.leader_laps_completed + 1)
+        if self.stage_num <= len(STAGE_ENDS):
+            finish_at_lap = STAGE_ENDS[self.stage_num - 1]
+            laps_in_stage = finish_at_lap - (STAGE_ENDS[self.stage_num - 2] if self.stage_num > 1 else 0)
+        else:
+            finish_at_lap = self.laps_in_race
+            laps_in_stage = self.laps_in_race - STAGE_ENDS[-1]
+
+        now = SIM_EPOCH + timedelta(seconds=self.elapsed)
+        third = self.order[min(2, len(self.order) - 1)]
+        avg_diff_1to3 = int((self.progress[self.order[0]] - self.progress[third]) * self.base_lap_time * 1000)
+
+        return {
+            "lap_number": lap_number,
+            "elapsed_time": int(self.elapsed),
+            "flag_state": self.flag_state,
+            "race_id": self.race_id,
+            "laps_in_race": self.laps_in_race,
+            "laps_to_go": max(0, self.laps_in_race - self.leader_laps_completed),
+            "run_id": 1,
+            "run_name": f"Mock Race at {self.track['name']}",
+            "series_id": self.series_id,
+            "time_of_day": now.hour * 3600 + now.minute * 60 + now.second,
+            "time_of_day_os": now.isoformat(timespec='milliseconds'),
+            "track_id": self.track["id"],
+            "track_length": self.track["length"],
+            "track_name": self.track["name"],
+            "run_type": 3,
+            "number_of_caution_segments": self.caution_segments,
+            "number_of_caution_laps": self.caution_laps,
+            "number_of_lead_changes": self.lead_changes,
+            "number_of_leaders": len(self.leader_ids),
+            "avg_diff_1to3": avg_diff_1to3,
+            "stage": {
+                "stage_num": min(self.stage_num, len(STAGE_ENDS) + 1),
+                "finish_at_lap": finish_at_lap,
+                "laps_in_stage": laps_in_stage
+            }
+        }
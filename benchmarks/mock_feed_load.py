@@ -0,0 +1,91 @@
+"""
+Load generator for the mock live feed
+
+Runs concurrent pollers against /live-feed for a fixed duration and reports
+the achieved requests per second, status mix and latency percentiles. Each
+poller sends If-None-Match with the last ETag it saw, like the publisher does.
+
+Start the mock first, e.g. python backend/mock_live_feed.py --load-test
+Usage: python benchmarks/mock_feed_load.py [--url URL] [--clients 64] [--duration 10] [--gzip]
+"""
+import argparse
+import sys
+import threading
+import time
+from collections import Counter
+
+import urllib3
+
+DEFAULT_URL = "http://127.0.0.1:5000/live-feed"
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def poll(url, deadline, use_gzip, conditional, latencies, statuses, lock):
+    """Poll url back to back until deadline"""
+    http = urllib3.PoolManager(maxsize=1)
+    headers = {"Accept-Encoding": "gzip"} if use_gzip else {}
+    local_latencies = []
+    local_statuses = Counter()
+    etag = None
+
+    while time.perf_counter() < deadline:
+        request_headers = dict(headers)
+        if conditional and etag:
+            request_headers["If-None-Match"] = etag
+        started = time.perf_counter()
+        try:
+            # decode_content=False: measure the server, not client-side decompression
+            response = http.request('GET', url, headers=request_headers, decode_content=False, timeout=10)
+            etag = response.headers.get("ETag") or etag
+            local_statuses[response.status] += 1
+        except Exception as e:
+            local_statuses[type(e).__name__] += 1
+        local_latencies.append((time.perf_counter() - started) * 1000)
+
+    with lock:
+        latencies.extend(local_latencies)
+        statuses.update(local_statuses)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default=DEFAULT_URL)
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--gzip', action='store_true', help='send Accept-Encoding: gzip')
+    parser.add_argument('--unconditional', action='store_true', help="don't send If-None-Match")
+    args = parser.parse_args()
+
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+    threads = [
+        threading.Thread(target=poll, args=(args.url, deadline, args.gzip, not args.unconditional, latencies, statuses, lock))
+        for _ in range(args.clients)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    if not latencies:
+        print("No requests completed")
+        return 1
+
+    print(f"{len(latencies)} requests from {args.clients} clients in {elapsed:.1f}s: {len(latencies) / elapsed:.0f} req/s")
+    print("Statuses: " + ", ".join(f"{status}={count}" for status, count in sorted(statuses.items(), key=str)))
+    print(f"Latency ms: p50 {percentile(latencies, 50):.2f}  p95 {percentile(latencies, 95):.2f}  p99 {percentile(latencies, 99):.2f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
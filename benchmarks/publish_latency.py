@@ -0,0 +1,222 @@
+"""
+End-to-end publish latency benchmark for LiveFeedToR2.update_r2()
+
+Serves payloads generated by backend/mock_live_feed.py (expanded to larger
+synthetic fields) from a local feed server, publishes them to the local R2
+stand-in in backend/mock_r2.py, and reports p50/p95/p99 per stage. Each run
+is appended to a JSON-lines history file and compared with the previous run
+for the same field size.
+
+Usage: python benchmarks/publish_latency.py [--sizes 40 200 1000 5000] [--iterations 30]
+"""
+import argparse
+import contextlib
+import copy
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, 'jobs'), os.path.join(ROOT, 'backend')]
+
+from fetch_live_feed import LiveFeedToR2  # noqa: E402
+import instrumentation  # noqa: E402
+from mock_r2 import start_mock_r2  # noqa: E402
+import mock_live_feed  # noqa: E402
+
+DEFAULT_SIZES = [40, 200, 1000, 5000]
+DEFAULT_ITERATIONS = 30
+
+# Distinct payloads per size, cycled so every poll has something to publish. Each is the
+# simulated race at a fixed time, so runs publish identical data; every poll gets the next
+# lap_number so the publisher never drops one as older than what it already published.
+PAYLOAD_VARIANTS = 5
+PAYLOAD_START = 1200
+PAYLOAD_SPACING = 10
+
+DEFAULT_HISTORY = os.path.join(ROOT, 'benchmarks', 'publish_latency_history.jsonl')
+
+
+def synthetic_payload(size, elapsed):
+    """The mock live feed at elapsed race seconds with its field expanded to size vehicles"""
+    payload = mock_live_feed.app.test_client().get(f'/live-feed?t={elapsed}').get_json()
+    template = payload["vehicles"]
+    vehicles = []
+    for i in range(size):
+        vehicle = copy.deepcopy(template[i % len(template)])
+        vehicle["driver"]["driver_id"] = 100000 + i
+        vehicle["vehicle_number"] = str(i)
+        vehicle["running_position"] = i + 1
+        vehicles.append(vehicle)
+    payload["vehicles"] = vehicles
+    return payload
+
+
+def start_feed_server(payloads, polls):
+    """Serve polls pre-encoded bodies cycling through payloads with increasing lap_number; returns (server, url)"""
+    bodies = [
+        json.dumps(dict(payloads[i % len(payloads)], lap_number=i + 1)).encode('utf-8')
+        for i in range(polls)
+    ]
+    counter = {"next": 0}
+    lock = threading.Lock()
+
+    class FeedHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out as separate writes; don't let Nagle hold the body back
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            with lock:
+                body = bodies[counter["next"] % len(bodies)]
+                counter["next"] += 1
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FeedHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/live-feed"
+
+
+def collect_timings(metrics, timings):
+    """
+    Add one tick's stage and per-object upload timings from TickMetrics
+
+    Returns:
+        bool: False, with nothing added, if the tick published nothing
+            (unchanged, dropped as stale, or skipped for a busy lease)
+    """
+    record, uploads = metrics.as_record()
+    if not record.get("artifacts_changed") or record.get("stale_dropped") or record.get("lease_busy"):
+        return False
+    for stage in ("fetch", "decode", "lease", "extract", "leaderboard_csv", "metadata_csv", "encode", "upload",
+                  "manifest", "total"):
+        if stage in record:
+            timings.setdefault(stage, []).append(record[stage])
+    for upload in uploads:
+        timings.setdefault(f"upload:{upload['key'].rsplit('/', 1)[-1]}", []).append(upload["duration_ms"])
+    return True
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(timings):
+    return {
+        stage: {
+            "count": len(values),
+            "p50": round(percentile(values, 50), 3),
+            "p95": round(percentile(values, 95), 3),
+            "p99": round(percentile(values, 99), 3)
+        }
+        for stage, values in sorted(timings.items())
+    }
+
+
+def run_size(size, iterations, api_base):
+    """
+    Publish iterations snapshots of a size-vehicle field and summarize stage timings
+
+    Returns:
+        tuple: (stage summaries, number of ticks that published)
+    """
+    payloads = [synthetic_payload(size, PAYLOAD_START + i * PAYLOAD_SPACING) for i in range(PAYLOAD_VARIANTS)]
+    feed_server, feed_url = start_feed_server(payloads, iterations + 1)
+    try:
+        # A bucket per size, so no run starts from another size's published manifest
+        r2_config = {'account_id': 'bench', 'api_token': 'bench', 'bucket': f'bench-{size}', 'api_base': api_base}
+        timings = {}
+        published = 0
+        with contextlib.redirect_stdout(io.StringIO()):
+            publisher = LiveFeedToR2(feed_url, r2_config)
+            # One untimed tick to warm the connection pool
+            publisher.update_r2()
+            for _ in range(iterations):
+                publisher.update_r2()
+                published += collect_timings(publisher.last_metrics, timings)
+        return summarize(timings), published
+    finally:
+        feed_server.shutdown()
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as history:
+        return [json.loads(line) for line in history if line.strip()]
+
+
+def print_report(record, previous):
+    print(f"\nField size {record['size']} ({record['published']} of {record['iterations']} ticks published)")
+    print(f"{'stage':<34}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'p50 vs last':>14}")
+    for stage, stats in record["stages"].items():
+        change = ""
+        if previous and stage in previous["stages"] and previous["stages"][stage]["p50"] > 0:
+            delta = stats["p50"] / previous["stages"][stage]["p50"] - 1
+            change = f"{delta:+.1%}"
+        print(f"{stage:<34}{stats['p50']:>10.2f}{stats['p95']:>10.2f}{stats['p99']:>10.2f}{change:>14}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument('--history', default=DEFAULT_HISTORY, help='JSON-lines file results are appended to')
+    args = parser.parse_args()
+
+    # Timings are read from each tick's TickMetrics rather than its log line
+    instrumentation.METRICS_FORMAT = 'off'
+    r2_server, store, api_base = start_mock_r2()
+    history = load_history(args.history)
+    commit = git_commit()
+
+    try:
+        for size in args.sizes:
+            stages, published = run_size(size, args.iterations, api_base)
+            record = {
+                "timestamp": datetime.now().isoformat(),
+                "commit": commit,
+                "size": size,
+                "iterations": args.iterations,
+                "published": published,
+                "stages": stages
+            }
+            previous = next((entry for entry in reversed(history) if entry["size"] == size), None)
+            print_report(record, previous)
+
+            with open(args.history, 'a') as output:
+                output.write(json.dumps(record) + "\n")
+            history.append(record)
+    finally:
+        r2_server.shutdown()
+
+    print(f"\nR2 stand-in received {store.requests} requests, {store.bytes_received} bytes")
+    print(f"Results appended to {args.history}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""
+Fan-out latency benchmark for backend/live_stream.py
+
+Starts the stream server in a subprocess (or targets --url), opens many idle
+Server-Sent Events connections, then publishes leaderboard patches the way
+LiveFeedToR2 does and measures, per delivered event, the time from publish to
+receipt by each client. Reports delivery counts and latency percentiles.
+
+Usage: python benchmarks/stream_fanout.py [--clients 2000] [--publishes 20] [--interval 0.5] [--rows 40]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+
+from live_stream import raise_file_limit  # noqa: E402
+
+# Connections opened at once while ramping up clients
+CONNECT_BATCH = 500
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+async def client(host, port, latencies, connected, expected, done):
+    """One SSE client recording publish-to-receipt latency of every patch event"""
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET /stream HTTP/1.1\r\nHost: {host}\r\nAccept: text/event-stream\r\n\r\n".encode('latin-1'))
+    await writer.drain()
+    await reader.readuntil(b"\r\n\r\n")
+    connected.append(1)
+    received = 0
+    try:
+        while received < expected:
+            line = await reader.readline()
+            if not line:
+                break
+            if line.startswith(b"data: "):
+                now = time.time()
+                payload = json.loads(line[6:])
+                if "published_at" in payload:
+                    latencies.append((now - payload["published_at"]) * 1000)
+                    received += 1
+    finally:
+        writer.close()
+        done.append(received)
+
+
+async def post(host, port, message):
+    body = json.dumps(message, separators=(',', ':')).encode('utf-8')
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(
+        f"POST /publish HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    writer.close()
+    return status
+
+
+def patches(rows, count, seed=0):
+    """A full leaderboard followed by count patches, each changing a few drivers' timing fields"""
+    rng = random.Random(seed)
+    board = {
+        str(1000 + i): {"running_position": i + 1, "last_lap_time": 30.0, "delta": 0.0, "full_name": f"Driver {i}"}
+        for i in range(rows)
+    }
+    yield {"from_version": None, "to_version": 1, "changed": board, "removed": []}
+    for version in range(2, count + 2):
+        changed = {
+            driver_id: {"last_lap_time": round(rng.uniform(29.5, 31.0), 3), "delta": round(rng.uniform(0, 5), 3)}
+            for driver_id in rng.sample(sorted(board), min(rows, 5))
+        }
+        yield {"from_version": version - 1, "to_version": version, "changed": changed, "removed": []}
+
+
+def start_server():
+    """Run backend/live_stream.py on a free port in its own process; returns (process, port)"""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'backend', 'live_stream.py'), '--host', '127.0.0.1', '--port', str(port)],
+        stdout=subprocess.DEVNULL
+    )
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return process, port
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("stream server did not start")
+
+
+async def run(args, host, port):
+    limit = raise_file_limit()
+
+    latencies, connected, done = [], [], []
+    # Every client gets the initial snapshot plus each patch
+    expected = args.publishes + 1
+    tasks = []
+    for start in range(0, args.clients, CONNECT_BATCH):
+        for _ in range(min(CONNECT_BATCH, args.clients - start)):
+            tasks.append(asyncio.create_task(client(host, port, latencies, connected, expected, done)))
+        await asyncio.sleep(0.05)
+    while len(connected) < args.clients and not any(task.done() and task.exception() for task in tasks):
+        await asyncio.sleep(0.05)
+    print(f"{len(connected)} clients connected (open file limit {limit})")
+
+    started = time.perf_counter()
+    for message in patches(args.rows, args.publishes):
+        message["published_at"] = time.time()
+        status = await post(host, port, message)
+        if status != 200:
+            print(f"Publish of version {message['to_version']} returned {status}")
+        await asyncio.sleep(args.interval)
+
+    await asyncio.wait(tasks, timeout=args.interval * 4 + 5)
+    elapsed = time.perf_counter() - started
+    for task in tasks:
+        task.cancel()
+
+    delivered = len(latencies)
+    print(f"Delivered {delivered} of {args.clients * expected} events in {elapsed:.1f}s")
+    if latencies:
+        print(f"Fan-out latency ms: p50 {percentile(latencies, 50):.1f}  p95 {percentile(latencies, 95):.1f}  "
+              f"p99 {percentile(latencies, 99):.1f}  max {max(latencies):.1f}")
+    return 0 if delivered == args.clients * expected else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', help='Running stream server, e.g. http://localhost:5002 (default: start one in a subprocess)')
+    parser.add_argument('--clients', type=int, default=2000)
+    parser.add_argument('--publishes', type=int, default=20)
+    parser.add_argument('--interval', type=float, default=0.5, help='Seconds between publishes')
+    parser.add_argument('--rows', type=int, default=40, help='Drivers in the leaderboard')
+    args = parser.parse_args()
+
+    process = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        process, port = start_server()
+        host = "127.0.0.1"
+    try:
+        return asyncio.run(run(args, host, port))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
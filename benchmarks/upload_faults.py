@@ -0,0 +1,91 @@
+"""
+Upload resilience benchmark for jobs/resilient_upload.py
+
+Runs concurrent PUTs against the local R2 stand-in in backend/mock_r2.py with
+injected latency, 503s and dropped connections, once as single attempts and
+once through ResilientUploader, and reports success rate, latency percentiles,
+retries, hedges and circuit breaker rejections for each.
+
+Usage: python benchmarks/upload_faults.py [--uploads 400] [--latency 1.5 --latency-rate 0.05] [--error-rate 0.05] [--drop-rate 0.02]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import urllib3
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, 'jobs'), os.path.join(ROOT, 'backend')]
+
+from mock_r2 import FaultInjector, start_mock_r2  # noqa: E402
+from resilient_upload import CircuitBreaker, ResilientUploader  # noqa: E402
+
+# Concurrent uploads, matching LiveFeedToR2's UPLOAD_WORKERS
+CONCURRENCY = 4
+BODY = b"x" * 4096
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def run(uploader, url, uploads):
+    """PUT uploads objects through uploader; returns per-upload (ok, seconds, retries, hedges, rejected)"""
+    def one(index):
+        started = time.perf_counter()
+        result = uploader.put(f"{url}/object-{index}", BODY, {'Content-Type': 'application/octet-stream'})
+        rejected = result.status is None and "circuit open" in str(result.error)
+        return result.ok, time.perf_counter() - started, result.retries, result.hedges, rejected
+
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
+        return list(executor.map(one, range(uploads)))
+
+
+def report(name, outcomes):
+    durations = [seconds * 1000 for _, seconds, _, _, _ in outcomes]
+    succeeded = sum(1 for ok, *_ in outcomes if ok)
+    print(f"{name:<12}{succeeded / len(outcomes):>9.1%}"
+          f"{percentile(durations, 50):>10.1f}{percentile(durations, 99):>10.1f}{max(durations):>10.1f}"
+          f"{sum(o[2] for o in outcomes):>9}{sum(o[3] for o in outcomes):>8}{sum(o[4] for o in outcomes):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--uploads', type=int, default=400)
+    parser.add_argument('--latency', type=float, default=1.5)
+    parser.add_argument('--latency-rate', type=float, default=0.05)
+    parser.add_argument('--error-rate', type=float, default=0.05)
+    parser.add_argument('--drop-rate', type=float, default=0.02)
+    parser.add_argument('--read-timeout', type=float, default=1.0, help='Per-attempt read timeout in seconds')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    faults = FaultInjector(args.latency, args.latency_rate, args.error_rate, args.drop_rate, args.seed)
+    server, store, api_base = start_mock_r2(faults=faults)
+    url = f"{api_base}/accounts/bench/r2/buckets/bench/objects"
+    timeout = urllib3.Timeout(connect=1.0, read=args.read_timeout)
+    http = urllib3.PoolManager(maxsize=CONCURRENCY * 2)
+
+    print(f"{'mode':<12}{'success':>9}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}{'retries':>9}{'hedges':>8}{'rejected':>10}")
+    try:
+        # Single attempts with the per-attempt timeout, no breaker
+        single = ResilientUploader(http, max_attempts=1, timeout=timeout, hedge=False,
+                                   breaker=CircuitBreaker(threshold=args.uploads + 1))
+        report("single", run(single, url, args.uploads))
+
+        resilient = ResilientUploader(http, timeout=timeout, max_workers=CONCURRENCY * 2)
+        report("resilient", run(resilient, url, args.uploads))
+    finally:
+        server.shutdown()
+
+    print(f"\nInjected faults: {faults.injected}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,41 @@
+import os
+
+# Versioned objects are never rewritten once published, so any cache may keep them for a year
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Key segment every immutable versioned object lives under (see versioned_key)
+VERSIONED_SEGMENT = "v"
+
+# Bounds in seconds on the TTL of mutable objects (manifest.json, latest.json, views)
+POINTER_MIN_TTL = 1
+POINTER_MAX_TTL = 60
+
+# Seconds a replaced versioned object stays readable before it is deleted, so readers
+# still holding an older manifest or pointer can finish fetching what it names
+VERSION_RETENTION = int(os.getenv('VERSION_RETENTION', '600'))
+
+# Most retired objects deleted on one tick, so garbage collection never stretches a tick
+MAX_DELETES_PER_TICK = 50
+
+
+def is_immutable_key(key):
+    """Whether key is a versioned object, i.e. has a v/{version}-{digest}/ segment"""
+    segment = f"{VERSIONED_SEGMENT}/"
+    return key.startswith(segment) or f"/{segment}" in key
+
+
+def pointer_ttl(poll_interval):
+    """
+    TTL for mutable objects given the seconds until the next poll
+
+    Half the poll interval, so a cached pointer is always replaced within one
+    tick of a new version being published.
+    """
+    return max(POINTER_MIN_TTL, min(POINTER_MAX_TTL, int(poll_interval // 2)))
+
+
+def cache_control(key, ttl):
+    """Cache-Control for an object: immutable for versioned keys, ttl seconds for everything else"""
+    if is_immutable_key(key):
+        return IMMUTABLE_CACHE_CONTROL
+    return f"public, max-age={ttl}, s-maxage={ttl}"
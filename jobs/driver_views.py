@@ -0,0 +1,188 @@
+import hashlib
+import json
+
+# Per-vehicle fields shown on a driver's view; race-wide fields such as lap_number are left
+# out so a view only changes when that driver's own row does
+DRIVER_VIEW_FIELDS = [
+    "vehicle_number", "vehicle_manufacturer", "starting_position", "running_position",
+    "laps_completed", "last_lap_time", "last_lap_speed", "best_lap_time", "best_lap_speed",
+    "delta", "is_on_track", "is_on_dvp", "status", "passes_made", "times_passed",
+    "average_running_position"
+]
+
+# Lists every published view, so clients can find driver pages without the leaderboard
+INDEX_VIEW = "views/index.json"
+
+# Key prefixes of the per-driver and per-manufacturer views
+DRIVER_VIEW_PREFIX = "views/driver/"
+MANUFACTURER_VIEW_PREFIX = "views/manufacturer/"
+
+
+def driver_view_name(driver_id):
+    return f"{DRIVER_VIEW_PREFIX}{driver_id}.json"
+
+
+def manufacturer_view_name(manufacturer):
+    return f"{MANUFACTURER_VIEW_PREFIX}{manufacturer}.json"
+
+
+def _tombstone(name):
+    """Content for a published view nothing feeds any more, so it stops showing stale rows"""
+    if name.startswith(DRIVER_VIEW_PREFIX):
+        return {"driver_id": name[len(DRIVER_VIEW_PREFIX):-len(".json")], "in_field": False}
+    return {
+        "manufacturer": name[len(MANUFACTURER_VIEW_PREFIX):-len(".json")],
+        "cars": 0,
+        "best_position": None,
+        "average_position": None,
+        "drivers": []
+    }
+
+
+def _encode(view):
+    return json.dumps(view, separators=(',', ':')).encode('utf-8')
+
+
+def _position(row):
+    try:
+        return int(row.get("running_position"))
+    except (TypeError, ValueError):
+        return None
+
+
+class DriverViews:
+    def __init__(self):
+        """
+        Initialize the DriverViews class
+
+        Materializes one view per driver (keyed by driver_id) and one aggregate per
+        manufacturer from each snapshot. A dependency index maps each driver to the
+        views built from their row, so a tick only rebuilds the views of drivers whose
+        rows changed, and only returns those whose bytes differ from what was published.
+        """
+        self.reset()
+
+    def reset(self):
+        """Forget every row, dependency and published view, e.g. when the race changes"""
+        self.rows = {}
+        # driver_id -> view names built from that driver's row, and view name -> driver_ids
+        self.dependents = {}
+        self.members = {}
+        self.published = {}
+        # Views whose last upload failed, rebuilt on the next tick regardless of changes
+        self.pending = set()
+
+    def _row(self, vehicle):
+        driver = vehicle.get("driver", {})
+        row = {field: vehicle.get(field, "") for field in DRIVER_VIEW_FIELDS}
+        row["driver_id"] = driver.get("driver_id", "")
+        row["full_name"] = driver.get("full_name", "")
+        row["pit_stops"] = len(vehicle.get("pit_stops") or [])
+        return row
+
+    def _link(self, driver_id, row):
+        """Point driver_id at the views its row now feeds, returning old and new view names"""
+        before = self.dependents.get(driver_id, set())
+        after = {driver_view_name(driver_id)}
+        if row is not None and row.get("vehicle_manufacturer"):
+            after.add(manufacturer_view_name(row["vehicle_manufacturer"]))
+        if row is None:
+            after = set()
+
+        for name in before - after:
+            self.members[name].discard(driver_id)
+            if not self.members[name]:
+                del self.members[name]
+        for name in after - before:
+            self.members.setdefault(name, set()).add(driver_id)
+        if after:
+            self.dependents[driver_id] = after
+        else:
+            self.dependents.pop(driver_id, None)
+        return before | after
+
+    def _build(self, name):
+        """Current content of a view, or None if nothing feeds it any more"""
+        drivers = self.members.get(name)
+        if not drivers:
+            return None
+        if name.startswith(DRIVER_VIEW_PREFIX):
+            return self.rows[next(iter(drivers))]
+
+        rows = sorted((self.rows[driver_id] for driver_id in drivers),
+                      key=lambda row: (_position(row) is None, _position(row) or 0))
+        positions = [_position(row) for row in rows if _position(row) is not None]
+        return {
+            "manufacturer": rows[0]["vehicle_manufacturer"],
+            "cars": len(rows),
+            "best_position": min(positions) if positions else None,
+            "average_position": round(sum(positions) / len(positions), 2) if positions else None,
+            "drivers": [
+                {field: row[field] for field in ("driver_id", "full_name", "vehicle_number", "running_position")}
+                for row in rows
+            ]
+        }
+
+    def _index(self):
+        return {
+            "drivers": {
+                str(driver_id): {"full_name": row["full_name"], "view": driver_view_name(driver_id)}
+                for driver_id, row in self.rows.items()
+            },
+            "manufacturers": {
+                self.rows[next(iter(drivers))]["vehicle_manufacturer"]: name
+                for name, drivers in sorted(self.members.items()) if name.startswith(MANUFACTURER_VIEW_PREFIX)
+            }
+        }
+
+    def update(self, vehicles):
+        """
+        Take a snapshot's vehicles and return the views that need writing
+
+        Returns:
+            dict: View name -> JSON bytes, for views whose content changed
+        """
+        rows = {}
+        for vehicle in vehicles:
+            row = self._row(vehicle)
+            rows[row["driver_id"]] = row
+
+        dirty = set(self.pending)
+        for driver_id, row in rows.items():
+            if self.rows.get(driver_id) != row:
+                self.rows[driver_id] = row
+                dirty |= self._link(driver_id, row)
+        for driver_id in [driver_id for driver_id in self.rows if driver_id not in rows]:
+            del self.rows[driver_id]
+            dirty |= self._link(driver_id, None)
+        if dirty:
+            dirty.add(INDEX_VIEW)
+
+        views = {}
+        for name in dirty:
+            view = self._index() if name == INDEX_VIEW else self._build(name)
+            if view is None:
+                # A driver left the field or a manufacturer has no cars left: overwrite
+                # what was published rather than leave its old rows in place
+                if name not in self.published and name not in self.pending:
+                    continue
+                view = _tombstone(name)
+            content = _encode(view)
+            if self.published.get(name) != hashlib.sha256(content).hexdigest():
+                views[name] = content
+        self.pending = set()
+        return views
+
+    def mark_published(self, results, views):
+        """
+        Record upload outcomes from the views returned by update
+
+        Args:
+            results (dict): View name -> True if its upload succeeded
+            views (dict): The views that were uploaded
+        """
+        for name, succeeded in results.items():
+            if succeeded:
+                self.published[name] = hashlib.sha256(views[name]).hexdigest()
+            else:
+                self.pending.add(name)
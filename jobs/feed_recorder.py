@@ -0,0 +1,167 @@
+import gzip
+import json
+import os
+
+# Roll the open block once it holds this many frames or spans this many laps
+BLOCK_FRAMES = 200
+BLOCK_LAPS = 5
+
+# Frame lines are {"fetched_at":...,"lap_number":...,"payload":<raw feed body>}
+PAYLOAD_MARKER = b',"payload":'
+
+
+def index_path(path):
+    return path + ".index.json"
+
+
+class FeedRecorder:
+    def __init__(self, path, block_frames=BLOCK_FRAMES, block_laps=BLOCK_LAPS):
+        """
+        Initialize the FeedRecorder class
+
+        Appends every raw live feed body with its fetch time to a capture file. The
+        capture is a sequence of gzip members, each a block of JSON lines, and a
+        {path}.index.json sidecar gives each block's byte range, lap range and time
+        range, so a reader can seek to a lap and decompress only the blocks it needs.
+        Recording into an existing capture continues after its last block.
+
+        Args:
+            path (str): Capture file to append to
+            block_frames (int): Frames per block before it is rolled
+            block_laps (int): Laps per block before it is rolled
+        """
+        self.path = path
+        self.block_frames = block_frames
+        self.block_laps = block_laps
+
+        self.buffer = []
+        self.buffer_first_lap = None
+        self.buffer_first_fetched_at = None
+        self.index = {"blocks": []}
+
+        try:
+            with open(index_path(path)) as index_file:
+                self.index = json.load(index_file)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error loading capture index {index_path(path)}: {e}")
+
+        # Drop anything written after the last indexed block (e.g. a write cut short by a crash)
+        blocks = self.index["blocks"]
+        end = blocks[-1]["offset"] + blocks[-1]["length"] if blocks else 0
+        if os.path.exists(path) and os.path.getsize(path) != end:
+            os.truncate(path, end)
+
+    def append(self, raw, fetched_at, lap_number):
+        """
+        Buffer one raw feed body
+
+        Args:
+            raw (bytes): Response body exactly as fetched
+            fetched_at (float): Unix time of the fetch
+            lap_number (int): The payload's lap_number, used for seeking
+        """
+        try:
+            lap_number = int(lap_number or 0)
+            # JSON only allows raw newlines as whitespace, so stripping them keeps one frame per line
+            line = (f'{{"fetched_at":{fetched_at!r},"lap_number":{lap_number}'.encode('utf-8')
+                    + PAYLOAD_MARKER + raw.replace(b"\r", b"").replace(b"\n", b"") + b"}\n")
+
+            if self.buffer and (len(self.buffer) >= self.block_frames
+                                or lap_number - self.buffer_first_lap >= self.block_laps
+                                or lap_number < self.buffer_first_lap):
+                self.flush()
+            if not self.buffer:
+                self.buffer_first_lap = lap_number
+                self.buffer_first_fetched_at = fetched_at
+            self.buffer.append(line)
+            self.buffer_last_lap = lap_number
+            self.buffer_last_fetched_at = fetched_at
+        except Exception as e:
+            print(f"Error recording live feed payload: {e}")
+
+    def flush(self):
+        """Write buffered frames as one gzip block and rewrite the index"""
+        if not self.buffer:
+            return True
+        try:
+            block = gzip.compress(b"".join(self.buffer), compresslevel=6, mtime=0)
+            with open(self.path, 'ab') as capture:
+                offset = capture.tell()
+                capture.write(block)
+
+            self.index["blocks"].append({
+                "offset": offset,
+                "length": len(block),
+                "frames": len(self.buffer),
+                "first_lap": self.buffer_first_lap,
+                "last_lap": self.buffer_last_lap,
+                "first_fetched_at": self.buffer_first_fetched_at,
+                "last_fetched_at": self.buffer_last_fetched_at
+            })
+            temporary = index_path(self.path) + ".tmp"
+            with open(temporary, 'w') as index_file:
+                json.dump(self.index, index_file)
+            os.replace(temporary, index_path(self.path))
+
+            self.buffer = []
+            return True
+        except Exception as e:
+            print(f"Error writing capture block to {self.path}: {e}")
+            return False
+
+    def close(self):
+        return self.flush()
+
+
+class CaptureReader:
+    def __init__(self, path):
+        """
+        Initialize the CaptureReader class
+
+        Reads a capture written by FeedRecorder one block at a time.
+
+        Args:
+            path (str): Capture file
+        """
+        self.path = path
+        with open(index_path(path)) as index_file:
+            self.blocks = json.load(index_file)["blocks"]
+
+    def read_block(self, block):
+        """Decompress one block into (fetched_at, lap_number, raw payload) frames"""
+        with open(self.path, 'rb') as capture:
+            capture.seek(block["offset"])
+            data = gzip.decompress(capture.read(block["length"]))
+
+        frames = []
+        for line in data.splitlines():
+            split = line.index(PAYLOAD_MARKER)
+            header = json.loads(line[:split] + b"}")
+            frames.append((header["fetched_at"], header["lap_number"], line[split + len(PAYLOAD_MARKER):-1]))
+        return frames
+
+    def frames(self, start_lap=None, start_time=None):
+        """
+        Yield (fetched_at, lap_number, raw payload) frames in capture order
+
+        Args:
+            start_lap (int): Skip to the first frame on or after this lap
+            start_time (float): Skip to the first frame fetched at or after this Unix time
+        """
+        started = start_lap is None and start_time is None
+        for block in self.blocks:
+            if not started:
+                if start_lap is not None and block["last_lap"] < start_lap:
+                    continue
+                if start_time is not None and block["last_fetched_at"] < start_time:
+                    continue
+            for frame in self.read_block(block):
+                if not started:
+                    if start_lap is not None and frame[1] < start_lap:
+                        continue
+                    if start_time is not None and frame[0] < start_time:
+                        continue
+                    started = True
+                yield frame
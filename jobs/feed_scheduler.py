@@ -0,0 +1,188 @@
+import time
+
+# Taken before the remaining imports so cold-start init time includes them
+MODULE_LOAD_STARTED = time.perf_counter()
+
+import json
+import os
+import sys
+import signal
+from concurrent.futures import ThreadPoolExecutor
+import urllib3
+
+from fetch_live_feed import (LiveFeedToR2, build_r2_config, bundle_enabled, capture_recorder, get_api_token,
+                             history_enabled, lease_enabled, views_enabled)
+
+# Seconds the scheduler loop waits between checks for due feeds and finished polls
+SCHEDULER_TICK = 0.25
+
+# Most feeds polled at once by default; with more feeds than this, priority decides who waits
+SCHEDULER_WORKERS = int(os.getenv('SCHEDULER_WORKERS', '4'))
+
+
+class FeedScheduler:
+    def __init__(self, feeds, r2_config, max_workers=None):
+        """
+        Initialize the FeedScheduler class
+
+        Args:
+            feeds (list): Feed configs, dicts with keys: url, priority (optional, lower
+                runs first, default 10), interval (optional seconds, default adapts to race state),
+                name (optional, names the feed's capture file when RECORD_FEED is set)
+            r2_config (dict): R2 configuration with keys: account_id, api_token, bucket
+            max_workers (int): Maximum feeds polled at once, defaults to SCHEDULER_WORKERS
+                or the number of feeds if that is fewer
+        """
+        if max_workers is not None and max_workers < 1:
+            raise ValueError(f"max_workers must be at least 1, got {max_workers}")
+        self.feeds = sorted(feeds, key=lambda feed: feed.get("priority", 10))
+        self.max_workers = max_workers or max(1, min(SCHEDULER_WORKERS, len(self.feeds)))
+
+        # One connection pool shared by every feed's fetches and uploads
+        self.http = urllib3.PoolManager(maxsize=self.max_workers * 4)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+        self.updaters = [
+            LiveFeedToR2(
+                feed["url"], r2_config, http=self.http, namespaced=True, verify=False,
+                record_history=history_enabled(), recorder=capture_recorder(feed.get("name", f"feed-{index}")),
+                bundle=bundle_enabled(), views=views_enabled(), lease=lease_enabled()
+            )
+            for index, feed in enumerate(self.feeds)
+        ]
+        self._running = False
+
+        # Connection check once for the whole process rather than once per feed
+        if self.updaters:
+            self.updaters[0].verify_connection()
+
+    def poll_interval(self, index):
+        """Seconds between polls of a feed - fixed if configured, otherwise adaptive"""
+        interval = self.feeds[index].get("interval")
+        if interval is not None:
+            return interval
+        return self.updaters[index].next_poll_interval()
+
+    def run_once(self):
+        """Poll every feed once concurrently, highest priority first"""
+        futures = [self.executor.submit(updater.run_once) for updater in self.updaters]
+        failures = sum(1 for future in futures if future.result() != 0)
+        # The container may be reclaimed before the next invocation, taking the buffer with it
+        for updater in self.updaters:
+            updater.close()
+        print(f"Polled {len(futures)} feeds, {failures} failed")
+        return 0 if failures == 0 else 1
+
+    def stop(self, *args):
+        """Ask run_forever to exit once in-flight polls finish"""
+        self._running = False
+
+    def run_forever(self):
+        """
+        Poll every feed on its own cadence until stopped
+
+        Each feed is scheduled independently and a feed is never submitted while
+        its previous poll is still running, so a slow feed only delays itself.
+        When more feeds are due than there are workers, lower priority values go first.
+        """
+        self._running = True
+        next_due = [time.monotonic()] * len(self.feeds)
+        in_flight = {}
+        failures = 0
+
+        while self._running:
+            now = time.monotonic()
+
+            # Reschedule feeds whose poll has finished
+            for index, future in list(in_flight.items()):
+                if future.done():
+                    del in_flight[index]
+                    if future.result() != 0:
+                        failures += 1
+                    next_due[index] = now + self.poll_interval(index)
+
+            # Feeds are kept in priority order, so the first free slots go to the most important
+            for index in range(len(self.feeds)):
+                if len(in_flight) >= self.max_workers:
+                    break
+                if index not in in_flight and next_due[index] <= now:
+                    in_flight[index] = self.executor.submit(self.updaters[index].run_once)
+
+            time.sleep(SCHEDULER_TICK)
+
+        for future in in_flight.values():
+            if future.result() != 0:
+                failures += 1
+        for updater in self.updaters:
+            updater.close()
+
+        return 0 if failures == 0 else 1
+
+
+def load_feeds():
+    """
+    Read feed configs from the environment
+
+    LIVE_FEEDS holds a JSON list of feed configs (see FeedScheduler). When unset,
+    falls back to the single LIVE_FEED_URL used by lambda_handler.
+    """
+    feeds = os.getenv('LIVE_FEEDS')
+    if feeds:
+        return json.loads(feeds)
+    return [{"url": os.getenv('LIVE_FEED_URL', 'https://cf.nascar.com/live/feeds/live-feed.json')}]
+
+
+# Scheduler reused across warm Lambda invocations of this container
+_scheduler = None
+_cold_start = True
+
+
+def lambda_handler(event, context):
+    """Poll every configured feed once, concurrently, from a single invocation"""
+    global _scheduler, _cold_start
+
+    started = time.perf_counter()
+    cold_start = _cold_start
+    _cold_start = False
+
+    if _scheduler is None:
+        _scheduler = FeedScheduler(load_feeds(), build_r2_config(get_api_token()))
+    setup_done = time.perf_counter()
+
+    status = _scheduler.run_once()
+    if any(updater.auth_failed for updater in _scheduler.updaters):
+        # Every feed shares the token - fetch a fresh one and poll them all again once
+        print("R2 rejected the API token, refreshing from Parameter Store")
+        api_token = get_api_token(force_refresh=True)
+        for updater in _scheduler.updaters:
+            updater.set_api_token(api_token)
+        status = _scheduler.run_once()
+
+    finished = time.perf_counter()
+    timing = {
+        "metric": "lambda_invocation",
+        "handler": "feed_scheduler",
+        "cold_start": cold_start,
+        "init_ms": round((started - MODULE_LOAD_STARTED) * 1000, 1) if cold_start else 0.0,
+        "setup_ms": round((setup_done - started) * 1000, 1),
+        "handler_ms": round((finished - started) * 1000, 1),
+        "feeds": len(_scheduler.feeds),
+        "status": status
+    }
+    print(json.dumps(timing))
+    return timing
+
+
+def main():
+    """Daemon entry point: python -m feed_scheduler (from the jobs directory)"""
+    api_token = os.getenv('CLOUDFLARE_API_TOKEN') or get_api_token()
+    scheduler = FeedScheduler(load_feeds(), build_r2_config(api_token))
+
+    signal.signal(signal.SIGTERM, scheduler.stop)
+    signal.signal(signal.SIGINT, scheduler.stop)
+
+    return scheduler.run_forever()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,229 @@
+import csv
+import io
+
+def _as_str(value):
+    if type(value) is str:
+        return value
+    return "" if value is None else str(value)
+
+
+def _as_int(value):
+    if value is None or type(value) is int:
+        return value
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            return None
+        return int(number) if number.is_integer() else None
+
+
+def _as_float(value):
+    if value is None:
+        return None
+    try:
+        # + 0.0 folds -0.0 into 0.0, so equal values always format the same
+        return float(value) + 0.0
+    except (TypeError, ValueError):
+        return None
+
+
+def _as_bool(value):
+    if value is None or type(value) is bool:
+        return value
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes")
+    return bool(value)
+
+
+# Value types a column can declare, and the conversion applied to every extracted value.
+# Published alongside column names so readers can decode rows.
+TYPES = {"str": _as_str, "int": _as_int, "float": _as_float, "bool": _as_bool}
+
+
+class Column:
+    """One output column: its name, dotted path into the feed record, type and default"""
+
+    def __init__(self, name, path=None, type="str", default=None):
+        if type not in TYPES:
+            raise ValueError(f"Unknown column type {type!r} for {name}")
+        self.name = name
+        self.path = tuple((path or name).split("."))
+        self.type = type
+        # Missing values convert to "" for strings and None (an empty CSV cell, null in JSON) otherwise
+        self.default = default
+
+    def getter(self):
+        """Function returning this column's converted value from a record"""
+        convert = TYPES[self.type]
+        default = self.default
+        *parents, leaf = self.path
+        if not parents:
+            return lambda record: convert(record.get(leaf, default))
+
+        def get(record):
+            for segment in parents:
+                # Missing or null parents read as empty, like .get(..., {})
+                record = record.get(segment) or _EMPTY
+            return convert(record.get(leaf, default))
+        return get
+
+
+_EMPTY = {}
+
+
+class Schema:
+    def __init__(self, columns):
+        """
+        Initialize the Schema class
+
+        Builds one extractor that pulls every column out of a record as a tuple of
+        values converted to the column types. Every output format (CSV bytes, row
+        tuples for JSON, driver-keyed dicts for patches, the packed leaderboard) is
+        built from those tuples.
+
+        Args:
+            columns (list): Column definitions, in output order
+        """
+        self.columns = list(columns)
+        self.names = [column.name for column in self.columns]
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.types = [column.type for column in self.columns]
+        self.getters = [column.getter() for column in self.columns]
+        self.header = self.csv_lines([self.names])[0]
+
+    def extract(self, record):
+        """Column values of one record, as a tuple"""
+        return tuple([get(record) for get in self.getters])
+
+    def csv_lines(self, rows):
+        """One CSV line per row; csv.writer writes each row with a single write()"""
+        lines = []
+        csv.writer(_LineCollector(lines)).writerows(rows)
+        return lines
+
+    def rows(self, records):
+        """Column tuples for each record"""
+        return list(map(self.extract, records))
+
+    def encode_csv(self, records, rows=None):
+        """
+        Encode records as CSV bytes (header included)
+
+        Args:
+            records (list): Feed records, e.g. data["vehicles"]
+            rows (list): Already extracted tuples for records, to skip extraction
+
+        Returns:
+            bytes: The same bytes csv.writer would produce for these columns
+        """
+        output = io.StringIO()
+        output.write(self.header)
+        csv.writer(output).writerows(rows if rows is not None else map(self.extract, records))
+        return output.getvalue().encode('utf-8')
+
+    def decode_csv(self, content):
+        """
+        Row tuples from CSV bytes written by encode_csv, converted back to the column types
+
+        Empty cells read as "" in str columns and None otherwise, as they were extracted.
+
+        Raises:
+            ValueError: If the header doesn't name this schema's columns
+        """
+        reader = csv.reader(io.StringIO(content.decode('utf-8')))
+        if next(reader, None) != self.names:
+            raise ValueError("CSV header doesn't match the schema's columns")
+        converts = [(TYPES[kind], kind == "str") for kind in self.types]
+        return [
+            tuple([convert(value) if value or is_str else None for (convert, is_str), value in zip(converts, row)])
+            for row in reader
+        ]
+
+    def records(self, rows, key, fields=None):
+        """
+        Index row tuples by one column as dicts of the other columns
+
+        Args:
+            rows (list): Tuples from rows()
+            key (str): Column whose value (as a string) keys the result
+            fields (list): Columns to keep, defaults to every column but key
+        """
+        key_index = self.index[key]
+        fields = fields or [name for name in self.names if name != key]
+        indexes = [self.index[name] for name in fields]
+        return {
+            str(row[key_index]): dict(zip(fields, [row[i] for i in indexes]))
+            for row in rows
+        }
+
+
+class _LineCollector:
+    """File-like target for csv.writer that keeps each written line"""
+    __slots__ = ("write",)
+
+    def __init__(self, lines):
+        self.write = lines.append
+
+
+class CsvEncoder:
+    def __init__(self, schema):
+        """
+        Initialize the CsvEncoder class
+
+        Encodes rows of a schema as CSV, keeping each row's encoded line from the
+        previous call. Between polls most drivers' rows are unchanged, so only the
+        rows that changed go through csv.writer. Lines are keyed by the row's
+        values together with their types, since values that compare equal can
+        still format differently (0 and 0.0, 1 and True).
+
+        Args:
+            schema (Schema): Columns to encode
+        """
+        self.schema = schema
+        self.lines = {}
+
+    def encode(self, rows):
+        """CSV bytes for row tuples from schema.rows(), header included"""
+        cached = self.lines
+        keys = [(row, tuple(map(type, row))) for row in rows]
+        lines = [cached.get(key) for key in keys]
+
+        missing = [row for row, line in zip(rows, lines) if line is None]
+        if missing:
+            formatted = iter(self.schema.csv_lines(missing))
+            lines = [line if line is not None else next(formatted) for line in lines]
+        # Only the current rows are kept, so the cache never outgrows one snapshot
+        self.lines = dict(zip(keys, lines))
+        return (self.schema.header + "".join(lines)).encode('utf-8')
+
+
+# Leaderboard CSV, bundle and patch columns, one per vehicle
+LEADERBOARD_SCHEMA = Schema([
+    Column("last_lap_time", type="float"),
+    Column("vehicle_manufacturer"),
+    Column("vehicle_number"),
+    Column("driver_id", "driver.driver_id", type="int"),
+    Column("full_name", "driver.full_name"),
+    Column("starting_position", type="int"),
+    Column("running_position", type="int"),
+    Column("delta", type="float"),
+    Column("is_on_track", type="bool"),
+    Column("is_on_dvp", type="bool")
+])
+
+# Race metadata CSV and bundle fields, one row per payload
+METADATA_SCHEMA = Schema([
+    Column("lap_number", type="int"),
+    Column("flag_state", type="int"),
+    Column("laps_in_race", type="int"),
+    Column("run_name"),
+    Column("race_id", type="int"),
+    Column("run_id", type="int"),
+    Column("series_id", type="int"),
+    Column("time_of_day_os"),
+    Column("track_id", type="int"),
+    Column("track_name")
+])
@@ -1,39 +1,224 @@
+import time
+
+# Taken before the remaining imports so cold-start init time includes them
+MODULE_LOAD_STARTED = time.perf_counter()
+
 import json
+import hashlib
 import sys
 import os
-import csv
-import io
+import signal
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import boto3
 import urllib3
 
+from leaderboard_formats import gzip_bytes, brotli_bytes, pack_leaderboard
+from feed_schema import LEADERBOARD_SCHEMA, METADATA_SCHEMA, CsvEncoder
+from snapshot_diff import leaderboard_rows, diff_rows
+from race_history import RaceHistory
+from race_state import create_engine
+from pit_analytics import PitStopTracker
+from position_index import PositionIndex
+from instrumentation import TickMetrics, feed_staleness, profiled
+from feed_recorder import FeedRecorder
+from resilient_upload import ResilientUploader
+from driver_views import DriverViews
+from cache_policy import MAX_DELETES_PER_TICK, VERSION_RETENTION, cache_control, pointer_ttl
+from publish_guard import PublishLease, feed_position, is_older
+from snapshot_bundle import (BUNDLE_FILENAME, POINTER_FILENAME, bundle_sections, encode_bundle,
+                             encode_pointer, encode_sections, metadata_section)
+
+# NASCAR live feed flag_state values
+FLAG_GREEN = 1
+FLAG_CAUTION = 2
+FLAG_RED = 3
+FLAG_CHECKERED = 4
+FLAG_WHITE = 5
+
+# Seconds between polls in daemon mode, keyed by race state
+POLL_INTERVALS = {
+    "green_finish": 3,   # green or white flag with few laps to go
+    "green": 10,
+    "caution": 20,
+    "red": 60,
+    "idle": 300          # between sessions, checkered, or no data yet
+}
+
+# Laps to go at or under which green flag running is polled at the finish rate
+FINISH_LAPS_TO_GO = 10
+
+
+# Data artifacts listed in the manifest, by manifest name: (filename, content type, content encoding)
+ARTIFACTS = {
+    "leaderboard": ("leaderboard.csv", "text/csv", None),
+    "leaderboard_gzip": ("leaderboard.csv.gz", "text/csv", "gzip"),
+    "leaderboard_br": ("leaderboard.csv.br", "text/csv", "br"),
+    "leaderboard_packed": ("leaderboard.bin", "application/octet-stream", None),
+    "race_metadata": ("race_metadata.csv", "text/csv", None),
+    "race_metadata_gzip": ("race_metadata.csv.gz", "text/csv", "gzip"),
+    "race_metadata_br": ("race_metadata.csv.br", "text/csv", "br"),
+    "race_metrics": ("race_metrics.json", "application/json", None),
+    "pit_stops": ("pit_stops.json", "application/json", None),
+    "positions": ("positions.json", "application/json", None)
+}
+
+# Per-version leaderboard patch, and how many patches the manifest keeps in its chain
+PATCH_FILENAME = "leaderboard.patch.json"
+MAX_PATCH_CHAIN = 20
+
+# Hex digits of an object's content digest in its versioned key
+KEY_DIGEST_CHARS = 16
+
+# Cloudflare API root; overridable to point at a local R2 stand-in
+DEFAULT_API_BASE = "https://api.cloudflare.com/client/v4"
+
+# Seconds a Parameter Store token is reused before it is fetched again
+SSM_TOKEN_TTL = int(os.getenv('SSM_TOKEN_TTL', '900'))
+
+# Maximum number of artifact uploads in flight at once
+UPLOAD_WORKERS = 4
+
+# Seconds a leaderboard patch may take to reach the live stream server
+STREAM_TIMEOUT = 2
+
+
+def versioned_key(version, filename, digest):
+    """
+    Immutable object key for filename as published in the given manifest version
+    
+    The version keeps keys in publish order for humans and lifecycle rules; the
+    content digest makes them unique to their bytes. A publisher that restarts
+    without loading the manifest, or one overlapping another, can hand out a
+    version number twice, and without the digest it would overwrite an object
+    every cache was told is immutable.
+    """
+    return f"v/{version}-{digest[:KEY_DIGEST_CHARS]}/{filename}"
+
+
+def namespace_prefix(data):
+    """Key prefix that namespaces a feed's objects by series and race"""
+    return f"{data.get('series_id', 'unknown')}/{data.get('race_id', 'unknown')}/"
+
+
+def content_digest(content):
+    """SHA-256 hex digest of str or bytes content"""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    return hashlib.sha256(content).hexdigest()
+
 class LiveFeedToR2:
-    def __init__(self, live_feed_url, r2_config):
+    def __init__(self, live_feed_url, r2_config, http=None, namespaced=False, verify=True, record_history=False,
+                 recorder=None, bundle=False, views=False, stream_url=None, lease=False):
         """
         Initialize the LiveFeedToR2 class
         
         Args:
             live_feed_url (str): URL of the live feed endpoint
-            r2_config (dict): R2 configuration with keys: account_id, api_token, bucket
+            r2_config (dict): R2 configuration with keys: account_id, api_token, bucket,
+                and optionally api_base (defaults to DEFAULT_API_BASE)
+            http (urllib3.PoolManager): Optional pool to share with other publishers
+            namespaced (bool): Publish under series_id/race_id prefixed keys
+            verify (bool): Run verify_connection on startup
+            record_history (bool): Append every snapshot to the per-race history archive
+            recorder (FeedRecorder): Optional capture every raw feed body is appended to
+            bundle (bool): Publish one snapshot bundle and latest.json pointer per version
+                instead of separate artifacts and a manifest
+            views (bool): Publish per-driver and per-manufacturer view objects
+            stream_url (str): Live stream server (backend/live_stream.py) each published
+                version's changed rows are pushed to
+            lease (bool): Take a lease in the bucket before each publish, so overlapping
+                ticks or processes never write at the same time
         """
         self.live_feed_url = live_feed_url
         self.r2_config = r2_config
-        self.base_url = f"https://api.cloudflare.com/client/v4/accounts/{r2_config['account_id']}/r2/buckets/{r2_config['bucket']}/objects"
+        self.api_base = r2_config.get('api_base') or DEFAULT_API_BASE
+        self.base_url = f"{self.api_base}/accounts/{r2_config['account_id']}/r2/buckets/{r2_config['bucket']}/objects"
         self.headers = {
             'Authorization': f"Bearer {r2_config['api_token']}",
             'Content-Type': 'application/octet-stream'
         }
         
-        # Initialize urllib3 PoolManager
-        self.http = urllib3.PoolManager()
+        # Set when R2 rejects our token, so the caller can refresh it and retry
+        self.auth_failed = False
+        
+        # Metrics for the tick in progress, and for the last completed tick
+        self.metrics = None
+        self.last_metrics = None
+        
+        # Initialize urllib3 PoolManager, sized for concurrent artifact uploads and their hedges
+        self.http = http if http is not None else urllib3.PoolManager(maxsize=UPLOAD_WORKERS * 2)
+        self.upload_executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS)
+        
+        # Retries, hedging and circuit breaking for every PUT to R2
+        self.uploader = ResilientUploader(self.http, max_workers=UPLOAD_WORKERS * 2)
+        
+        # Most recent live feed payload, used to pick the daemon poll cadence
+        self.last_data = None
+        self._running = False
+        
+        # Conditional GET validators from the last successful feed fetch
+        self.feed_etag = None
+        self.feed_last_modified = None
+        # Validators of the body fetched this tick; they replace the ones above only once
+        # that snapshot has been handled, so a failed publish refetches it in full
+        self.fetched_validators = None
+        self.feed_not_modified = False
+        
+        # Per-driver and per-manufacturer views, rewritten only when their rows change
+        self.views = DriverViews() if views else None
+        
+        # What has been published: digests, keys, manifest version, patches and feed position
+        self.reset_published_state()
+        
+        # Prefix for every object key; follows the feed's series/race when namespaced
+        self.namespaced = namespaced
+        self.key_prefix = ""
+        
+        self.history = RaceHistory(self) if record_history else None
+        self.recorder = recorder
+        self.bundle = bundle
+        
+        # Single-flight lease in the bucket (None publishes without one)
+        self.lease = PublishLease(self) if lease else None
+        
+        # Leaderboard rows and version last pushed to the live stream server
+        self.stream_url = stream_url
+        self.streamed_rows = None
+        self.streamed_version = None
+        
+        # Columnar per-driver state for derived metrics (None without numpy)
+        self.race_state = create_engine()
+        
+        # Incremental pit stop analytics over the feed's pit_stops arrays
+        self.pit_tracker = PitStopTracker()
+        
+        # Incremental position, lead change and on-track/DVP transition events
+        self.position_index = PositionIndex()
+        
+        # Leaderboard CSV lines from the last tick, reused for rows that haven't changed
+        self.leaderboard_encoder = CsvEncoder(LEADERBOARD_SCHEMA)
         
-        self.verify_connection()
+        # Cache TTL of mutable objects (manifest, pointer, views), following the poll cadence
+        self.pointer_ttl = pointer_ttl(POLL_INTERVALS["idle"])
+        
+        # (retired_at, key) of versioned objects readers no longer reach, oldest first
+        self.retired_keys = []
+        
+        if verify:
+            self.verify_connection()
+    
+    def set_api_token(self, api_token):
+        """Swap in a new Cloudflare API token without rebuilding the connection pool"""
+        self.r2_config['api_token'] = api_token
+        self.headers['Authorization'] = f"Bearer {api_token}"
+        self.auth_failed = False
     
     def verify_connection(self):
         """Verify R2 connection and permissions"""
         try:
             # Test connection by attempting to list bucket (this will fail gracefully if no permissions)
-            test_url = f"https://api.cloudflare.com/client/v4/accounts/{self.r2_config['account_id']}/r2/buckets"
+            test_url = f"{self.api_base}/accounts/{self.r2_config['account_id']}/r2/buckets"
             test_headers = {
                 'Authorization': f"Bearer {self.r2_config['api_token']}",
                 'Content-Type': 'application/json'
@@ -52,12 +237,34 @@ class LiveFeedToR2:
             print("Proceeding anyway...")
     
     def fetch_live_feed(self):
-        """Fetch data from the live feed endpoint"""
+        """
+        Fetch data from the live feed endpoint
+        
+        Sends If-None-Match / If-Modified-Since from the last response whose
+        snapshot was handled (see update_r2). On 304 returns None and sets
+        feed_not_modified.
+        """
+        self.feed_not_modified = False
         try:
-            response = self.http.request('GET', self.live_feed_url, timeout=30)
+            request_headers = {}
+            if self.feed_etag:
+                request_headers['If-None-Match'] = self.feed_etag
+            if self.feed_last_modified:
+                request_headers['If-Modified-Since'] = self.feed_last_modified
             
-            if response.status == 200:
-                return json.loads(response.data.decode('utf-8'))
+            response = self.http.request('GET', self.live_feed_url, headers=request_headers, timeout=30)
+            
+            if response.status == 304:
+                self.feed_not_modified = True
+                return None
+            elif response.status == 200:
+                with self.stage("decode"):
+                    data = self.decode_feed(response.data)
+                if self.recorder is not None:
+                    self.recorder.append(response.data, time.time(), data.get("lap_number"))
+                self.record("feed_bytes", len(response.data))
+                self.fetched_validators = (response.headers.get('ETag'), response.headers.get('Last-Modified'))
+                return data
             else:
                 print(f"Error fetching live feed: HTTP {response.status}")
                 return None
@@ -66,27 +273,27 @@ class LiveFeedToR2:
             print(f"Error fetching live feed: {e}")
             return None
     
-    def create_csv_string(self, headers, rows):
-        """Create CSV string from headers and rows"""
-        try:
-            output = io.StringIO()
-            writer = csv.writer(output)
-            
-            # Write headers
-            writer.writerow(headers)
-            
-            # Write data rows
-            for row in rows:
-                writer.writerow(row)
-            
-            return output.getvalue()
-            
-        except Exception as e:
-            print(f"Error creating CSV string: {e}")
-            return None
+    def stage(self, name):
+        """Time a block as a stage of the current tick (no-op outside update_r2)"""
+        if self.metrics is None:
+            return contextlib.nullcontext()
+        return self.metrics.stage(name)
+    
+    def record(self, name, value):
+        """Record a scalar metric on the current tick (no-op outside update_r2)"""
+        if self.metrics is not None:
+            self.metrics.set(name, value)
+    
+    def decode_feed(self, raw):
+        """Decode a raw live feed response body"""
+        return json.loads(raw.decode('utf-8'))
     
-    def upload_to_r2(self, filename, content, content_type='text/csv'):
+    def upload_to_r2(self, filename, content, content_type='text/csv', content_encoding=None):
         """Upload content to R2 using Cloudflare API"""
+        started = time.perf_counter()
+        status = None
+        result = None
+        content_bytes = b""
         try:
             url = f"{self.base_url}/{filename}"
             
@@ -94,8 +301,10 @@ class LiveFeedToR2:
             upload_headers = self.headers.copy()
             upload_headers.update({
                 'Content-Type': content_type,
-                'Cache-Control': 'public, max-age=30'  # 30 second cache for frequent updates
+                'Cache-Control': cache_control(filename, self.pointer_ttl)
             })
+            if content_encoding:
+                upload_headers['Content-Encoding'] = content_encoding
             
             # Convert content to bytes if it's a string
             if isinstance(content, str):
@@ -104,105 +313,301 @@ class LiveFeedToR2:
                 content_bytes = content
             
             # Upload to R2
-            response = self.http.request(
-                'PUT',
-                url,
-                body=content_bytes,
-                headers=upload_headers,
-                timeout=60
-            )
-            
-            if response.status in [200, 201]:
+            result = self.uploader.put(url, content_bytes, upload_headers)
+            status = result.status
+            
+            if result.ok:
                 print(f"Successfully uploaded {filename} to R2")
                 return True
             else:
-                print(f"Error uploading {filename} to R2: {response.status} - {response.data.decode('utf-8')}")
+                if result.status in [401, 403]:
+                    self.auth_failed = True
+                if result.status is None:
+                    print(f"Error uploading {filename} to R2: {result.error}")
+                else:
+                    print(f"Error uploading {filename} to R2: {result.status} - {result.data.decode('utf-8', 'replace')}")
                 return False
                 
         except Exception as e:
             print(f"Error uploading {filename} to R2: {e}")
             return False
+        
+        finally:
+            if self.metrics is not None:
+                self.metrics.record_upload(filename, len(content_bytes), status, (time.perf_counter() - started) * 1000,
+                                           retries=result.retries if result is not None else 0,
+                                           hedges=result.hedges if result is not None else 0)
     
-    def create_leaderboard_csv(self, vehicles):
-        """Create leaderboard CSV content"""
+    def create_leaderboard_csv(self, vehicles, rows=None):
+        """
+        Create leaderboard CSV content from LEADERBOARD_SCHEMA
+        
+        Args:
+            vehicles (list): The feed's vehicles
+            rows (list): Tuples already extracted from vehicles by LEADERBOARD_SCHEMA.rows
+        
+        Returns:
+            bytes: UTF-8 CSV, or None on error
+        """
         try:
-            # Define headers
-            headers = [
-                "last_lap_time", "vehicle_manufacturer", "vehicle_number", 
-                "driver_id", "full_name", "starting_position", 
-                "running_position", "delta", "is_on_track", "is_on_dvp"
-            ]
-            
-            # Prepare data rows
-            rows = []
-            for vehicle in vehicles:
-                row_data = [
-                    vehicle.get("last_lap_time", ""),
-                    vehicle.get("vehicle_manufacturer", ""),
-                    vehicle.get("vehicle_number", ""),
-                    vehicle.get("driver", {}).get("driver_id", ""),
-                    vehicle.get("driver", {}).get("full_name", ""),
-                    vehicle.get("starting_position", ""),
-                    vehicle.get("running_position", ""),
-                    vehicle.get("delta", ""),
-                    vehicle.get("is_on_track", ""),
-                    vehicle.get("is_on_dvp", "")
-                ]
-                rows.append(row_data)
-            
-            return self.create_csv_string(headers, rows)
+            return self.leaderboard_encoder.encode(rows if rows is not None else LEADERBOARD_SCHEMA.rows(vehicles))
             
         except Exception as e:
             print(f"Error creating leaderboard CSV: {e}")
             return None
     
     def create_race_metadata_csv(self, data):
-        """Create race metadata CSV content"""
+        """Create race metadata CSV content from METADATA_SCHEMA, as UTF-8 bytes"""
         try:
-            # Define headers
-            headers = [
-                "lap_number", "flag_state", "laps_in_race", "run_name", 
-                "race_id", "run_id", "series_id", "time_of_day_os", 
-                "track_id", "track_name"
-            ]
-            
-            # Prepare metadata row
-            metadata_row = [
-                data.get("lap_number", ""),
-                data.get("flag_state", ""),
-                data.get("laps_in_race", ""),
-                data.get("run_name", ""),
-                data.get("race_id", ""),
-                data.get("run_id", ""),
-                data.get("series_id", ""),
-                data.get("time_of_day_os", ""),
-                data.get("track_id", ""),
-                data.get("track_name", "")
-            ]
-            
-            return self.create_csv_string(headers, [metadata_row])
+            return METADATA_SCHEMA.encode_csv([data])
             
         except Exception as e:
             print(f"Error creating race metadata CSV: {e}")
             return None
     
-    def upload_manifest(self, timestamp):
-        """Upload a manifest file to track current version"""
+    def object_key(self, filename):
+        """Full object key for filename under the current namespace"""
+        return f"{self.key_prefix}{filename}"
+    
+    def reset_published_state(self):
+        """Forget what has been published, so it is reloaded from R2 before the next publish"""
+        # Digest and object key of the last published version per artifact, and the manifest version
+        self.published_digests = {}
+        self.published_keys = {}
+        self.manifest_version = 0
+        self._manifest_loaded = False
+        
+        # Last published leaderboard keyed by driver_id, the version it was published at,
+        # and the chain of patches clients can apply to catch up
+        self.previous_rows = None
+        self.leaderboard_version = None
+        self.patch_chain = []
+        
+        # feed_position of the last published snapshot; older snapshots are dropped
+        self.published_feed = None
+        
+        if self.views is not None:
+            self.views.reset()
+    
+    def set_namespace(self, data):
+        """Switch to the series/race namespace of data, resetting published state on change"""
+        prefix = namespace_prefix(data)
+        if prefix == self.key_prefix:
+            return
+        self.key_prefix = prefix
+        self.reset_published_state()
+        self.streamed_rows = None
+    
+    def build_artifacts(self, data, leaderboard_csv, metadata_csv, vehicle_rows=None):
+        """
+        Encode every published variant of the leaderboard and metadata
+        
+        vehicle_rows are the tuples LEADERBOARD_SCHEMA extracted from data["vehicles"].
+        
+        Returns:
+            dict: Artifact bytes keyed by ARTIFACTS name
+        """
+        artifacts = {}
+        sources = {"race_metadata": metadata_csv}
+        if leaderboard_csv:
+            sources["leaderboard"] = leaderboard_csv
+            artifacts["leaderboard_packed"] = pack_leaderboard(data["vehicles"], vehicle_rows)
+        
+        for name, csv_bytes in sources.items():
+            artifacts[name] = csv_bytes
+            artifacts[f"{name}_gzip"] = gzip_bytes(csv_bytes)
+            compressed = brotli_bytes(csv_bytes)
+            if compressed is not None:
+                artifacts[f"{name}_br"] = compressed
+        
+        for name, section in self.derived_sections(data).items():
+            artifacts[name] = json.dumps(section, separators=(',', ':')).encode('utf-8')
+        
+        return artifacts
+    
+    def derived_sections(self, data):
+        """Pit stop, position and race metric summaries for the current snapshot, by artifact name"""
+        sections = {}
+        if "vehicles" in data:
+            sections["pit_stops"] = self.pit_tracker.summary()
+            sections["positions"] = self.position_index.summary()
+        if self.race_state is not None:
+            sections["race_metrics"] = self.race_state.metrics()
+        return sections
+    
+    def is_unchanged(self, name, content):
+        """Check whether content matches the last published version of an artifact"""
+        return self.published_digests.get(name) == content_digest(content)
+    
+    def load_published_manifest(self):
+        """Seed digests and version from the manifest currently in R2"""
+        self._manifest_loaded = True
+        try:
+            url = f"{self.base_url}/{self.object_key('manifest.json')}"
+            response = self.http.request('GET', url, headers=self.headers, timeout=10)
+            
+            if response.status != 200:
+                return False
+            
+            manifest = json.loads(response.data.decode('utf-8'))
+            self.manifest_version = manifest.get("version", 0)
+            self.patch_chain = manifest.get("patches", [])
+            self.leaderboard_version = manifest.get("leaderboard_version")
+            self.published_feed = manifest.get("feed")
+            files = manifest.get("files", {})
+            for name, digest in manifest.get("digests", {}).items():
+                if name in files:
+                    self.published_keys[name] = files[name]
+                    self.published_digests[name] = digest
+            return True
+            
+        except Exception as e:
+            print(f"Warning: Could not load published manifest: {e}")
+            return False
+    
+    def load_published_rows(self):
+        """
+        Rebuild the last published leaderboard rows from its CSV in R2
+        
+        After a cold start or lease takeover this lets the next patch continue
+        the manifest's chain instead of restarting it.
+        """
+        key = self.published_keys.get("leaderboard")
+        if key is None or self.leaderboard_version is None:
+            return False
+        content = self.download_from_r2(key)
+        if content is None:
+            return False
+        try:
+            self.previous_rows = leaderboard_rows(None, LEADERBOARD_SCHEMA.decode_csv(content))
+            return True
+        except ValueError as e:
+            print(f"Warning: Could not read published leaderboard {key}: {e}")
+            return False
+    
+    def load_published_pointer(self):
+        """Seed the bundle digest and version from the latest.json pointer currently in R2"""
+        self._manifest_loaded = True
+        try:
+            url = f"{self.base_url}/{self.object_key(POINTER_FILENAME)}"
+            response = self.http.request('GET', url, headers=self.headers, timeout=10)
+            
+            if response.status != 200:
+                return False
+            
+            pointer = json.loads(response.data.decode('utf-8'))
+            self.manifest_version = pointer.get("version", 0)
+            self.published_feed = pointer.get("feed")
+            if pointer.get("key") and pointer.get("digest"):
+                self.published_keys["bundle"] = pointer["key"]
+                self.published_digests["bundle"] = pointer["digest"]
+            return True
+            
+        except Exception as e:
+            print(f"Warning: Could not load published pointer: {e}")
+            return False
+    
+    def load_published_state(self):
+        """Seed published state from latest.json in bundle mode, or from manifest.json"""
+        if self.bundle:
+            return self.load_published_pointer()
+        return self.load_published_manifest()
+    
+    def is_stale(self, position):
+        """Whether a snapshot at position is older than the published one, logging the drop if so"""
+        if not is_older(position, self.published_feed):
+            return False
+        self.record("stale_dropped", True)
+        print(f"Dropping snapshot at lap {position['lap_number']}, "
+              f"older than published lap {self.published_feed.get('lap_number')}")
+        return True
+    
+    def acquire_lease(self, position):
+        """
+        Take the publish lease before the tick's first upload
+        
+        Ticks with nothing to upload never touch the lease. A publisher taking
+        the lease over from another reloads what that one published, and drops
+        the snapshot if it is now older than the published one.
+        
+        Returns:
+            bool: None once the lease is held and the snapshot is still current,
+                otherwise the tick's result
+        """
+        if self.lease.key is not None:
+            return None
+        
+        with self.stage("lease"):
+            acquired = self.lease.acquire()
+        if not acquired:
+            if self.lease.holder is None:
+                return False
+            # That publisher, or the next tick, will publish the latest state
+            self.record("lease_busy", True)
+            # Fetch this snapshot in full again next tick rather than take a 304 for it
+            self.fetched_validators = None
+            print(f"Publish lease held by {self.lease.holder}, skipping this tick")
+            return True
+        
+        if self.lease.took_over:
+            # Someone else may have published since we last did
+            self.reset_published_state()
+            self.load_published_state()
+            if self.is_stale(position):
+                return True
+        return None
+    
+    def next_manifest_version(self, timestamp):
+        """Version for the next manifest - only moves forward, even if the clock steps back"""
+        return max(int(timestamp.timestamp()), self.manifest_version + 1)
+    
+    def upload_artifacts(self, uploads):
+        """
+        Upload several objects concurrently over the shared connection pool
+        
+        Args:
+            uploads (list): (key, content, content_type, content_encoding) tuples
+        
+        Returns:
+            bool: True only if every upload succeeded
+        """
+        futures = [
+            self.upload_executor.submit(self.upload_to_r2, *upload)
+            for upload in uploads
+        ]
+        return all([future.result() for future in futures])
+    
+    def upload_manifest(self, timestamp, version, feed=None):
+        """
+        Upload a manifest file pointing at the versioned keys of the current snapshot
+        
+        feed is the snapshot's feed_position, kept so later publishers can tell
+        whether their snapshot is older.
+        
+        patches lists leaderboard patches oldest first; each one's from_version is the
+        previous one's to_version. A client holding version N applies every patch with
+        to_version > N, or reloads the full leaderboard if the first of those has
+        from_version > N. leaderboard_version is the version the published
+        leaderboard was written at, which the next patch starts from.
+        """
         try:
             manifest = {
                 "last_updated": timestamp.isoformat(),
-                "version": int(timestamp.timestamp()),
-                "files": {
-                    "leaderboard": "leaderboard.csv",
-                    "race_metadata": "race_metadata.csv"
-                }
+                "version": version,
+                "files": dict(self.published_keys),
+                "digests": dict(self.published_digests),
+                "patches": list(self.patch_chain),
+                "leaderboard_version": self.leaderboard_version,
+                "feed": feed
             }
             
             manifest_content = json.dumps(manifest, indent=2)
             
-            success = self.upload_to_r2('manifest.json', manifest_content, 'application/json')
+            success = self.upload_to_r2(self.object_key('manifest.json'), manifest_content, 'application/json')
             
             if success:
+                self.manifest_version = version
+                self.published_feed = feed
                 print("Uploaded manifest file")
             
             return success
@@ -228,9 +633,9 @@ class LiveFeedToR2:
             print("\n" + "="*60)
             print("PUBLIC URLS FOR FRONTEND ACCESS:")
             print("="*60)
-            print(f"Leaderboard CSV: {base_url}/leaderboard.csv")
-            print(f"Race Metadata CSV: {base_url}/race_metadata.csv")
-            print(f"Manifest JSON: {base_url}/manifest.json")
+            print(f"Manifest JSON: {base_url}/{self.object_key('manifest.json')}")
+            for name, key in self.published_keys.items():
+                print(f"{name}: {base_url}/{key}")
             print("="*60)
             print("Note: Ensure your R2 bucket has public access configured")
             print("Or use signed URLs for private access")
@@ -239,6 +644,71 @@ class LiveFeedToR2:
         except Exception as e:
             print(f"Error generating public URLs: {e}")
     
+    def download_from_r2(self, filename):
+        """Download an object from R2, returning its bytes or None if missing"""
+        try:
+            url = f"{self.base_url}/{filename}"
+            response = self.http.request('GET', url, headers=self.headers, timeout=30)
+            
+            if response.status == 200:
+                return response.data
+            if response.status != 404:
+                print(f"Error downloading {filename} from R2: {response.status}")
+            return None
+            
+        except Exception as e:
+            print(f"Error downloading {filename} from R2: {e}")
+            return None
+    
+    def delete_from_r2(self, filename):
+        """Delete an object from R2; an object that is already gone counts as deleted"""
+        try:
+            url = f"{self.base_url}/{filename}"
+            response = self.http.request('DELETE', url, headers=self.headers, timeout=10)
+            
+            if response.status in (200, 204, 404):
+                return True
+            print(f"Error deleting {filename} from R2: {response.status}")
+            return False
+            
+        except Exception as e:
+            print(f"Error deleting {filename} from R2: {e}")
+            return False
+    
+    def retire_keys(self, keys):
+        """Queue versioned objects for deletion once VERSION_RETENTION seconds have passed"""
+        now = time.time()
+        self.retired_keys.extend((now, key) for key in keys)
+    
+    def collect_garbage(self, now=None):
+        """
+        Delete versioned objects retired at least VERSION_RETENTION seconds ago
+        
+        Keys the manifest or pointer names again are kept. At most
+        MAX_DELETES_PER_TICK objects are deleted per call; failed deletes are
+        retried on the next call.
+        
+        Returns:
+            int: Number of objects deleted
+        """
+        now = time.time() if now is None else now
+        live = set(self.published_keys.values()) | {patch["key"] for patch in self.patch_chain}
+        due = []
+        while (self.retired_keys and len(due) < MAX_DELETES_PER_TICK
+               and self.retired_keys[0][0] + VERSION_RETENTION <= now):
+            retired_at, key = self.retired_keys.pop(0)
+            if key not in live:
+                due.append((retired_at, key))
+        if not due:
+            return 0
+        
+        futures = [(retired, self.upload_executor.submit(self.delete_from_r2, retired[1])) for retired in due]
+        failed = [retired for retired, future in futures if not future.result()]
+        self.retired_keys[:0] = failed
+        deleted = len(due) - len(failed)
+        self.record("objects_deleted", deleted)
+        return deleted
+    
     def check_file_exists(self, filename):
         """Check if a file exists in R2"""
         try:
@@ -253,39 +723,205 @@ class LiveFeedToR2:
             return False
     
     def update_r2(self):
-        """Main method to fetch data and update R2"""
+        """Main method to fetch data and update R2, logging the tick's metrics"""
+        metrics = self.metrics = TickMetrics()
+        self.fetched_validators = None
+        try:
+            success = self.publish_tick()
+            if success and self.fetched_validators is not None:
+                self.feed_etag, self.feed_last_modified = self.fetched_validators
+            if self.retired_keys:
+                with self.stage("gc"):
+                    self.collect_garbage()
+        finally:
+            if self.lease is not None:
+                self.lease.release()
+            self.metrics = None
+        metrics.set("success", success)
+        metrics.emit()
+        self.last_metrics = metrics
+        return success
+    
+    def publish_tick(self):
+        """Fetch the feed and publish whatever changed, timing each stage"""
         try:
             # Fetch live feed data
             print("Fetching live feed data...")
-            data = self.fetch_live_feed()
+            with self.stage("fetch"):
+                data = self.fetch_live_feed()
+            self.record("feed_not_modified", self.feed_not_modified)
+            
+            if self.feed_not_modified:
+                print("Live feed not modified, skipping update")
+                return True
             
             if not data:
                 print("No data received from live feed")
                 return False
             
+            self.last_data = data
+            self.pointer_ttl = pointer_ttl(self.next_poll_interval(data))
+            if self.namespaced:
+                self.set_namespace(data)
             timestamp = datetime.now()
             
+            if not self._manifest_loaded:
+                self.load_published_state()
+            
+            # Never let a snapshot older than the published one overwrite it
+            position = feed_position(data)
+            if self.is_stale(position):
+                return True
+            
+            self.metrics.dimensions["series_id"] = data.get("series_id")
+            self.record("race_id", data.get("race_id"))
+            self.record("lap_number", data.get("lap_number"))
+            self.record("flag_state", data.get("flag_state"))
+            self.record("vehicles", len(data.get("vehicles", [])))
+            self.record("feed_staleness", feed_staleness(data.get("time_of_day_os")))
+            
+            # Analytics failures are logged and never stop the leaderboard from publishing
+            if self.history is not None:
+                try:
+                    self.history.append(data, timestamp)
+                    if data.get("flag_state") == FLAG_CHECKERED:
+                        self.history.finish()
+                except Exception as e:
+                    print(f"Error recording race history: {e}")
+            
+            if self.race_state is not None:
+                try:
+                    self.race_state.ingest(data)
+                except Exception as e:
+                    print(f"Error updating race state: {e}")
+            
+            try:
+                new_stops = self.pit_tracker.update(data)
+                if new_stops:
+                    print(f"Detected {len(new_stops)} new pit stops")
+            except Exception as e:
+                print(f"Error updating pit stops: {e}")
+            
+            try:
+                self.record("position_events", len(self.position_index.update(data)))
+            except Exception as e:
+                print(f"Error updating position index: {e}")
+            
+            if self.views is not None and "vehicles" in data:
+                with self.stage("views"):
+                    skipped = self.publish_views(data["vehicles"], position)
+                if skipped is not None:
+                    return skipped
+            
+            # One pass over the vehicles; the CSV, bundle and patches are all built from these tuples
+            vehicle_rows = None
+            if "vehicles" in data:
+                with self.stage("extract"):
+                    vehicle_rows = LEADERBOARD_SCHEMA.rows(data["vehicles"])
+            
+            if self.bundle:
+                return self.publish_bundle(data, timestamp, vehicle_rows, position)
+            
             # Create CSV content
             leaderboard_csv = None
             if "vehicles" in data:
-                leaderboard_csv = self.create_leaderboard_csv(data["vehicles"])
+                with self.stage("leaderboard_csv"):
+                    leaderboard_csv = self.create_leaderboard_csv(data["vehicles"], vehicle_rows)
                 if not leaderboard_csv:
                     print("Failed to create leaderboard CSV")
                     return False
             
-            metadata_csv = self.create_race_metadata_csv(data)
+            with self.stage("metadata_csv"):
+                metadata_csv = self.create_race_metadata_csv(data)
             if not metadata_csv:
                 print("Failed to create race metadata CSV")
                 return False
             
-            # Upload current versions
-            success = True
-            if leaderboard_csv:
-                success &= self.upload_to_r2("leaderboard.csv", leaderboard_csv)
-            success &= self.upload_to_r2("race_metadata.csv", metadata_csv)
+            # Skip artifacts whose bytes match the last published version
+            with self.stage("encode"):
+                artifacts = self.build_artifacts(data, leaderboard_csv, metadata_csv, vehicle_rows)
+            changed = {name: content for name, content in artifacts.items() if not self.is_unchanged(name, content)}
             
-            # Upload manifest
-            self.upload_manifest(timestamp)
+            self.record("artifacts_changed", len(changed))
+            if not changed:
+                print("Live feed content unchanged, skipping upload")
+                return True
+            
+            if self.lease is not None:
+                skipped = self.acquire_lease(position)
+                if skipped is not None:
+                    return skipped
+                if self.lease.took_over:
+                    # Compare against the digests the other publisher left
+                    changed = {name: content for name, content in changed.items() if not self.is_unchanged(name, content)}
+                    if not changed:
+                        print("Live feed content already published, skipping upload")
+                        return True
+            
+            # Upload changed artifacts in parallel under immutable versioned keys
+            version = self.next_manifest_version(timestamp)
+            digests = {name: content_digest(content) for name, content in changed.items()}
+            keys = {name: self.object_key(versioned_key(version, ARTIFACTS[name][0], digests[name])) for name in changed}
+            uploads = [(keys[name], content) + ARTIFACTS[name][1:] for name, content in changed.items()]
+            
+            # Patch from the last published leaderboard, or restart the chain if there is none
+            rows = None
+            patch_chain = self.patch_chain
+            if "leaderboard" in changed:
+                rows = leaderboard_rows(data["vehicles"], vehicle_rows)
+                if self.previous_rows is None:
+                    self.load_published_rows()
+                if self.previous_rows is not None:
+                    patch = {"from_version": self.leaderboard_version, "to_version": version}
+                    patch.update(diff_rows(self.previous_rows, rows))
+                    patch_content = json.dumps(patch, separators=(',', ':'))
+                    patch_key = self.object_key(versioned_key(version, PATCH_FILENAME, content_digest(patch_content)))
+                    uploads.append((patch_key, patch_content, 'application/json', None))
+                    patch_chain = (self.patch_chain + [{
+                        "from_version": self.leaderboard_version,
+                        "to_version": version,
+                        "key": patch_key
+                    }])[-MAX_PATCH_CHAIN:]
+                else:
+                    patch_chain = []
+            
+            with self.stage("upload"):
+                uploaded = self.upload_artifacts(uploads)
+            
+            # Only repoint the manifest once every data upload landed, so readers never see mixed versions
+            if not uploaded:
+                print(f"Artifact upload failed, manifest left at version {self.manifest_version}")
+                # Whatever did land is unreachable
+                self.retire_keys(upload[0] for upload in uploads)
+                return False
+            
+            previous = (dict(self.published_keys), dict(self.published_digests), self.patch_chain,
+                        self.previous_rows, self.leaderboard_version)
+            for name in changed:
+                self.published_keys[name] = keys[name]
+                self.published_digests[name] = digests[name]
+            self.patch_chain = patch_chain
+            if rows is not None:
+                self.previous_rows = rows
+                self.leaderboard_version = version
+            
+            with self.stage("manifest"):
+                manifest_uploaded = self.upload_manifest(timestamp, version, position)
+            if not manifest_uploaded:
+                # Keep local state in line with what readers can actually see
+                (self.published_keys, self.published_digests, self.patch_chain,
+                 self.previous_rows, self.leaderboard_version) = previous
+                self.retire_keys(upload[0] for upload in uploads)
+                return False
+            
+            # Replaced artifacts and patches that fell off the chain stay readable for a while
+            kept = {patch["key"] for patch in self.patch_chain}
+            self.retire_keys([previous[0][name] for name in changed if name in previous[0]] +
+                             [patch["key"] for patch in previous[2] if patch["key"] not in kept])
+            
+            if self.stream_url:
+                with self.stage("stream"):
+                    self.push_to_stream(data, version, vehicle_rows)
             
             # Print URLs for frontend access
             self.print_public_urls()
@@ -294,13 +930,154 @@ class LiveFeedToR2:
             return True
             
         except Exception as e:
-            print(f"Error in update_r2: {e}")
+            print(f"Error in publish_tick: {e}")
             return False
     
-    def run_once(self):
-        """Run a single update - idempotent for cron execution"""
+    def publish_views(self, vehicles, position):
+        """
+        Upload the driver and manufacturer views whose content changed this tick
+        
+        Returns:
+            bool: None once the views are written (failed ones are retried next tick),
+                or the tick's result if the publish lease stopped the tick
+        """
+        views = self.views.update(vehicles)
+        self.record("views_changed", len(views))
+        if not views:
+            return None
+        
+        if self.lease is not None:
+            skipped = self.acquire_lease(position)
+            if skipped is not None:
+                # Offered again on the next tick
+                self.views.mark_published({name: False for name in views}, views)
+                return skipped
+        
+        futures = {
+            name: self.upload_executor.submit(self.upload_to_r2, self.object_key(name), content, 'application/json')
+            for name, content in views.items()
+        }
+        results = {name: future.result() for name, future in futures.items()}
+        # Failed views are retried on the next tick
+        self.views.mark_published(results, views)
+        return None
+    
+    def push_to_stream(self, data, version, vehicle_rows=None):
+        """
+        Push the rows that changed since the last push to the live stream server
+        
+        The first push, and any push after the server reports it is out of step
+        (409, e.g. after a restart), carries the whole leaderboard instead.
+        """
+        rows = leaderboard_rows(data.get("vehicles", []), vehicle_rows)
+        full = self.streamed_rows is None
+        for _ in range(2):
+            if full:
+                message = {"from_version": None, "to_version": version, "changed": rows, "removed": []}
+            else:
+                message = {"from_version": self.streamed_version, "to_version": version}
+                message.update(diff_rows(self.streamed_rows, rows))
+            message["race_metadata"] = metadata_section(data)
+            message["published_at"] = time.time()
+            
+            headers = {'Content-Type': 'application/json'}
+            token = os.getenv('STREAM_PUBLISH_TOKEN')
+            if token:
+                headers['Authorization'] = f"Bearer {token}"
+            try:
+                response = self.http.request(
+                    'POST', f"{self.stream_url.rstrip('/')}/publish",
+                    body=json.dumps(message, separators=(',', ':')), headers=headers,
+                    timeout=STREAM_TIMEOUT, retries=False
+                )
+            except Exception as e:
+                print(f"Error pushing version {version} to live stream: {e}")
+                self.streamed_rows = None
+                return False
+            
+            if response.status == 200:
+                self.streamed_rows = rows
+                self.streamed_version = version
+                return True
+            if response.status != 409 or full:
+                print(f"Error pushing version {version} to live stream: {response.status}")
+                self.streamed_rows = None
+                return False
+            full = True
+        return False
+    
+    def publish_bundle(self, data, timestamp, vehicle_rows=None, position=None):
+        """
+        Publish the snapshot as one versioned bundle and repoint latest.json at it
+        
+        Metadata, leaderboard and derived sections come from one payload in one
+        object, so a reader following the pointer never sees them out of step.
+        """
+        if not self._manifest_loaded:
+            self.load_published_pointer()
+        if position is None:
+            position = feed_position(data)
+        
+        with self.stage("encode"):
+            sections_json = encode_sections(bundle_sections(data, self.derived_sections(data), vehicle_rows))
+            digest = content_digest(sections_json)
+        
+        unchanged = self.published_digests.get("bundle") == digest
+        self.record("artifacts_changed", 0 if unchanged else 1)
+        if unchanged:
+            print("Live feed content unchanged, skipping upload")
+            return True
+        
+        if self.lease is not None:
+            skipped = self.acquire_lease(position)
+            if skipped is not None:
+                return skipped
+            if self.published_digests.get("bundle") == digest:
+                print("Live feed content already published, skipping upload")
+                return True
+        
+        version = self.next_manifest_version(timestamp)
+        with self.stage("encode"):
+            content = gzip_bytes(encode_bundle(sections_json, version, timestamp, digest))
+        key = self.object_key(versioned_key(version, BUNDLE_FILENAME, content_digest(content)))
+        
+        with self.stage("upload"):
+            uploaded = self.upload_to_r2(key, content, 'application/json', 'gzip')
+        # Only repoint once the bundle landed, so the pointer never names a missing object
+        if not uploaded:
+            print(f"Bundle upload failed, pointer left at version {self.manifest_version}")
+            return False
+        
+        with self.stage("manifest"):
+            pointer = encode_pointer(version, key, timestamp, digest, position)
+            if not self.upload_to_r2(self.object_key(POINTER_FILENAME), pointer, 'application/json'):
+                self.retire_keys([key])
+                return False
+        
+        self.manifest_version = version
+        self.published_feed = position
+        if "bundle" in self.published_keys:
+            self.retire_keys([self.published_keys["bundle"]])
+        self.published_keys["bundle"] = key
+        self.published_digests["bundle"] = digest
+        
+        if self.stream_url:
+            with self.stage("stream"):
+                self.push_to_stream(data, version, vehicle_rows)
+        
+        print(f"Successfully updated R2 at {timestamp} (bundle version {version})")
+        return True
+    
+    def run_once(self, profile=False):
+        """
+        Run a single update - idempotent for cron execution
+        
+        Args:
+            profile (bool): Sample stacks during the update and log the hottest ones
+        """
         try:
-            success = self.update_r2()
+            with profiled(profile):
+                success = self.update_r2()
             if success:
                 print("Update completed successfully")
                 return 0  # Success exit code
@@ -310,36 +1087,254 @@ class LiveFeedToR2:
         except Exception as e:
             print(f"Error in run_once: {e}")
             return 1  # Error exit code
+    
+    def next_poll_interval(self, data=None):
+        """Pick the seconds to wait before the next poll based on race state"""
+        data = data if data is not None else self.last_data
+        if not data:
+            return POLL_INTERVALS["idle"]
+        
+        flag_state = data.get("flag_state")
+        if flag_state in (FLAG_GREEN, FLAG_WHITE):
+            laps_to_go = data.get("laps_to_go")
+            if laps_to_go is None and data.get("laps_in_race") and data.get("lap_number") is not None:
+                laps_to_go = data["laps_in_race"] - data["lap_number"]
+            if flag_state == FLAG_WHITE or (laps_to_go is not None and laps_to_go <= FINISH_LAPS_TO_GO):
+                return POLL_INTERVALS["green_finish"]
+            return POLL_INTERVALS["green"]
+        if flag_state == FLAG_CAUTION:
+            return POLL_INTERVALS["caution"]
+        if flag_state == FLAG_RED:
+            return POLL_INTERVALS["red"]
+        return POLL_INTERVALS["idle"]
+    
+    def close(self):
+        """Flush any buffered history and capture frames before the process or invocation ends"""
+        if self.history is not None:
+            self.history.flush()
+        if self.recorder is not None:
+            self.recorder.flush()
+    
+    def stop(self, *args):
+        """Ask run_forever to exit after the current tick"""
+        self._running = False
+    
+    def run_forever(self, max_iterations=None):
+        """
+        Poll continuously on one warm connection pool, adapting the interval to race state
+        
+        Args:
+            max_iterations (int): Optional number of ticks to run before returning
+        
+        Returns:
+            int: 0 if every tick succeeded, 1 otherwise
+        """
+        self._running = True
+        iterations = 0
+        failures = 0
+        
+        while self._running:
+            started = time.monotonic()
+            if self.run_once(profile=profiling_enabled()) != 0:
+                failures += 1
+            iterations += 1
+            
+            if max_iterations is not None and iterations >= max_iterations:
+                break
+            
+            interval = self.next_poll_interval()
+            elapsed = time.monotonic() - started
+            print(f"Next poll in {max(0.0, interval - elapsed):.1f}s")
+            
+            # Sleep in short slices so a stop request is honoured promptly
+            deadline = started + interval
+            while self._running and time.monotonic() < deadline:
+                time.sleep(min(1.0, max(0.0, deadline - time.monotonic())))
+        
+        self._running = False
+        self.close()
+        return 0 if failures == 0 else 1
 
 
-def lambda_handler(event, context):
-    """Main function to run the live feed to R2 updater"""
+# State kept across warm Lambda invocations of this container
+_ssm_client = None
+_token_cache = {"value": None, "fetched_at": 0.0}
+_updater = None
+_cold_start = True
+
+
+def get_api_token(force_refresh=False):
+    """
+    Retrieve the Cloudflare API token from SSM Parameter Store
     
-    # Configuration - set via environment variables
-    LIVE_FEED_URL = os.getenv('LIVE_FEED_URL', 'https://cf.nascar.com/live/feeds/live-feed.json')
+    The token is cached at module scope for SSM_TOKEN_TTL seconds so warm
+    invocations skip the lookup. boto3 is only imported on the first lookup.
+    """
+    global _ssm_client
+    
+    age = time.monotonic() - _token_cache["fetched_at"]
+    if not force_refresh and _token_cache["value"] and age < SSM_TOKEN_TTL:
+        return _token_cache["value"]
     
     # Initialize SSM client
-    ssm = boto3.client('ssm')
+    if _ssm_client is None:
+        import boto3
+        _ssm_client = boto3.client('ssm')
     
     PARAMETER_STORE_KEY_NAME = os.getenv('PARAMETER_STORE_KEY_NAME')
     
     # Retrieve API key from Parameter Store
-    response = ssm.get_parameter(
+    response = _ssm_client.get_parameter(
         Name=PARAMETER_STORE_KEY_NAME,
         WithDecryption=False
     )
     
-    api_key = response['Parameter']['Value']
+    _token_cache["value"] = response['Parameter']['Value']
+    _token_cache["fetched_at"] = time.monotonic()
+    return _token_cache["value"]
+
+
+def profiling_enabled():
+    """Whether PROFILE_TICKS asks for every tick to run under the sampling profiler"""
+    return os.getenv('PROFILE_TICKS', '').lower() in ('1', 'true', 'yes')
+
+
+def history_enabled():
+    """Whether RECORD_HISTORY asks for the per-race history archive"""
+    return os.getenv('RECORD_HISTORY', '').lower() in ('1', 'true', 'yes')
+
+
+def bundle_enabled():
+    """Whether PUBLISH_BUNDLE asks for bundle mode"""
+    return os.getenv('PUBLISH_BUNDLE', '').lower() in ('1', 'true', 'yes')
+
 
-    # R2 Configuration using Cloudflare API
-    R2_CONFIG = {
+def views_enabled():
+    """Whether PUBLISH_VIEWS asks for per-driver and per-manufacturer views"""
+    return os.getenv('PUBLISH_VIEWS', '').lower() in ('1', 'true', 'yes')
+
+
+def lease_enabled():
+    """
+    Whether PUBLISH_LEASE asks for a single-flight lease around each publish
+    
+    Off by default: the lease relies on R2 honouring If-Match and If-None-Match
+    on PUTs through the objects API, which so far is only exercised against
+    backend/mock_r2.py.
+    """
+    return os.getenv('PUBLISH_LEASE', '').lower() in ('1', 'true', 'yes')
+
+
+def stream_publish_url():
+    """Live stream server the publisher pushes to, from STREAM_PUBLISH_URL (None when unset)"""
+    return os.getenv('STREAM_PUBLISH_URL') or None
+
+
+def capture_recorder(name):
+    """FeedRecorder writing {name}.capture under the RECORD_FEED directory, or None when it is unset"""
+    directory = os.getenv('RECORD_FEED')
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    return FeedRecorder(os.path.join(directory, f"{name}.capture"))
+
+
+def build_r2_config(api_token):
+    """Build the R2 configuration from environment variables"""
+    return {
         'account_id': os.getenv('CLOUDFLARE_ACCOUNT_ID'),
-        'api_token': api_key,
+        'api_token': api_token,
         'bucket': os.getenv('R2_BUCKET_NAME', 'nascar-live-feed'),
-        'custom_domain': os.getenv('R2_CUSTOM_DOMAIN')  # Optional
+        'custom_domain': os.getenv('R2_CUSTOM_DOMAIN'),  # Optional
+        'api_base': os.getenv('CLOUDFLARE_API_BASE', DEFAULT_API_BASE)
     }
+
+
+def get_updater():
+    """
+    LiveFeedToR2 instance for this container
+    
+    Built (and its connection verified) on the first invocation only; warm
+    invocations reuse it along with its connection pool and published state.
+    """
+    global _updater
     
-    # Create instance and run once
-    updater = LiveFeedToR2(LIVE_FEED_URL, R2_CONFIG)
-    updater.run_once()
+    api_token = get_api_token()
+    if _updater is None:
+        # Configuration - set via environment variables
+        LIVE_FEED_URL = os.getenv('LIVE_FEED_URL', 'https://cf.nascar.com/live/feeds/live-feed.json')
+        
+        # R2 Configuration using Cloudflare API
+        R2_CONFIG = build_r2_config(api_token)
+        
+        _updater = LiveFeedToR2(LIVE_FEED_URL, R2_CONFIG, record_history=history_enabled(),
+                                bundle=bundle_enabled(), views=views_enabled(), stream_url=stream_publish_url(),
+                                lease=lease_enabled())
+    elif _updater.r2_config['api_token'] != api_token:
+        _updater.set_api_token(api_token)
+    
+    return _updater
+
+
+def lambda_handler(event, context):
+    """Main function to run the live feed to R2 updater"""
+    global _cold_start
+    
+    started = time.perf_counter()
+    cold_start = _cold_start
+    _cold_start = False
+    
+    updater = get_updater()
+    setup_done = time.perf_counter()
+    
+    # Per-invocation profiling: {"profile": true} in the event, or PROFILE_TICKS for every tick
+    profile = bool(isinstance(event, dict) and event.get("profile")) or profiling_enabled()
+    
+    status = updater.run_once(profile=profile)
+    if updater.auth_failed:
+        # Token was rotated or revoked - fetch a fresh one and retry once
+        print("R2 rejected the API token, refreshing from Parameter Store")
+        updater.set_api_token(get_api_token(force_refresh=True))
+        status = updater.run_once(profile=profile)
+    
+    # The container may be reclaimed before the next invocation, taking the buffer with it
+    updater.close()
+    
+    finished = time.perf_counter()
+    timing = {
+        "metric": "lambda_invocation",
+        "cold_start": cold_start,
+        "init_ms": round((started - MODULE_LOAD_STARTED) * 1000, 1) if cold_start else 0.0,
+        "setup_ms": round((setup_done - started) * 1000, 1),
+        "handler_ms": round((finished - started) * 1000, 1),
+        "status": status
+    }
+    print(json.dumps(timing))
+    return timing
+
+
+def main():
+    """
+    Daemon entry point: python -m fetch_live_feed (from the jobs directory)
+    
+    Keeps one LiveFeedToR2 instance and connection pool alive and polls
+    continuously instead of once per EventBridge tick. Uses the same
+    environment variables as lambda_handler. CLOUDFLARE_API_TOKEN may be
+    set to skip the Parameter Store lookup.
+    """
+    LIVE_FEED_URL = os.getenv('LIVE_FEED_URL', 'https://cf.nascar.com/live/feeds/live-feed.json')
+    
+    api_token = os.getenv('CLOUDFLARE_API_TOKEN') or get_api_token()
+    updater = LiveFeedToR2(LIVE_FEED_URL, build_r2_config(api_token), record_history=history_enabled(),
+                           recorder=capture_recorder("live-feed"), bundle=bundle_enabled(), views=views_enabled(),
+                           stream_url=stream_publish_url(), lease=lease_enabled())
+    
+    signal.signal(signal.SIGTERM, updater.stop)
+    signal.signal(signal.SIGINT, updater.stop)
+    
+    return updater.run_forever()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
 
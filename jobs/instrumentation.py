@@ -0,0 +1,214 @@
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+# How tick metrics are logged: "json" (one structured line), "emf" (CloudWatch Embedded Metric Format) or "off"
+METRICS_FORMAT = os.getenv('METRICS_FORMAT', 'json').lower()
+METRICS_NAMESPACE = os.getenv('METRICS_NAMESPACE', 'Pitstops')
+
+# Seconds between stack samples when the profiler is on
+PROFILE_INTERVAL = 0.005
+
+# Innermost functions of threads parked waiting for work; their samples are dropped
+IDLE_FUNCTIONS = {"_worker", "wait", "select", "serve_forever", "accept"}
+
+# EMF metric name and unit per stage or value recorded on a tick
+EMF_METRICS = {
+    "fetch": ("FetchMs", "Milliseconds"),
+    "lease": ("LeaseMs", "Milliseconds"),
+    "decode": ("DecodeMs", "Milliseconds"),
+    "extract": ("ExtractMs", "Milliseconds"),
+    "leaderboard_csv": ("LeaderboardCsvMs", "Milliseconds"),
+    "metadata_csv": ("MetadataCsvMs", "Milliseconds"),
+    "encode": ("EncodeMs", "Milliseconds"),
+    "upload": ("UploadMs", "Milliseconds"),
+    "manifest": ("ManifestMs", "Milliseconds"),
+    "views": ("ViewsMs", "Milliseconds"),
+    "stream": ("StreamMs", "Milliseconds"),
+    "gc": ("GcMs", "Milliseconds"),
+    "total": ("TotalMs", "Milliseconds"),
+    "bytes_sent": ("BytesSent", "Bytes"),
+    "uploads": ("Uploads", "Count"),
+    "upload_errors": ("UploadErrors", "Count"),
+    "retries": ("Retries", "Count"),
+    "hedges": ("Hedges", "Count"),
+    "feed_staleness": ("FeedStalenessSeconds", "Seconds")
+}
+
+
+def feed_staleness(time_of_day_os, now=None):
+    """Seconds between the feed's time_of_day_os timestamp and the wall clock, or None if unparseable"""
+    try:
+        stamped = datetime.fromisoformat(str(time_of_day_os))
+        if stamped.tzinfo is None:
+            stamped = stamped.astimezone()
+        now = now or datetime.now(timezone.utc)
+        return round((now - stamped).total_seconds(), 3)
+    except (TypeError, ValueError):
+        return None
+
+
+class TickMetrics:
+    def __init__(self, dimensions=None):
+        """
+        Initialize the TickMetrics class
+
+        Collects stage timings, per-upload results and scalar values for one
+        publish tick. Uploads may be recorded from worker threads.
+
+        Args:
+            dimensions (dict): Values identifying the tick, e.g. series_id
+        """
+        self.started = time.perf_counter()
+        self.timestamp = datetime.now(timezone.utc)
+        self.dimensions = dict(dimensions or {})
+        self.stages = {}
+        self.uploads = []
+        self.values = {}
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Time a block of work; repeated stages accumulate"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            with self.lock:
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+    def record_upload(self, key, bytes_sent, status, duration_ms, retries=0, hedges=0):
+        """Record the outcome of one object upload"""
+        with self.lock:
+            self.uploads.append({
+                "key": key,
+                "bytes": bytes_sent,
+                "status": status,
+                "duration_ms": round(duration_ms, 3),
+                "retries": retries,
+                "hedges": hedges
+            })
+
+    def set(self, name, value):
+        """Record a scalar value for the tick"""
+        self.values[name] = value
+
+    def as_record(self):
+        """Flat summary of the tick"""
+        with self.lock:
+            uploads = list(self.uploads)
+            record = {name: round(elapsed, 3) for name, elapsed in self.stages.items()}
+        record["total"] = round((time.perf_counter() - self.started) * 1000, 3)
+        record["bytes_sent"] = sum(upload["bytes"] for upload in uploads)
+        record["uploads"] = len(uploads)
+        record["upload_errors"] = sum(1 for upload in uploads if upload["status"] not in (200, 201))
+        record["retries"] = sum(upload["retries"] for upload in uploads)
+        record["hedges"] = sum(upload["hedges"] for upload in uploads)
+        record.update(self.values)
+        return record, uploads
+
+    def emit(self, format=None):
+        """Log the tick as a structured JSON line or a CloudWatch EMF document"""
+        format = format or METRICS_FORMAT
+        if format == 'off':
+            return None
+        record, uploads = self.as_record()
+
+        if format == 'emf':
+            document = {
+                "_aws": {
+                    "Timestamp": int(self.timestamp.timestamp() * 1000),
+                    "CloudWatchMetrics": [{
+                        "Namespace": METRICS_NAMESPACE,
+                        "Dimensions": [sorted(self.dimensions)],
+                        "Metrics": [
+                            {"Name": EMF_METRICS[name][0], "Unit": EMF_METRICS[name][1]}
+                            for name in record if name in EMF_METRICS and record[name] is not None
+                        ]
+                    }]
+                },
+                "uploads": uploads
+            }
+            document.update({key: str(value) for key, value in self.dimensions.items()})
+            document.update({
+                EMF_METRICS[name][0] if name in EMF_METRICS else name: value
+                for name, value in record.items()
+            })
+        else:
+            document = {"metric": "publish_tick", "timestamp": self.timestamp.isoformat()}
+            document.update(self.dimensions)
+            document.update(record)
+            document["upload_details"] = uploads
+
+        line = json.dumps(document)
+        print(line)
+        return document
+
+
+class SamplingProfiler:
+    def __init__(self, interval=PROFILE_INTERVAL):
+        """
+        Initialize the SamplingProfiler class
+
+        Samples the stacks of every other thread on a background thread and
+        counts identical stacks, so overhead is bounded by the sample rate
+        rather than by how much code runs.
+        """
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or frame.f_code.co_name in IDLE_FUNCTIONS:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def report(self, top=15):
+        """Log the most frequently sampled stacks as one JSON line"""
+        document = {
+            "metric": "profile",
+            "interval_ms": self.interval * 1000,
+            "samples": sum(self.samples.values()),
+            "top": [{"stack": stack, "samples": count} for stack, count in self.samples.most_common(top)]
+        }
+        print(json.dumps(document))
+        return document
+
+
+@contextlib.contextmanager
+def profiled(enabled):
+    """Run a block under the sampling profiler when enabled, logging the top stacks after"""
+    if not enabled:
+        yield None
+        return
+    profiler = SamplingProfiler()
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        profiler.report()
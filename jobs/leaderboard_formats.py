@@ -0,0 +1,138 @@
+import gzip
+import math
+import struct
+
+from feed_schema import LEADERBOARD_SCHEMA
+
+try:
+    import brotli
+except ImportError:  # Optional - brotli variants are skipped when it is not installed
+    brotli = None
+
+# Packed leaderboard layout (all little-endian):
+#   header: magic b"PSLB", format version (u8), row count (u16)
+#   row:    driver_id (u32), running_position (u16), starting_position (u16),
+#           last_lap_time (f64), delta (f32), flags (u8: bit 0 is_on_track, bit 1 is_on_dvp),
+#           then vehicle_number, vehicle_manufacturer, full_name as u8-length-prefixed UTF-8
+# Missing numbers are written as 0 (integers) or NaN (floats). Numbers outside a field's
+# range are clamped to it (delta to +/-infinity), so one bad value never fails the encode.
+PACKED_MAGIC = b"PSLB"
+PACKED_VERSION = 1
+PACKED_HEADER = struct.Struct("<4sBH")
+PACKED_ROW = struct.Struct("<IHHdfB")
+
+# Largest values the u32 and u16 fields and a finite f32 can hold
+U32_MAX = 0xFFFFFFFF
+U16_MAX = 0xFFFF
+F32_MAX = 3.4028234663852886e38
+
+FLAG_ON_TRACK = 0x01
+FLAG_ON_DVP = 0x02
+
+
+def gzip_bytes(content):
+    """Gzip content deterministically (fixed mtime) so identical input gives identical bytes"""
+    return gzip.compress(content, compresslevel=9, mtime=0)
+
+
+def brotli_bytes(content):
+    """Brotli-compress content, or None when the brotli module is not installed"""
+    if brotli is None:
+        return None
+    return brotli.compress(content, quality=11)
+
+
+def _int(value, maximum):
+    try:
+        return min(max(int(value), 0), maximum)
+    except (TypeError, ValueError, OverflowError):
+        return 0
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError, OverflowError):
+        return math.nan
+
+
+def _float32(value):
+    value = _float(value)
+    if abs(value) > F32_MAX:
+        return math.copysign(math.inf, value)
+    return value
+
+
+def _pack_string(value):
+    encoded = str(value if value is not None else "").encode('utf-8')
+    if len(encoded) > 255:
+        # Truncate on a character boundary
+        encoded = encoded[:255].decode('utf-8', 'ignore').encode('utf-8')
+    return bytes((len(encoded),)) + encoded
+
+
+def pack_leaderboard(vehicles, rows=None):
+    """
+    Encode leaderboard rows into the packed binary layout
+
+    Args:
+        vehicles (list): The feed's vehicles
+        rows (list): Tuples already extracted from vehicles by LEADERBOARD_SCHEMA.rows
+    """
+    if rows is None:
+        rows = LEADERBOARD_SCHEMA.rows(vehicles)
+    (driver_id, running_position, starting_position, last_lap_time, delta, is_on_track, is_on_dvp,
+     vehicle_number, vehicle_manufacturer, full_name) = [LEADERBOARD_SCHEMA.index[name] for name in (
+        "driver_id", "running_position", "starting_position", "last_lap_time", "delta", "is_on_track",
+        "is_on_dvp", "vehicle_number", "vehicle_manufacturer", "full_name")]
+
+    parts = [PACKED_HEADER.pack(PACKED_MAGIC, PACKED_VERSION, len(rows))]
+    for row in rows:
+        flags = 0
+        if row[is_on_track]:
+            flags |= FLAG_ON_TRACK
+        if row[is_on_dvp]:
+            flags |= FLAG_ON_DVP
+        parts.append(PACKED_ROW.pack(
+            _int(row[driver_id], U32_MAX),
+            _int(row[running_position], U16_MAX),
+            _int(row[starting_position], U16_MAX),
+            _float(row[last_lap_time]),
+            _float32(row[delta]),
+            flags
+        ))
+        parts.append(_pack_string(row[vehicle_number]))
+        parts.append(_pack_string(row[vehicle_manufacturer]))
+        parts.append(_pack_string(row[full_name]))
+    return b"".join(parts)
+
+
+def unpack_leaderboard(content):
+    """Decode the packed binary layout back into a list of row dicts"""
+    magic, version, count = PACKED_HEADER.unpack_from(content, 0)
+    if magic != PACKED_MAGIC or version != PACKED_VERSION:
+        raise ValueError(f"Unsupported packed leaderboard: {magic!r} v{version}")
+
+    rows = []
+    offset = PACKED_HEADER.size
+    for _ in range(count):
+        driver_id, running_position, starting_position, last_lap_time, delta, flags = PACKED_ROW.unpack_from(content, offset)
+        offset += PACKED_ROW.size
+        strings = []
+        for _ in range(3):
+            length = content[offset]
+            strings.append(content[offset + 1:offset + 1 + length].decode('utf-8'))
+            offset += 1 + length
+        rows.append({
+            "driver_id": driver_id,
+            "running_position": running_position,
+            "starting_position": starting_position,
+            "last_lap_time": last_lap_time,
+            "delta": delta,
+            "is_on_track": bool(flags & FLAG_ON_TRACK),
+            "is_on_dvp": bool(flags & FLAG_ON_DVP),
+            "vehicle_number": strings[0],
+            "vehicle_manufacturer": strings[1],
+            "full_name": strings[2]
+        })
+    return rows
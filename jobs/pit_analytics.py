@@ -0,0 +1,175 @@
+# Stops on laps at most this far apart belong to the same field-wide pit window
+WINDOW_GAP_LAPS = 2
+
+# Most recent completed stops included in the published artifact
+RECENT_STOPS = 20
+
+
+def _stop_complete(stop):
+    """A stop is complete once the car has left pit road"""
+    pit_out = stop.get("pit_out_elapsed_time")
+    return pit_out is not None and pit_out > (stop.get("pit_in_elapsed_time") or 0)
+
+
+class PitStopTracker:
+    def __init__(self):
+        """
+        Initialize the PitStopTracker class
+
+        Tracks how many of each driver's pit_stops entries have been processed, so each
+        poll only looks at entries past that point. A stop still in progress (no pit out
+        time yet) is left unprocessed and picked up once it completes. Counted stops are
+        kept per driver, so a driver whose list the feed rewrites can be taken back out
+        of every total.
+        """
+        self.reset(None)
+
+    def reset(self, race_key):
+        """Drop all state and start tracking a new session"""
+        self.race_key = race_key
+        self.lap_number = 0
+        self.processed = {}
+        self.stops = {}
+        self.drivers = {}
+        self.windows = []
+        self.recent = []
+        self.total_stops = 0
+
+    def _driver(self, driver_id):
+        summary = self.drivers.get(driver_id)
+        if summary is None:
+            summary = {
+                "driver_id": driver_id,
+                "stops": 0,
+                "total_pit_road_time": 0.0,
+                "positions_gained": 0,
+                "last_pit_lap": None
+            }
+            self.drivers[driver_id] = summary
+        return summary
+
+    def _add_to_window(self, stop):
+        """Extend the latest pit window or open a new one"""
+        lap = stop["lap"]
+        for window in reversed(self.windows):
+            if window["start_lap"] - WINDOW_GAP_LAPS <= lap <= window["end_lap"] + WINDOW_GAP_LAPS:
+                break
+        else:
+            window = None
+
+        if window is None:
+            window = {"start_lap": lap, "end_lap": lap, "stops": 0, "total_pit_road_time": 0.0, "positions_gained": 0}
+            self.windows.append(window)
+            self.windows.sort(key=lambda w: w["start_lap"])
+
+        window["start_lap"] = min(window["start_lap"], lap)
+        window["end_lap"] = max(window["end_lap"], lap)
+        window["stops"] += 1
+        window["total_pit_road_time"] += stop["pit_road_time"]
+        window["positions_gained"] += stop["positions_gained"]
+
+    def _rebuild(self):
+        """Recompute pit windows and recent stops from every driver's counted stops"""
+        stops = sorted((stop for driver_stops in self.stops.values() for stop in driver_stops), key=lambda s: s["lap"])
+        self.windows = []
+        for stop in stops:
+            self._add_to_window(stop)
+        self.recent = stops[-RECENT_STOPS:]
+
+    def update(self, data):
+        """
+        Process pit stops completed since the last poll
+
+        Returns:
+            list: The newly completed stops
+        """
+        race_key = (data.get("series_id"), data.get("race_id"), data.get("run_id"))
+        if race_key != self.race_key:
+            self.reset(race_key)
+        self.lap_number = data.get("lap_number") or 0
+
+        new_stops = []
+        rewritten = False
+        for vehicle in data.get("vehicles", []):
+            driver_id = vehicle.get("driver", {}).get("driver_id")
+            pit_stops = vehicle.get("pit_stops") or []
+            start = self.processed.get(driver_id, 0)
+            if len(pit_stops) < start:
+                # Feed rewrote this driver's history - forget their stops and reprocess the list
+                self.total_stops -= self.drivers.pop(driver_id, {}).get("stops", 0)
+                self.stops.pop(driver_id, None)
+                rewritten = True
+                start = 0
+
+            end = start
+            for stop in pit_stops[start:]:
+                if not _stop_complete(stop):
+                    break
+                end += 1
+                if stop.get("pit_in_elapsed_time") is None:
+                    # No pit road time without the pit in time; skip it rather than block later stops
+                    continue
+                gained = stop.get("positions_gained_lossed")
+                if gained is None:
+                    gained = (stop.get("pit_in_rank") or 0) - (stop.get("pit_out_rank") or 0)
+                new_stops.append({
+                    "driver_id": driver_id,
+                    "lap": stop.get("pit_in_lap_count") or 0,
+                    "leader_lap": stop.get("pit_in_leader_lap"),
+                    "pit_road_time": round(stop["pit_out_elapsed_time"] - stop["pit_in_elapsed_time"], 3),
+                    "pit_in_rank": stop.get("pit_in_rank"),
+                    "pit_out_rank": stop.get("pit_out_rank"),
+                    "positions_gained": gained
+                })
+            self.processed[driver_id] = end
+
+        if rewritten:
+            # Take the forgotten stops back out of the field-wide windows and recent list
+            self._rebuild()
+
+        for stop in sorted(new_stops, key=lambda s: s["lap"]):
+            self.stops.setdefault(stop["driver_id"], []).append(stop)
+            summary = self._driver(stop["driver_id"])
+            summary["stops"] += 1
+            summary["total_pit_road_time"] += stop["pit_road_time"]
+            summary["positions_gained"] += stop["positions_gained"]
+            summary["last_pit_lap"] = max(summary["last_pit_lap"] or 0, stop["lap"])
+            self._add_to_window(stop)
+
+        self.total_stops += len(new_stops)
+        self.recent = (self.recent + sorted(new_stops, key=lambda s: s["lap"]))[-RECENT_STOPS:]
+        return new_stops
+
+    def summary(self):
+        """Per-driver and field-wide pit stop summary for publishing"""
+        drivers = []
+        for summary in self.drivers.values():
+            last_pit_lap = summary["last_pit_lap"]
+            drivers.append({
+                "driver_id": summary["driver_id"],
+                "stops": summary["stops"],
+                "total_pit_road_time": round(summary["total_pit_road_time"], 3),
+                "average_pit_road_time": round(summary["total_pit_road_time"] / summary["stops"], 3),
+                "positions_gained": summary["positions_gained"],
+                "last_pit_lap": last_pit_lap,
+                "laps_since_pit": self.lap_number - last_pit_lap if last_pit_lap is not None else None
+            })
+
+        windows = [
+            {
+                "start_lap": window["start_lap"],
+                "end_lap": window["end_lap"],
+                "stops": window["stops"],
+                "average_pit_road_time": round(window["total_pit_road_time"] / window["stops"], 3),
+                "positions_gained": window["positions_gained"]
+            }
+            for window in self.windows
+        ]
+
+        return {
+            "lap_number": self.lap_number,
+            "total_stops": self.total_stops,
+            "windows": windows,
+            "drivers": drivers,
+            "recent_stops": self.recent
+        }
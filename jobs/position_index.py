@@ -0,0 +1,116 @@
+import time
+
+# Most recent events included in the published artifact
+RECENT_EVENTS = 200
+
+
+class PositionIndex:
+    def __init__(self, start_seq=None):
+        """
+        Initialize the PositionIndex class
+
+        Keeps each driver's running position, laps completed and on-track/DVP status
+        keyed by driver_id. Each snapshot only touches the entries that changed and
+        turns the changes into events (position_change, lead_change, on_track,
+        off_track, dvp_on, dvp_off) numbered with a sequence that never goes backwards.
+
+        Args:
+            start_seq (int): First sequence number; defaults to the current time in
+                milliseconds so sequences keep increasing across restarts
+        """
+        self.seq = int(time.time() * 1000) if start_seq is None else start_seq
+        self.reset(None)
+
+    def reset(self, race_key):
+        """Drop all driver state and start indexing a new session; the sequence carries on"""
+        self.race_key = race_key
+        self.lap_number = 0
+        self.entries = {}
+        self.leader = None
+        self.lead_changes = 0
+        self.events = []
+
+    def _event(self, kind, driver_id, **fields):
+        self.seq += 1
+        event = {"seq": self.seq, "type": kind, "lap": self.lap_number, "driver_id": driver_id}
+        event.update(fields)
+        return event
+
+    def update(self, data):
+        """
+        Apply a snapshot
+
+        Returns:
+            list: The events it produced, in sequence order
+        """
+        race_key = (data.get("series_id"), data.get("race_id"), data.get("run_id"))
+        if race_key != self.race_key:
+            self.reset(race_key)
+        self.lap_number = data.get("lap_number") or 0
+
+        events = []
+        leader = None
+        for vehicle in data.get("vehicles", []):
+            driver_id = vehicle.get("driver", {}).get("driver_id")
+            position = vehicle.get("running_position")
+            state = (position, vehicle.get("laps_completed"), bool(vehicle.get("is_on_track")),
+                     bool(vehicle.get("is_on_dvp")))
+            if position == 1:
+                leader = driver_id
+
+            entry = self.entries.get(driver_id)
+            if entry is None:
+                # First sighting: record without events, arrows start flat
+                self.entries[driver_id] = {
+                    "state": state,
+                    "previous_position": position,
+                    "change": 0,
+                    "changed_seq": self.seq
+                }
+                continue
+            if entry["state"] == state:
+                continue
+
+            before = entry["state"]
+            if before[0] != position and position is not None and before[0] is not None:
+                events.append(self._event("position_change", driver_id, **{"from": before[0], "to": position}))
+                entry["previous_position"] = before[0]
+                entry["change"] = before[0] - position
+                entry["changed_seq"] = self.seq
+            if before[2] != state[2]:
+                events.append(self._event("on_track" if state[2] else "off_track", driver_id))
+            if before[3] != state[3]:
+                events.append(self._event("dvp_on" if state[3] else "dvp_off", driver_id))
+            entry["state"] = state
+
+        if leader is not None and leader != self.leader:
+            if self.leader is not None:
+                self.lead_changes += 1
+                events.append(self._event("lead_change", leader, previous_leader=self.leader))
+            self.leader = leader
+
+        self.events = (self.events + events)[-RECENT_EVENTS:]
+        return events
+
+    def summary(self):
+        """Per-driver positions with their last change, plus recent events, for publishing"""
+        return {
+            "seq": self.seq,
+            "lap_number": self.lap_number,
+            "leader": self.leader,
+            "lead_changes": self.lead_changes,
+            "drivers": [
+                {
+                    "driver_id": driver_id,
+                    "running_position": entry["state"][0],
+                    "previous_position": entry["previous_position"],
+                    "change": entry["change"],
+                    "changed_seq": entry["changed_seq"],
+                    "laps_completed": entry["state"][1],
+                    "is_on_track": entry["state"][2],
+                    "is_on_dvp": entry["state"][3]
+                }
+                for driver_id, entry in self.entries.items()
+            ],
+            "events": self.events
+        }
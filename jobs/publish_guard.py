@@ -0,0 +1,155 @@
+import json
+import os
+import socket
+import time
+import uuid
+from datetime import datetime
+
+# Lease object, one per namespace, naming the publisher currently allowed to write
+LEASE_FILENAME = "lease.json"
+
+# Seconds a lease is held without being released; longer than any tick should take
+LEASE_SECONDS = int(os.getenv('PUBLISH_LEASE_SECONDS', '90'))
+
+# Seconds each lease read or write may take
+LEASE_TIMEOUT = 5
+
+
+def feed_position(data):
+    """Where a snapshot sits in its session: race key, lap_number and time_of_day_os"""
+    return {
+        "race": [data.get("series_id"), data.get("race_id"), data.get("run_id")],
+        "lap_number": data.get("lap_number"),
+        "time_of_day_os": data.get("time_of_day_os")
+    }
+
+
+def _feed_time(value):
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def is_older(position, published):
+    """
+    Whether a snapshot at position is older than the published one
+
+    Snapshots from a different session are never older. Within a session the
+    lap number is compared first, then time_of_day_os when both parse.
+    """
+    if not published or position["race"] != published.get("race"):
+        return False
+    lap, published_lap = position["lap_number"], published.get("lap_number")
+    if lap is not None and published_lap is not None and lap != published_lap:
+        return lap < published_lap
+    stamped, published_stamped = _feed_time(position["time_of_day_os"]), _feed_time(published.get("time_of_day_os"))
+    if stamped is None or published_stamped is None:
+        return False
+    try:
+        return stamped < published_stamped
+    except TypeError:
+        # One timestamp has a zone and the other doesn't
+        return False
+
+
+class PublishLease:
+    def __init__(self, publisher, duration=LEASE_SECONDS, owner=None):
+        """
+        Initialize the PublishLease class
+
+        A lease.json object in the bucket names the one publisher allowed to
+        write a namespace, and until when. It is taken with a conditional PUT
+        (If-None-Match: * when there is no lease, If-Match on the ETag read
+        otherwise), so two publishers racing for it can't both win. A lease
+        left by a publisher that died mid-tick expires after duration seconds.
+
+        Args:
+            publisher (LiveFeedToR2): Publisher whose bucket, credentials and namespace are used
+            duration (int): Seconds the lease is held before others may take it
+            owner (str): Identity written into the lease; defaults to host, pid and a random suffix
+        """
+        self.publisher = publisher
+        self.duration = duration
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        # Key and ETag of the lease while held
+        self.key = None
+        self.etag = None
+
+        # Owner of a live lease that stopped the last acquire, and whether the last
+        # acquire took over from another owner (whose publishes we haven't seen)
+        self.holder = None
+        self.took_over = False
+
+    def _headers(self, condition=None):
+        headers = dict(self.publisher.headers)
+        headers.update({'Content-Type': 'application/json', 'Cache-Control': 'no-store'})
+        if condition:
+            headers.update(condition)
+        return headers
+
+    def acquire(self):
+        """
+        Take the lease for the publisher's current namespace
+
+        Returns:
+            bool: True if held; on False, holder names the owner of a live lease,
+                or is None if the lease couldn't be read or written
+        """
+        self.holder = None
+        key = self.publisher.object_key(LEASE_FILENAME)
+        url = f"{self.publisher.base_url}/{key}"
+        try:
+            response = self.publisher.http.request('GET', url, headers=self.publisher.headers,
+                                                   timeout=LEASE_TIMEOUT, retries=False)
+            current = None
+            if response.status == 404:
+                condition = {'If-None-Match': '*'}
+            elif response.status == 200:
+                current = json.loads(response.data.decode('utf-8'))
+                if current.get("owner") != self.owner and current.get("expires_at", 0) > time.time():
+                    self.holder = current.get("owner")
+                    return False
+                etag = response.headers.get('ETag')
+                condition = {'If-Match': etag} if etag else None
+            else:
+                print(f"Error reading publish lease: {response.status}")
+                return False
+
+            now = time.time()
+            body = json.dumps({"owner": self.owner, "acquired_at": now, "expires_at": now + self.duration})
+            response = self.publisher.http.request('PUT', url, body=body, headers=self._headers(condition),
+                                                   timeout=LEASE_TIMEOUT, retries=False)
+            if response.status == 412:
+                # Another publisher wrote the lease between our read and write
+                self.holder = "unknown"
+                return False
+            if response.status not in (200, 201):
+                print(f"Error taking publish lease: {response.status}")
+                return False
+
+        except Exception as e:
+            print(f"Error taking publish lease: {e}")
+            return False
+
+        self.key = key
+        self.etag = response.headers.get('ETag')
+        self.took_over = current is None or current.get("owner") != self.owner
+        return True
+
+    def release(self):
+        """Expire the lease if held, so the next publisher needn't wait out its duration"""
+        if self.key is None:
+            return
+        url = f"{self.publisher.base_url}/{self.key}"
+        condition = {'If-Match': self.etag} if self.etag else None
+        body = json.dumps({"owner": self.owner, "acquired_at": None, "expires_at": 0})
+        self.key = None
+        self.etag = None
+        try:
+            self.publisher.http.request('PUT', url, body=body, headers=self._headers(condition),
+                                        timeout=LEASE_TIMEOUT, retries=False)
+        except Exception as e:
+            # It expires on its own
+            print(f"Warning: Could not release publish lease: {e}")
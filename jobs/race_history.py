@@ -0,0 +1,284 @@
+import gzip
+import json
+import uuid
+
+from cache_policy import cache_control
+from leaderboard_formats import gzip_bytes
+
+# Roll the open segment once it spans this many laps or seconds of snapshots
+SEGMENT_LAPS = 10
+SEGMENT_SECONDS = 300
+
+# Laps per independently readable block in the compacted race file
+LAP_BLOCK = 10
+
+# Attempts at writing index.json when another publisher keeps writing it first
+INDEX_ATTEMPTS = 5
+
+# Seconds each index.json read or write may take
+INDEX_TIMEOUT = 10
+
+# Per-driver fields kept for every snapshot in the history
+HISTORY_FIELDS = [
+    "running_position", "laps_completed", "last_lap_time", "last_lap_speed",
+    "delta", "is_on_track", "is_on_dvp", "status"
+]
+
+
+def snapshot_record(data, fetched_at):
+    """Reduce a live feed payload to the fields kept in the history"""
+    return {
+        "fetched_at": fetched_at.isoformat(),
+        "lap_number": data.get("lap_number", 0),
+        "flag_state": data.get("flag_state"),
+        "vehicles": [
+            dict(
+                {field: vehicle.get(field) for field in HISTORY_FIELDS},
+                driver_id=vehicle.get("driver", {}).get("driver_id")
+            )
+            for vehicle in data.get("vehicles", [])
+        ]
+    }
+
+
+class RaceHistory:
+    def __init__(self, publisher, segment_laps=SEGMENT_LAPS, segment_seconds=SEGMENT_SECONDS):
+        """
+        Initialize the RaceHistory class
+
+        Snapshots are appended to an in-memory buffer and written as gzip JSON-lines
+        segment objects under history/{series_id}/{race_id}/{run_id}/, with an
+        index.json listing each segment's lap and time range. Publishers in
+        overlapping containers can append to the same race: segment keys carry a
+        random suffix, and index.json is re-read and written with a conditional PUT.
+
+        Args:
+            publisher (LiveFeedToR2): Publisher whose bucket and connection pool are used
+            segment_laps (int): Laps per segment before it is rolled
+            segment_seconds (int): Seconds per segment before it is rolled
+        """
+        self.publisher = publisher
+        self.segment_laps = segment_laps
+        self.segment_seconds = segment_seconds
+
+        self.race_key = None
+        self.buffer = []
+        self.buffer_started = None
+        self.index = {"segments": [], "compacted": None}
+
+    def prefix(self):
+        """Key prefix for the current race's history"""
+        series_id, race_id, run_id = self.race_key
+        return f"history/{series_id}/{race_id}/{run_id}/"
+
+    def load_index(self):
+        """Load the current race's segment index so appends survive restarts"""
+        content = self.publisher.download_from_r2(f"{self.prefix()}index.json")
+        if content:
+            self.index = json.loads(content.decode('utf-8'))
+        else:
+            self.index = {"segments": [], "compacted": None}
+
+    def append(self, data, fetched_at):
+        """Add a snapshot to the history, rolling the segment when it is full"""
+        try:
+            race_key = (data.get("series_id"), data.get("race_id"), data.get("run_id"))
+            if race_key != self.race_key:
+                # A new session started - close out the previous one first
+                if self.race_key is not None:
+                    self.finish()
+                self.race_key = race_key
+                self.load_index()
+
+            if self.index.get("compacted"):
+                return True
+
+            if not self.buffer:
+                self.buffer_started = fetched_at
+            self.buffer.append(snapshot_record(data, fetched_at))
+
+            lap_span = self.buffer[-1]["lap_number"] - self.buffer[0]["lap_number"]
+            age = (fetched_at - self.buffer_started).total_seconds()
+            if lap_span >= self.segment_laps or age >= self.segment_seconds:
+                return self.flush()
+            return True
+
+        except Exception as e:
+            print(f"Error appending to race history: {e}")
+            return False
+
+    def flush(self):
+        """Write buffered snapshots as a new segment and update the index"""
+        if not self.buffer:
+            return True
+        try:
+            # Number from the index as it is now, not as this publisher last saw it
+            self.load_index()
+            sequence = len(self.index["segments"])
+            first_lap = self.buffer[0]["lap_number"]
+            last_lap = self.buffer[-1]["lap_number"]
+            key = (f"{self.prefix()}segments/{sequence:05d}-{first_lap:04d}-{last_lap:04d}-"
+                   f"{uuid.uuid4().hex[:8]}.jsonl.gz")
+
+            lines = "".join(json.dumps(record, separators=(',', ':')) + "\n" for record in self.buffer)
+            if not self.publisher.upload_to_r2(key, gzip_bytes(lines.encode('utf-8')), 'application/gzip'):
+                return False
+
+            segment = {
+                "key": key,
+                "first_lap": first_lap,
+                "last_lap": last_lap,
+                "first_fetched_at": self.buffer[0]["fetched_at"],
+                "last_fetched_at": self.buffer[-1]["fetched_at"],
+                "snapshots": len(self.buffer)
+            }
+            if not self.update_index(lambda index: index["segments"].append(segment)):
+                # Nothing lists the segment; keep the snapshots for the next flush
+                self.publisher.delete_from_r2(key)
+                return False
+            self.buffer = []
+            self.buffer_started = None
+            return True
+
+        except Exception as e:
+            print(f"Error flushing race history segment: {e}")
+            return False
+
+    def update_index(self, change):
+        """
+        Apply change to the current race's index.json as stored, and write it back
+
+        The index is read with its ETag and written with If-Match (If-None-Match: *
+        when there is none yet), so a segment listed by another publisher in the
+        meantime is never overwritten; on a conflict the index is read again and
+        change reapplied.
+
+        Args:
+            change (callable): Called with the index dict to modify it in place
+
+        Returns:
+            bool: True once written, with self.index set to what was written
+        """
+        key = f"{self.prefix()}index.json"
+        url = f"{self.publisher.base_url}/{key}"
+        try:
+            for _ in range(INDEX_ATTEMPTS):
+                response = self.publisher.http.request('GET', url, headers=self.publisher.headers,
+                                                       timeout=INDEX_TIMEOUT, retries=False)
+                if response.status == 404:
+                    index = {"segments": [], "compacted": None}
+                    condition = {'If-None-Match': '*'}
+                elif response.status == 200:
+                    index = json.loads(response.data.decode('utf-8'))
+                    etag = response.headers.get('ETag')
+                    condition = {'If-Match': etag} if etag else {}
+                else:
+                    print(f"Error reading {key}: {response.status}")
+                    return False
+
+                change(index)
+                headers = dict(self.publisher.headers)
+                headers.update({
+                    'Content-Type': 'application/json',
+                    'Cache-Control': cache_control(key, self.publisher.pointer_ttl)
+                })
+                headers.update(condition)
+                response = self.publisher.http.request('PUT', url, body=json.dumps(index, indent=2), headers=headers,
+                                                       timeout=INDEX_TIMEOUT, retries=False)
+                if response.status == 412:
+                    # Another publisher wrote the index since we read it
+                    continue
+                if response.status in [401, 403]:
+                    self.publisher.auth_failed = True
+                if response.status not in (200, 201):
+                    print(f"Error writing {key}: {response.status}")
+                    return False
+
+                self.index = index
+                return True
+
+            print(f"Gave up writing {key} after {INDEX_ATTEMPTS} conflicting writes")
+            return False
+
+        except Exception as e:
+            print(f"Error updating {key}: {e}")
+            return False
+
+    def finish(self):
+        """Flush the open segment and compact the race, once it has ended"""
+        if self.race_key is None or self.index.get("compacted"):
+            return True
+        return self.flush() and self.compact()
+
+    def compact(self):
+        """
+        Merge every segment into one columnar per-race file with a lap index
+
+        race.columnar.gz is a series of concatenated gzip members, one per LAP_BLOCK
+        laps, each holding a JSON object of column arrays (one entry per driver per
+        snapshot). lap_index.json records each block's lap range and byte range, so a
+        range of laps can be read with an HTTP Range request and no full-race scan.
+        """
+        try:
+            # Include segments other publishers listed
+            self.load_index()
+            if self.index.get("compacted"):
+                return True
+
+            records = []
+            keys = [segment["key"] for segment in self.index["segments"]]
+            # Fetch segments concurrently over the publisher's upload pool
+            for segment, content in zip(self.index["segments"],
+                                        self.publisher.upload_executor.map(self.publisher.download_from_r2, keys)):
+                if content is None:
+                    print(f"Missing history segment {segment['key']}, compaction skipped")
+                    return False
+                records.extend(json.loads(line) for line in gzip.decompress(content).decode('utf-8').splitlines() if line)
+
+            if not records:
+                return True
+
+            blocks = {}
+            for record in records:
+                block = blocks.setdefault(record["lap_number"] // LAP_BLOCK, {
+                    "fetched_at": [], "lap_number": [], "flag_state": [], "driver_id": [],
+                    **{field: [] for field in HISTORY_FIELDS}
+                })
+                for vehicle in record["vehicles"]:
+                    block["fetched_at"].append(record["fetched_at"])
+                    block["lap_number"].append(record["lap_number"])
+                    block["flag_state"].append(record["flag_state"])
+                    block["driver_id"].append(vehicle["driver_id"])
+                    for field in HISTORY_FIELDS:
+                        block[field].append(vehicle.get(field))
+
+            parts = []
+            lap_index = []
+            offset = 0
+            for block_number in sorted(blocks):
+                columns = blocks[block_number]
+                member = gzip_bytes(json.dumps({"columns": columns}, separators=(',', ':')).encode('utf-8'))
+                lap_index.append({
+                    "first_lap": min(columns["lap_number"]),
+                    "last_lap": max(columns["lap_number"]),
+                    "offset": offset,
+                    "length": len(member),
+                    "rows": len(columns["driver_id"])
+                })
+                parts.append(member)
+                offset += len(member)
+
+            columnar_key = f"{self.prefix()}race.columnar.gz"
+            lap_index_key = f"{self.prefix()}lap_index.json"
+            if not self.publisher.upload_to_r2(columnar_key, b"".join(parts), 'application/gzip'):
+                return False
+            if not self.publisher.upload_to_r2(lap_index_key, json.dumps({"blocks": lap_index}, indent=2), 'application/json'):
+                return False
+
+            compacted = {"key": columnar_key, "lap_index": lap_index_key}
+            print(f"Compacted {len(keys)} history segments into {columnar_key}")
+            return self.update_index(lambda index: index.update(compacted=compacted))
+
+        except Exception as e:
+            print(f"Error compacting race history: {e}")
+            return False
@@ -0,0 +1,235 @@
+import warnings
+
+try:
+    import numpy as np
+except ImportError:  # Optional - the race-state engine and its metrics artifact are skipped without numpy
+    np = None
+
+# Laps of per-driver history kept in the ring buffer
+RING_LAPS = 64
+
+# Laps averaged for the rolling lap time and fitted for the interval trend
+ROLLING_LAPS = 5
+
+# Initial driver capacity; arrays double when a larger field shows up
+INITIAL_DRIVERS = 48
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _json_float(value, digits=3):
+    """Round a numpy float for JSON, mapping NaN to None and whole numbers to int"""
+    if np.isnan(value):
+        return None
+    return int(round(float(value))) if digits == 0 else round(float(value), digits)
+
+
+def create_engine():
+    """RaceStateEngine instance, or None when numpy is not installed"""
+    return RaceStateEngine() if np is not None else None
+
+
+class RaceStateEngine:
+    def __init__(self, ring_laps=RING_LAPS, rolling_laps=ROLLING_LAPS):
+        """
+        Initialize the RaceStateEngine class
+
+        Keeps per-driver column arrays indexed by driver row x lap slot, where a lap's
+        slot is lap_number % ring_laps. Several polls within one lap overwrite the same
+        slot, so the buffer always holds the latest value for each of the last ring_laps laps.
+
+        Args:
+            ring_laps (int): Laps of history kept per driver
+            rolling_laps (int): Window for rolling averages and trends
+        """
+        if np is None:
+            raise ImportError("RaceStateEngine requires numpy")
+        self.ring_laps = ring_laps
+        self.rolling_laps = rolling_laps
+        self.reset(None)
+
+    def reset(self, race_key):
+        """Drop all state and start tracking a new session"""
+        self.race_key = race_key
+        self.lap_number = 0
+        self.driver_ids = []
+        self.driver_index = {}
+
+        # Lap number stored in each ring slot, -1 when empty
+        self.slot_laps = np.full(self.ring_laps, -1, dtype=np.int64)
+
+        capacity = INITIAL_DRIVERS
+        self.lap_time = np.full((capacity, self.ring_laps), np.nan)
+        self.position = np.full((capacity, self.ring_laps), np.nan)
+        self.interval = np.full((capacity, self.ring_laps), np.nan)
+
+        # Latest scalar values per driver row
+        self.current = {
+            name: np.full(capacity, np.nan)
+            for name in ("running_position", "best_lap_time", "last_lap_speed", "laps_led",
+                         "passes_made", "average_running_position", "last_pit_lap", "pit_out_rank")
+        }
+
+    def _ensure_capacity(self, size):
+        capacity = self.lap_time.shape[0]
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        grow = capacity - self.lap_time.shape[0]
+        padding = np.full((grow, self.ring_laps), np.nan)
+        self.lap_time = np.vstack([self.lap_time, padding])
+        self.position = np.vstack([self.position, padding])
+        self.interval = np.vstack([self.interval, padding])
+        for name, values in self.current.items():
+            self.current[name] = np.concatenate([values, np.full(grow, np.nan)])
+
+    def _drop_departed(self, vehicles):
+        """Remove drivers missing from this snapshot, compacting their rows out of the arrays"""
+        present = {vehicle.get("driver", {}).get("driver_id") for vehicle in vehicles}
+        keep = [row for row, driver_id in enumerate(self.driver_ids) if driver_id in present]
+        if len(keep) == len(self.driver_ids):
+            return
+
+        self.driver_ids = [self.driver_ids[row] for row in keep]
+        self.driver_index = {driver_id: row for row, driver_id in enumerate(self.driver_ids)}
+        keep = np.array(keep, dtype=np.int64)
+
+        def compact(values):
+            compacted = np.full_like(values, np.nan)
+            compacted[:len(keep)] = values[keep]
+            return compacted
+
+        self.lap_time = compact(self.lap_time)
+        self.position = compact(self.position)
+        self.interval = compact(self.interval)
+        self.current = {name: compact(values) for name, values in self.current.items()}
+
+    def _rows(self, vehicles):
+        """Driver rows for vehicles, assigning rows to drivers seen for the first time"""
+        rows = []
+        for vehicle in vehicles:
+            driver_id = vehicle.get("driver", {}).get("driver_id")
+            row = self.driver_index.get(driver_id)
+            if row is None:
+                row = len(self.driver_ids)
+                self.driver_index[driver_id] = row
+                self.driver_ids.append(driver_id)
+            rows.append(row)
+        self._ensure_capacity(len(self.driver_ids))
+        return np.array(rows, dtype=np.int64)
+
+    def ingest(self, data):
+        """Write a live feed snapshot into the column arrays"""
+        race_key = (data.get("series_id"), data.get("race_id"), data.get("run_id"))
+        if race_key != self.race_key:
+            self.reset(race_key)
+
+        vehicles = data.get("vehicles", [])
+        if not vehicles:
+            return
+
+        lap_number = _number(data.get("lap_number"))
+        self.lap_number = 0 if np.isnan(lap_number) else int(lap_number)
+        slot = self.lap_number % self.ring_laps
+        if self.slot_laps[slot] != self.lap_number:
+            # Slot is being reused for a new lap - clear what it held
+            self.slot_laps[slot] = self.lap_number
+            self.lap_time[:, slot] = np.nan
+            self.position[:, slot] = np.nan
+            self.interval[:, slot] = np.nan
+
+        self._drop_departed(vehicles)
+        rows = self._rows(vehicles)
+        last_stops = [(vehicle.get("pit_stops") or [{}])[-1] for vehicle in vehicles]
+
+        self.lap_time[rows, slot] = [_number(vehicle.get("last_lap_time")) for vehicle in vehicles]
+        self.position[rows, slot] = [_number(vehicle.get("running_position")) for vehicle in vehicles]
+        self.interval[rows, slot] = [_number(vehicle.get("delta")) for vehicle in vehicles]
+
+        current = self.current
+        current["running_position"][rows] = self.position[rows, slot]
+        current["best_lap_time"][rows] = [_number(vehicle.get("best_lap_time")) for vehicle in vehicles]
+        current["last_lap_speed"][rows] = [_number(vehicle.get("last_lap_speed")) for vehicle in vehicles]
+        current["laps_led"][rows] = [
+            sum(max(0, span.get("end_lap", 0) - span.get("start_lap", 0) + 1) for span in vehicle.get("laps_led") or [])
+            for vehicle in vehicles
+        ]
+        current["passes_made"][rows] = [_number(vehicle.get("passes_made")) for vehicle in vehicles]
+        current["average_running_position"][rows] = [_number(vehicle.get("average_running_position")) for vehicle in vehicles]
+        current["last_pit_lap"][rows] = [_number(stop.get("pit_in_lap_count")) for stop in last_stops]
+        current["pit_out_rank"][rows] = [_number(stop.get("pit_out_rank")) for stop in last_stops]
+
+    def _window(self):
+        """Ring slots for the last rolling_laps laps, and a mask of which hold those laps"""
+        laps = np.arange(self.lap_number - self.rolling_laps + 1, self.lap_number + 1)
+        slots = laps % self.ring_laps
+        return laps, slots, self.slot_laps[slots] == laps
+
+    def metrics(self):
+        """
+        Compute derived per-driver metrics across the whole field at once
+
+        Returns:
+            dict: lap_number plus one entry per driver with rolling average lap time,
+                interval-to-leader trend (seconds per lap, positive means losing ground),
+                positions gained since the last pit stop and fastest-lap rank
+        """
+        count = len(self.driver_ids)
+        if count == 0:
+            return {"lap_number": self.lap_number, "drivers": []}
+
+        laps, slots, valid = self._window()
+        lap_times = np.where(valid, self.lap_time[:count][:, slots], np.nan)
+        intervals = np.where(valid, self.interval[:count][:, slots], np.nan)
+
+        # Drivers with no samples in the window produce NaN, which is expected here
+        with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            # Rolling average over laps actually present in the window
+            samples = np.sum(~np.isnan(lap_times), axis=1)
+            rolling_avg = np.where(samples > 0, np.nansum(lap_times, axis=1) / np.maximum(samples, 1), np.nan)
+
+            # Least-squares slope of interval vs lap, per driver, ignoring missing laps
+            present = ~np.isnan(intervals)
+            x = np.where(present, laps.astype(float), np.nan)
+            x_mean = np.nanmean(x, axis=1, keepdims=True)
+            y_mean = np.nanmean(intervals, axis=1, keepdims=True)
+            covariance = np.nansum((x - x_mean) * (intervals - y_mean), axis=1)
+            variance = np.nansum((x - x_mean) ** 2, axis=1)
+            interval_trend = np.where(variance > 0, covariance / variance, np.nan)
+
+        current = self.current
+        positions_gained_since_pit = np.where(
+            np.isnan(current["last_pit_lap"][:count]),
+            np.nan,
+            current["pit_out_rank"][:count] - current["running_position"][:count]
+        )
+
+        # Rank 1 is the fastest best lap; drivers without a lap rank last
+        best = current["best_lap_time"][:count]
+        order = np.argsort(np.where(np.isnan(best), np.inf, best), kind='stable')
+        fastest_rank = np.empty(count, dtype=np.int64)
+        fastest_rank[order] = np.arange(1, count + 1)
+
+        drivers = []
+        for row, driver_id in enumerate(self.driver_ids):
+            drivers.append({
+                "driver_id": driver_id,
+                "running_position": _json_float(current["running_position"][row], 0),
+                "rolling_avg_lap_time": _json_float(rolling_avg[row]),
+                "interval_trend": _json_float(interval_trend[row]),
+                "positions_gained_since_pit": _json_float(positions_gained_since_pit[row], 0),
+                "best_lap_time": _json_float(best[row]),
+                "fastest_lap_rank": int(fastest_rank[row]),
+                "last_lap_speed": _json_float(current["last_lap_speed"][row]),
+                "laps_led": _json_float(current["laps_led"][row], 0),
+                "passes_made": _json_float(current["passes_made"][row], 0),
+                "average_running_position": _json_float(current["average_running_position"][row], 2)
+            })
+        return {"lap_number": self.lap_number, "rolling_laps": self.rolling_laps, "drivers": drivers}
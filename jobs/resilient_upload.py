@@ -0,0 +1,232 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import urllib3
+
+# Per-attempt connect and read timeouts in seconds; a stalled PUT is abandoned and retried
+CONNECT_TIMEOUT = 2.0
+READ_TIMEOUT = 5.0
+
+# Attempts per upload, and the wall-clock budget they share, so one object can't stall a tick
+MAX_ATTEMPTS = 4
+UPLOAD_DEADLINE = 15.0
+
+# Full-jitter exponential backoff: sleep uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2**retry))
+BACKOFF_BASE = 0.2
+BACKOFF_CAP = 2.0
+
+# A duplicate PUT is sent once an attempt has run longer than this percentile of recent
+# successful attempts (clamped to the bounds below); until enough samples exist HEDGE_DEFAULT is used
+HEDGE_PERCENTILE = 95
+HEDGE_SAMPLES = 200
+HEDGE_MIN_SAMPLES = 20
+HEDGE_DEFAULT = 1.0
+HEDGE_MIN_DELAY = 0.05
+
+# Consecutive failed uploads that open the circuit, and seconds it stays open before a probe
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 30.0
+
+# Statuses worth retrying; anything else (e.g. 401/403/404) fails straight away
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class CircuitBreaker:
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        """
+        Initialize the CircuitBreaker class
+
+        Opens after threshold consecutive failures and rejects calls for cooldown
+        seconds, then lets a single probe through (half-open). A successful probe
+        closes the circuit; a failed one opens it for another cooldown.
+        """
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self.lock:
+            if self.opened_at is None:
+                return "closed"
+            if self.probing or time.monotonic() - self.opened_at >= self.cooldown:
+                return "half_open"
+            return "open"
+
+    def allow(self):
+        """Whether a call may go ahead now"""
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.probing or time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            self.probing = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            if self.opened_at is not None:
+                print("R2 circuit closed")
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.probing or (self.opened_at is None and self.failures >= self.threshold):
+                print(f"R2 circuit open for {self.cooldown}s after {self.failures} consecutive failures")
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+
+class UploadResult:
+    """Outcome of one upload: final status (None if no response), body, retries and hedges sent"""
+
+    def __init__(self, status=None, data=b"", retries=0, hedges=0, error=None):
+        self.status = status
+        self.data = data
+        self.retries = retries
+        self.hedges = hedges
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.status in (200, 201)
+
+
+class ResilientUploader:
+    def __init__(self, http, max_attempts=MAX_ATTEMPTS, deadline=UPLOAD_DEADLINE,
+                 timeout=None, breaker=None, hedge=True, max_workers=8):
+        """
+        Initialize the ResilientUploader class
+
+        Sends PUTs with tight per-attempt timeouts, retries transient failures
+        with jittered exponential backoff inside a per-upload deadline, hedges
+        slow attempts with a duplicate request and stops calling R2 while the
+        circuit breaker is open.
+
+        Args:
+            http (urllib3.PoolManager): Pool the requests go through
+            max_attempts (int): Attempts per upload, including the first
+            deadline (float): Seconds all attempts for one upload may take
+            timeout (urllib3.Timeout): Per-attempt timeout, defaults to CONNECT_TIMEOUT/READ_TIMEOUT
+            breaker (CircuitBreaker): Shared breaker, defaults to a new one
+            hedge (bool): Send duplicate requests for slow attempts
+            max_workers (int): Threads available for attempts and their hedges
+        """
+        self.http = http
+        self.max_attempts = max_attempts
+        self.deadline = deadline
+        self.timeout = timeout or urllib3.Timeout(connect=CONNECT_TIMEOUT, read=READ_TIMEOUT)
+        self.breaker = breaker or CircuitBreaker()
+        self.hedge = hedge
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+        # Durations in seconds of recent successful attempts, for the hedge delay
+        self.latencies = deque(maxlen=HEDGE_SAMPLES)
+        self.latencies_lock = threading.Lock()
+
+    def hedge_delay(self):
+        """Seconds an attempt may run before a duplicate is sent"""
+        with self.latencies_lock:
+            samples = sorted(self.latencies)
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT
+        index = min(len(samples) - 1, int(len(samples) * HEDGE_PERCENTILE / 100))
+        return max(HEDGE_MIN_DELAY, samples[index])
+
+    def backoff(self, retry):
+        """Full-jitter delay before the given retry (1 for the first)"""
+        return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (retry - 1)))
+
+    def _send(self, url, body, headers):
+        """One request without urllib3's own retries; returns (status, data)"""
+        started = time.monotonic()
+        response = self.http.request('PUT', url, body=body, headers=headers, timeout=self.timeout, retries=False)
+        elapsed = time.monotonic() - started
+        if response.status in (200, 201):
+            with self.latencies_lock:
+                self.latencies.append(elapsed)
+        return response.status, response.data
+
+    def _attempt(self, url, body, headers, remaining):
+        """
+        One attempt, hedged with a duplicate if it outlives the hedge delay
+
+        Returns:
+            tuple: (status, data, error, hedged) from the first request to finish
+                successfully, or from the last one to fail
+        """
+        pending = {self.executor.submit(self._send, url, body, headers)}
+        hedged = False
+        delay = self.hedge_delay() if self.hedge else None
+        last = (None, b"", None)
+        started = time.monotonic()
+
+        while pending:
+            wait_for = remaining - (time.monotonic() - started)
+            if not hedged and delay is not None:
+                wait_for = min(wait_for, delay - (time.monotonic() - started))
+            done, pending = wait(pending, timeout=max(0.0, wait_for), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                try:
+                    status, data = future.result()
+                    last = (status, data, None)
+                except Exception as e:
+                    last = (None, b"", e)
+                if last[0] in (200, 201):
+                    return last + (hedged,)
+
+            elapsed = time.monotonic() - started
+            if elapsed >= remaining:
+                # Out of budget; abandoned requests finish on their own within the attempt timeout
+                return (last if done else (None, b"", TimeoutError("upload deadline exceeded"))) + (hedged,)
+            if pending and not hedged and delay is not None and elapsed >= delay:
+                pending.add(self.executor.submit(self._send, url, body, headers))
+                hedged = True
+
+        return last + (hedged,)
+
+    def put(self, url, body, headers):
+        """
+        PUT body to url, retrying and hedging as configured
+
+        Returns:
+            UploadResult: Final outcome; status is None if R2 never answered or the circuit is open
+        """
+        if not self.breaker.allow():
+            return UploadResult(error=RuntimeError("R2 circuit open, upload skipped"))
+
+        started = time.monotonic()
+        result = UploadResult()
+        for attempt in range(self.max_attempts):
+            if attempt:
+                delay = self.backoff(attempt)
+                if time.monotonic() - started + delay >= self.deadline:
+                    break
+                time.sleep(delay)
+                result.retries += 1
+
+            remaining = self.deadline - (time.monotonic() - started)
+            status, data, error, hedged = self._attempt(url, body, headers, remaining)
+            result.status, result.data, result.error = status, data, error
+            result.hedges += int(hedged)
+
+            if result.ok:
+                self.breaker.record_success()
+                return result
+            if status is not None and status not in RETRY_STATUSES:
+                # R2 is up and said no; a retry won't change its mind
+                self.breaker.record_success()
+                return result
+
+        self.breaker.record_failure()
+        return result
@@ -0,0 +1,82 @@
+import json
+
+from feed_schema import LEADERBOARD_SCHEMA, METADATA_SCHEMA
+
+# Bundle layout version, bumped whenever a reader would need to change
+BUNDLE_FORMAT = "pitstops.snapshot"
+BUNDLE_FORMAT_VERSION = 1
+
+# Object names in bundle mode: one snapshot per version and a pointer to the latest
+BUNDLE_FILENAME = "snapshot.json.gz"
+POINTER_FILENAME = "latest.json"
+
+
+def leaderboard_section(vehicles, rows=None):
+    """Leaderboard as LEADERBOARD_SCHEMA column names and types and one row array per vehicle"""
+    if rows is None:
+        rows = LEADERBOARD_SCHEMA.rows(vehicles)
+    return {"columns": LEADERBOARD_SCHEMA.names, "types": LEADERBOARD_SCHEMA.types, "rows": rows}
+
+
+def metadata_section(data):
+    """Race metadata fields of a live feed payload, per METADATA_SCHEMA"""
+    return dict(zip(METADATA_SCHEMA.names, METADATA_SCHEMA.extract(data)))
+
+
+def bundle_sections(data, derived=None, rows=None):
+    """
+    Every section of a snapshot bundle
+
+    Args:
+        data (dict): Live feed payload
+        derived (dict): Extra sections by name, e.g. race_metrics and pit_stops
+        rows (list): Leaderboard tuples already extracted from data["vehicles"]
+
+    Returns:
+        dict: Sections by name; leaderboard is omitted when the payload has no vehicles
+    """
+    sections = {"race_metadata": metadata_section(data)}
+    if "vehicles" in data:
+        sections["leaderboard"] = leaderboard_section(data["vehicles"], rows)
+    sections.update(derived or {})
+    return sections
+
+
+def encode_sections(sections):
+    """Canonical JSON bytes of the sections, used for the bundle's content digest"""
+    return json.dumps(sections, separators=(',', ':'), sort_keys=True).encode('utf-8')
+
+
+def encode_bundle(sections_json, version, timestamp, digest):
+    """
+    Serialize a self-describing snapshot bundle
+
+    Args:
+        sections_json (bytes): Output of encode_sections
+        version (int): Snapshot version
+        timestamp (datetime): When the snapshot was built
+        digest (str): Content digest of sections_json
+
+    Returns:
+        bytes: {"format", "format_version", "version", "last_updated", "digest", "sections"} as JSON
+    """
+    header = json.dumps({
+        "format": BUNDLE_FORMAT,
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "version": version,
+        "last_updated": timestamp.isoformat(),
+        "digest": digest
+    }, separators=(',', ':')).encode('utf-8')
+    # Splice the already-encoded sections in rather than serializing them twice
+    return header[:-1] + b',"sections":' + sections_json + b'}'
+
+
+def encode_pointer(version, key, timestamp, digest, feed=None):
+    """The latest pointer: which bundle key holds the current snapshot, and its feed position"""
+    return json.dumps({
+        "version": version,
+        "key": key,
+        "last_updated": timestamp.isoformat(),
+        "digest": digest,
+        "feed": feed
+    }, separators=(',', ':'))
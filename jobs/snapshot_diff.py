@@ -0,0 +1,39 @@
+from feed_schema import LEADERBOARD_SCHEMA
+
+# Leaderboard fields tracked per driver for patches: every leaderboard column but the key
+LEADERBOARD_FIELDS = [name for name in LEADERBOARD_SCHEMA.names if name != "driver_id"]
+
+
+def leaderboard_rows(vehicles, rows=None):
+    """
+    Index leaderboard fields by driver_id (as a string, to match JSON object keys)
+
+    Args:
+        vehicles (list): The feed's vehicles
+        rows (list): Tuples already extracted from vehicles by LEADERBOARD_SCHEMA.rows
+    """
+    if rows is None:
+        rows = LEADERBOARD_SCHEMA.rows(vehicles)
+    return LEADERBOARD_SCHEMA.records(rows, "driver_id", LEADERBOARD_FIELDS)
+
+
+def diff_rows(previous, current):
+    """
+    Compute the changes that turn one driver-indexed snapshot into another
+
+    Returns:
+        dict: changed (driver_id -> only the fields that differ, or every field for
+            new drivers) and removed (driver_ids no longer present)
+    """
+    changed = {}
+    for driver_id, row in current.items():
+        before = previous.get(driver_id)
+        if before is None:
+            changed[driver_id] = row
+            continue
+        fields = {field: value for field, value in row.items() if before.get(field) != value}
+        if fields:
+            changed[driver_id] = fields
+
+    removed = [driver_id for driver_id in previous if driver_id not in current]
+    return {"changed": changed, "removed": removed}
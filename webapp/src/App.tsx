@@ -1,15 +1,74 @@
-import { useState, useEffect, useCallback } from "react";
+import { useState, useEffect, useCallback, useRef } from "react";
 import { AlertCircle } from "lucide-react";
 import "./styles/RaceLeaderboard.css";
 import LeaderboardHeader from "./components/LeaderboardHeader";
 import LeaderboardGrid from "./components/LeaderboardGrid";
-import type { Driver } from "./types";
-import { parseCSV } from "./utils";
+import type {
+  Driver,
+  PositionIndex,
+  SnapshotBundle,
+  SnapshotPointer,
+  StreamMessage,
+} from "./types";
+import { parseCSV, bundleRows, stringFields } from "./utils";
 import type { RaceData } from "./data/RaceData";
 
 const R2_ENDPOINT = "https://pub-c40331d1ffaa483a8c55e70a0acd246f.r2.dev";
-const RACE_METADATA_URL = `${R2_ENDPOINT}/race_metadata.csv`;
-const LEADERBOARD_URL = `${R2_ENDPOINT}/leaderboard.csv`;
+const MANIFEST_URL = `${R2_ENDPOINT}/manifest.json`;
+const LATEST_URL = `${R2_ENDPOINT}/latest.json`;
+
+// Set VITE_SNAPSHOT_BUNDLE=true when the publisher runs with PUBLISH_BUNDLE
+const USE_BUNDLE = import.meta.env.VITE_SNAPSHOT_BUNDLE === "true";
+
+// Live stream server (backend/live_stream.py); when set, updates are pushed instead of polled
+const STREAM_URL = import.meta.env.VITE_STREAM_URL as string | undefined;
+
+type Rows = { [key: string]: string }[];
+
+type Snapshot = [Rows | null, Rows | null, PositionIndex | null];
+
+// Position before each driver's last move if it came after sinceSeq, otherwise the
+// current position, so arrows only show recent moves
+const previousFromIndex = (index: PositionIndex, sinceSeq: number) => {
+  const positions: { [key: string]: number } = {};
+  index.drivers.forEach((driver) => {
+    positions[String(driver.driver_id)] =
+      driver.changed_seq > sinceSeq
+        ? driver.previous_position
+        : driver.running_position;
+  });
+  return positions;
+};
+
+// Without an earlier index to compare against, show the moves made on the current lap
+const currentLapSeq = (index: PositionIndex) => {
+  const seqs = index.events
+    .filter((event) => event.lap >= index.lap_number)
+    .map((event) => event.seq);
+  return seqs.length > 0 ? Math.min(...seqs) - 1 : index.seq;
+};
+
+const toRaceData = (metadata: { [key: string]: string }): RaceData => ({
+  flag_state: metadata.flag_state,
+  run_name: metadata.run_name,
+  series_id: metadata.series_id,
+  track_name: metadata.track_name,
+  lap_number: metadata.lap_number,
+  laps_in_race: metadata.laps_in_race,
+  time_of_day_os: metadata.time_of_day_os,
+});
+
+const sortByPosition = (rows: Rows) =>
+  rows
+    .map((d) => d as Driver)
+    .sort(
+      (a, b) => parseInt(a.running_position) - parseInt(b.running_position),
+    );
+
+type Manifest = {
+  version: number;
+  files: { leaderboard?: string; race_metadata?: string; positions?: string };
+};
 
 const RaceLeaderboard = () => {
   const [raceData, setRaceData] = useState<RaceData | null>(null);
@@ -18,6 +77,8 @@ const RaceLeaderboard = () => {
     [key: string]: number;
   }>({});
   const [initialLoading, setInitialLoading] = useState(true);
+  // Sequence of the position index the arrows were last computed from
+  const seenSeq = useRef<number | null>(null);
   const [error, setError] = useState<string | null>(null);
 
   const fetchCSVData = useCallback(async (url: RequestInfo | URL) => {
@@ -34,7 +95,117 @@ const RaceLeaderboard = () => {
     }
   }, []);
 
+  const fetchManifest = useCallback(async () => {
+    try {
+      const response = await fetch(MANIFEST_URL, { cache: "no-cache" });
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+      return (await response.json()) as Manifest;
+    } catch (error) {
+      console.error("Error fetching manifest:", error);
+      return null;
+    }
+  }, []);
+
+  // The manifest points at one consistent, versioned snapshot
+  const fetchCSVSnapshot = useCallback(async (): Promise<Snapshot> => {
+    const manifest = await fetchManifest();
+    if (!manifest) {
+      throw new Error("Manifest unavailable");
+    }
+    return Promise.all([
+      manifest.files.race_metadata
+        ? fetchCSVData(`${R2_ENDPOINT}/${manifest.files.race_metadata}`)
+        : null,
+      manifest.files.leaderboard
+        ? fetchCSVData(`${R2_ENDPOINT}/${manifest.files.leaderboard}`)
+        : null,
+      manifest.files.positions
+        ? fetch(`${R2_ENDPOINT}/${manifest.files.positions}`)
+            .then((response) => (response.ok ? response.json() : null))
+            .catch(() => null)
+        : null,
+    ]);
+  }, [fetchCSVData, fetchManifest]);
+
+  // latest.json points at one immutable bundle holding metadata and leaderboard together
+  const fetchBundleSnapshot = useCallback(async (): Promise<Snapshot> => {
+    const pointerResponse = await fetch(LATEST_URL, { cache: "no-cache" });
+    if (!pointerResponse.ok) {
+      throw new Error(`HTTP error! status: ${pointerResponse.status}`);
+    }
+    const pointer = (await pointerResponse.json()) as SnapshotPointer;
+    const bundleResponse = await fetch(`${R2_ENDPOINT}/${pointer.key}`);
+    if (!bundleResponse.ok) {
+      throw new Error(`HTTP error! status: ${bundleResponse.status}`);
+    }
+    const bundle = (await bundleResponse.json()) as SnapshotBundle;
+    const metadata = Object.fromEntries(
+      Object.entries(bundle.sections.race_metadata).map(([field, value]) => [
+        field,
+        value === null ? "" : String(value),
+      ]),
+    );
+    const leaderboard = bundle.sections.leaderboard;
+    return [
+      [metadata],
+      leaderboard ? bundleRows(leaderboard) : null,
+      bundle.sections.positions ?? null,
+    ];
+  }, []);
+
+  // Rows keyed by driver_id as of the last stream event
+  const streamRows = useRef<{ [driverId: string]: { [key: string]: string } }>(
+    {},
+  );
+
+  useEffect(() => {
+    if (!STREAM_URL) {
+      return;
+    }
+    // EventSource reconnects on its own, resuming from the last event id
+    const source = new EventSource(`${STREAM_URL}/stream`);
+    const apply = (event: MessageEvent<string>) => {
+      const message = JSON.parse(event.data) as StreamMessage;
+      const rows = streamRows.current;
+      const currentPositions: { [key: string]: number } = {};
+      Object.entries(rows).forEach(([driverId, row]) => {
+        currentPositions[driverId] = parseInt(row.running_position);
+      });
+      if (message.from_version === null) {
+        streamRows.current = {};
+      }
+      Object.entries(message.changed).forEach(([driverId, fields]) => {
+        streamRows.current[driverId] = {
+          ...streamRows.current[driverId],
+          ...stringFields(fields),
+          driver_id: driverId,
+        };
+      });
+      message.removed.forEach((driverId) => {
+        delete streamRows.current[driverId];
+      });
+      if (message.race_metadata) {
+        setRaceData(toRaceData(stringFields(message.race_metadata)));
+      }
+      setPreviousPositions(currentPositions);
+      setLeaderboardData(sortByPosition(Object.values(streamRows.current)));
+      setError(null);
+      setInitialLoading(false);
+    };
+    source.addEventListener("snapshot", apply);
+    source.addEventListener("patch", apply);
+    source.onerror = (error) => {
+      console.error("Live stream error:", error);
+    };
+    return () => source.close();
+  }, []);
+
   useEffect(() => {
+    if (STREAM_URL) {
+      return;
+    }
     const loadData = async () => {
       try {
         setError(null);
@@ -44,30 +215,27 @@ const RaceLeaderboard = () => {
             driver.running_position,
           );
         });
-        const raceMetadata = await fetchCSVData(RACE_METADATA_URL);
+        const [raceMetadata, leaderboard, positions] = USE_BUNDLE
+          ? await fetchBundleSnapshot()
+          : await fetchCSVSnapshot();
         if (raceMetadata && raceMetadata.length > 0) {
-          const metadataObj = raceMetadata[0];
-          const raceDataObj: RaceData = {
-            flag_state: metadataObj.flag_state,
-            run_name: metadataObj.run_name,
-            series_id: metadataObj.series_id,
-            track_name: metadataObj.track_name,
-            lap_number: metadataObj.lap_number,
-            laps_in_race: metadataObj.laps_in_race,
-            time_of_day_os: metadataObj.time_of_day_os,
-          };
-          setRaceData(raceDataObj);
+          setRaceData(toRaceData(raceMetadata[0]));
         }
-        const leaderboard = await fetchCSVData(LEADERBOARD_URL);
         if (leaderboard && leaderboard.length > 0) {
-          setPreviousPositions(currentPositions);
-          const sortedLeaderboard = leaderboard
-            .map((d) => d as Driver)
-            .sort(
-              (a, b) =>
-                parseInt(a.running_position) - parseInt(b.running_position),
+          // The published index remembers each driver's last move, even across missed
+          // polls; arrows show the moves since the index this client last saw
+          if (!positions) {
+            setPreviousPositions(currentPositions);
+          } else if (positions.seq !== seenSeq.current) {
+            setPreviousPositions(
+              previousFromIndex(
+                positions,
+                seenSeq.current ?? currentLapSeq(positions),
+              ),
             );
-          setLeaderboardData(sortedLeaderboard);
+            seenSeq.current = positions.seq;
+          }
+          setLeaderboardData(sortByPosition(leaderboard));
         }
       } catch (error) {
         console.error("Error loading data:", error);
@@ -81,7 +249,7 @@ const RaceLeaderboard = () => {
     loadData();
     const interval = setInterval(loadData, 10000);
     return () => clearInterval(interval);
-  }, [fetchCSVData, leaderboardData]);
+  }, [fetchBundleSnapshot, fetchCSVSnapshot, leaderboardData]);
 
   if (initialLoading) {
     return (
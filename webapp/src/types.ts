@@ -11,3 +11,87 @@ export type Driver = {
   is_on_track: string;
   series_id: string;
 };
+
+// Row decoded from the packed binary leaderboard (leaderboard.bin)
+export type PackedDriver = {
+  driver_id: number;
+  running_position: number;
+  starting_position: number;
+  last_lap_time: number;
+  delta: number;
+  is_on_track: boolean;
+  is_on_dvp: boolean;
+  vehicle_number: string;
+  vehicle_manufacturer: string;
+  full_name: string;
+};
+
+// Snapshot bundle written by the publisher in bundle mode (jobs/snapshot_bundle.py)
+export type SnapshotPointer = {
+  version: number;
+  key: string;
+  last_updated: string;
+  digest: string;
+};
+
+export type SnapshotBundle = {
+  format: string;
+  format_version: number;
+  version: number;
+  last_updated: string;
+  digest: string;
+  sections: {
+    race_metadata: { [field: string]: string | number | boolean | null };
+    leaderboard?: {
+      columns: string[];
+      types?: string[];
+      rows: (string | number | boolean | null)[][];
+    };
+    positions?: PositionIndex;
+  };
+};
+
+// Event from the live stream server (backend/live_stream.py); from_version null replaces every row
+export type StreamMessage = {
+  from_version: number | null;
+  to_version: number;
+  changed: { [driverId: string]: { [field: string]: string | number | boolean | null } };
+  removed: string[];
+  race_metadata?: { [field: string]: string | number | boolean | null };
+  published_at?: number;
+};
+
+// positions.json / the bundle's positions section (jobs/position_index.py)
+export type PositionEvent = {
+  seq: number;
+  type:
+    | "position_change"
+    | "lead_change"
+    | "on_track"
+    | "off_track"
+    | "dvp_on"
+    | "dvp_off";
+  lap: number;
+  driver_id: number;
+  from?: number;
+  to?: number;
+  previous_leader?: number;
+};
+
+export type PositionIndex = {
+  seq: number;
+  lap_number: number;
+  leader: number | null;
+  lead_changes: number;
+  drivers: {
+    driver_id: number;
+    running_position: number;
+    previous_position: number;
+    change: number;
+    changed_seq: number;
+    laps_completed: number;
+    is_on_track: boolean;
+    is_on_dvp: boolean;
+  }[];
+  events: PositionEvent[];
+};
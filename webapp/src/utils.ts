@@ -1,3 +1,5 @@
+import type { PackedDriver } from "./types";
+
 export const parseCSV = (csvText: string) => {
   const lines = csvText.trim().split("\n");
   const headers = lines[0].split(",");
@@ -11,6 +13,83 @@ export const parseCSV = (csvText: string) => {
   });
 };
 
+// A JSON value as the CSVs spell it: null is empty and booleans are Python's True/False
+export const cellString = (value: string | number | boolean | null | undefined) => {
+  if (value === null || value === undefined) {
+    return "";
+  }
+  if (typeof value === "boolean") {
+    return value ? "True" : "False";
+  }
+  return String(value);
+};
+
+// Field values as strings, matching rows parsed from the CSVs
+export const stringFields = (fields: {
+  [key: string]: string | number | boolean | null;
+}) => {
+  const obj: { [key: string]: string } = {};
+  Object.entries(fields).forEach(([key, value]) => {
+    obj[key] = cellString(value);
+  });
+  return obj;
+};
+
+// Rows of a snapshot bundle section as string-valued objects, like parseCSV returns
+export const bundleRows = (section: {
+  columns: string[];
+  rows: (string | number | boolean | null)[][];
+}) =>
+  section.rows.map((row) => {
+    const obj: { [key: string]: string } = {};
+    section.columns.forEach((column, index) => {
+      obj[column] = cellString(row[index]);
+    });
+    return obj;
+  });
+
+// Mirrors the layout documented in jobs/leaderboard_formats.py
+export const decodePackedLeaderboard = (buffer: ArrayBuffer) => {
+  const view = new DataView(buffer);
+  const bytes = new Uint8Array(buffer);
+  const decoder = new TextDecoder();
+  const magic = decoder.decode(bytes.subarray(0, 4));
+  if (magic !== "PSLB" || view.getUint8(4) !== 1) {
+    throw new Error("Unsupported packed leaderboard");
+  }
+  const count = view.getUint16(5, true);
+  const rows: PackedDriver[] = [];
+  let offset = 7;
+  const readString = () => {
+    const length = view.getUint8(offset);
+    const value = decoder.decode(
+      bytes.subarray(offset + 1, offset + 1 + length),
+    );
+    offset += 1 + length;
+    return value;
+  };
+  for (let i = 0; i < count; i++) {
+    const flags = view.getUint8(offset + 20);
+    const row = {
+      driver_id: view.getUint32(offset, true),
+      running_position: view.getUint16(offset + 4, true),
+      starting_position: view.getUint16(offset + 6, true),
+      last_lap_time: view.getFloat64(offset + 8, true),
+      delta: view.getFloat32(offset + 16, true),
+      is_on_track: (flags & 0x01) !== 0,
+      is_on_dvp: (flags & 0x02) !== 0,
+    };
+    offset += 21;
+    rows.push({
+      ...row,
+      vehicle_number: readString(),
+      vehicle_manufacturer: readString(),
+      full_name: readString(),
+    });
+  }
+  return rows;
+};
+
 export const getManufacturerLogoUrl = (
   seriesId: string | number,
   vehicleNumber: string | number,